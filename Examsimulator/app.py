@@ -1,48 +1,396 @@
 import os
 import logging
+import gzip
+import hashlib
 import json
-from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
+import time
+from flask import Flask, Request, render_template, request, redirect, url_for, session, flash, jsonify, make_response, current_app, g
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
-from utils.file_parser import parse_questions_from_file
+from utils.file_parser import preload_parsers
+from utils.assets import ASSET_CACHE_CONTROL, FragmentCache, StaticAssets
+from utils.exam_cache import ExamCache
+from utils.exam_store import PARSER_VERSION, ExamStore
+from utils.db_store import (SqlExamDirectory, SqlExamStore, SqlItemStats, SqlQuestionStore,
+                            SqlSessionInterface, count_active_sessions, get_engine)
+from utils.parse_jobs import ParseJobQueue, QueueFullError
+from utils.question_bank import STRATIFY_CHOICES, QuestionBank, parse_tags
+from utils.item_analysis import analyze
+from utils.scoring import (NUMPY_AVAILABLE, STATUS_NAMES, encode_answers, encode_key, grade_session,
+                           session_statuses, summarize_results, update_tally)
+from utils.exam_clock import ExamClock, exam_deadline, format_sse, remaining_seconds
+from utils.janitor import CATEGORIES, UPLOADS_DIR, Janitor
+from utils.metrics import registry as metrics
+from utils.uploads import UploadSpool
+from datetime import timedelta
 import tempfile
+import secrets
+import uuid
+
+# Log level from the environment (e.g. LOG_LEVEL=DEBUG while debugging the parser);
+# hot-path debug logs use %-style arguments so they cost nothing at INFO
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+
+
+# Views that take ownership of uploaded papers; they must discard or hand on every spool
+SPOOLED_ENDPOINTS = frozenset({'upload_file', 'publish_exam'})
+
+
+class UploadRequest(Request):
+    """Request that streams uploaded papers into validated, hashed spool files"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint not in SPOOLED_ENDPOINTS:
+            # Werkzeug's temporary file, gone with the request
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return UploadSpool(current_app.config['SPOOL_FOLDER'], filename,
+                           current_app.config['MAX_UPLOAD_FILE_SIZE'])
 
-# Configure logging for debugging
-logging.basicConfig(level=logging.DEBUG)
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = os.environ.get("SESSION_SECRET", "fallback_secret_key_for_development")
 
-# Configure file upload settings
-UPLOAD_FOLDER = tempfile.gettempdir()
+# Server-side storage: SQLite locally, Postgres (DATABASE_URL) in production.
+# The session cookie only carries an opaque id; test state lives in the database.
+os.makedirs(app.instance_path, exist_ok=True)
+app.config['DATABASE_URL'] = os.environ.get(
+    'DATABASE_URL', f"sqlite:///{os.path.join(app.instance_path, 'exam_simulator.db')}")
+# Older Heroku-style URLs use the scheme SQLAlchemy no longer accepts
+if app.config['DATABASE_URL'].startswith('postgres://'):
+    app.config['DATABASE_URL'] = app.config['DATABASE_URL'].replace('postgres://', 'postgresql://', 1)
+app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(hours=int(os.environ.get('SESSION_LIFETIME_HOURS', 24)))
+app.session_interface = SqlSessionInterface(app.config['DATABASE_URL'])
+
+# Configure file upload settings. Everything the app writes to disk lives under
+# UPLOAD_FOLDER (see utils.janitor for the layout) rather than loose in the temp dir.
+UPLOAD_FOLDER = os.environ.get('UPLOAD_FOLDER', os.path.join(tempfile.gettempdir(), 'exam_simulator'))
 ALLOWED_EXTENSIONS = {'pdf', 'docx'}
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+app.config['SPOOL_FOLDER'] = os.path.join(UPLOAD_FOLDER, UPLOADS_DIR)
+os.makedirs(app.config['SPOOL_FOLDER'], exist_ok=True)
+# Older versions wrote per-session files straight into the temp dir
+app.config['LEGACY_TEMP_FOLDER'] = tempfile.gettempdir()
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Per-file limit enforced while the upload streams in (covers chunked bodies)
+app.config['MAX_UPLOAD_FILE_SIZE'] = app.config['MAX_CONTENT_LENGTH']
+
+# Per-worker cache of parsed exam banks so question lookups skip the disk
+app.config['EXAM_CACHE_MAX_ENTRIES'] = int(os.environ.get('EXAM_CACHE_MAX_ENTRIES', 256))
+app.config['EXAM_CACHE_MAX_BYTES'] = int(os.environ.get('EXAM_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+app.config['EXAM_CACHE_TTL'] = float(os.environ.get('EXAM_CACHE_TTL', 3600))
+exam_cache = ExamCache(max_entries=app.config['EXAM_CACHE_MAX_ENTRIES'],
+                       max_bytes=app.config['EXAM_CACHE_MAX_BYTES'],
+                       ttl=app.config['EXAM_CACHE_TTL'])
+
+# Serialized (and compressed) question payloads for the bulk questions endpoint
+app.config['PAYLOAD_CACHE_MAX_BYTES'] = int(os.environ.get('PAYLOAD_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+payload_cache = ExamCache(max_entries=1024,
+                          max_bytes=app.config['PAYLOAD_CACHE_MAX_BYTES'],
+                          ttl=app.config['EXAM_CACHE_TTL'])
+
+# Results of completed tests, keyed by session
+results_cache = ExamCache(max_entries=app.config['EXAM_CACHE_MAX_ENTRIES'],
+                          max_bytes=app.config['EXAM_CACHE_MAX_BYTES'] // 4,
+                          ttl=app.config['EXAM_CACHE_TTL'])
+
+# CSS/JS served under content-hashed URLs, precompressed and cached as immutable
+static_assets = StaticAssets(app.static_folder)
+
+# Rendered template fragments that depend only on the exam (see FragmentCache)
+app.config['FRAGMENT_CACHE_MAX_BYTES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
+fragment_cache = ExamCache(max_entries=65536,
+                           max_bytes=app.config['FRAGMENT_CACHE_MAX_BYTES'],
+                           ttl=app.config['EXAM_CACHE_TTL'])
+
+
+def asset_url(path):
+    """Fingerprinted URL of a static file (the plain static URL if it is not known)"""
+    return static_assets.url(path) or url_for('static', filename=path)
+
+
+app.jinja_env.globals.update(asset_url=asset_url,
+                             fragment_cache=FragmentCache(fragment_cache, version=PARSER_VERSION))
+
+# Parsed exam banks are content-addressed by the SHA-256 of the uploaded file and
+# kept in the database ("database", the default) or as files in UPLOAD_FOLDER ("files")
+app.config['EXAM_STORE'] = os.environ.get('EXAM_STORE', 'database')
+if app.config['EXAM_STORE'] == 'files':
+    exam_store = ExamStore(app.config['UPLOAD_FOLDER'])
+else:
+    exam_store = SqlExamStore(app.config['DATABASE_URL'])
+
+# Question bank: every parsed paper is pooled (deduplicated) so proctors can
+# assemble new exams from it; QUESTION_BANK=0 disables it
+app.config['QUESTION_BANK'] = os.environ.get('QUESTION_BANK', '1') == '1'
+question_bank = (QuestionBank(SqlQuestionStore(app.config['DATABASE_URL']))
+                 if app.config['QUESTION_BANK'] else None)
+
+# New papers are parsed in a bounded background process pool
+app.config['PARSE_WORKERS'] = int(os.environ.get('PARSE_WORKERS', 2))
+app.config['PARSE_QUEUE_SIZE'] = int(os.environ.get('PARSE_QUEUE_SIZE', 8))
+parse_queue = ParseJobQueue(exam_store,
+                            max_workers=app.config['PARSE_WORKERS'],
+                            max_pending=app.config['PARSE_QUEUE_SIZE'],
+                            bank=question_bank)
+
+# Proctored exams: a paper published once under a join code and shared by every
+# candidate. Publishing needs ADMIN_TOKEN when it is set.
+app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN', '')
+exam_directory = SqlExamDirectory(app.config['DATABASE_URL'])
+# Published exams never change, so join code lookups are cached per worker
+published_cache = ExamCache(max_entries=4096, max_bytes=4 * 1024 * 1024,
+                            ttl=app.config['EXAM_CACHE_TTL'])
+
+# Item analysis: every submitted test is folded into running sums for its exam,
+# so a report costs the same however many candidates have sat it
+item_stats = SqlItemStats(app.config['DATABASE_URL'])
+# Reports by exam and attempt count, so the next submission makes them stale
+analysis_cache = ExamCache(max_entries=1024, max_bytes=16 * 1024 * 1024,
+                           ttl=app.config['EXAM_CACHE_TTL'])
+
+# Background janitor: TTL and byte-quota eviction of temp files, expired sessions and old jobs
+app.config['JANITOR_INTERVAL'] = float(os.environ.get('JANITOR_INTERVAL', 600))
+app.config['JANITOR_MAX_BYTES'] = int(os.environ.get('JANITOR_MAX_BYTES', 1024 * 1024 * 1024))
+app.config['JANITOR_BANK_TTL_HOURS'] = float(os.environ.get('JANITOR_BANK_TTL_HOURS', 48))
+janitor = Janitor(app.config['UPLOAD_FOLDER'],
+                  legacy_root=app.config['LEGACY_TEMP_FOLDER'],
+                  session_ttl=app.config['PERMANENT_SESSION_LIFETIME'].total_seconds(),
+                  bank_ttl=app.config['JANITOR_BANK_TTL_HOURS'] * 3600,
+                  max_bytes=app.config['JANITOR_MAX_BYTES'],
+                  interval=app.config['JANITOR_INTERVAL'],
+                  database_url=app.config['DATABASE_URL'])
+
+@app.before_request
+def start_background_janitor():
+    if app.config['JANITOR_INTERVAL'] > 0:
+        janitor.ensure_started()
+
+# The server owns the exam clock: answers stop being accepted EXAM_CLOCK_GRACE
+# seconds after the deadline and overdue tests are auto-submitted (see exam_clock below)
+app.config['EXAM_CLOCK_GRACE'] = float(os.environ.get('EXAM_CLOCK_GRACE', 5))
+app.config['CLOCK_PUSH_INTERVAL'] = int(os.environ.get('CLOCK_PUSH_INTERVAL', 30))
+
+# Per-route request metrics, exposed with everything else at /metrics
+REQUEST_SECONDS = metrics.histogram('exam_http_request_duration_seconds',
+                                    'Request latency by route', ['route', 'method'])
+REQUESTS = metrics.counter('exam_http_requests_total',
+                           'Requests by route and status code', ['route', 'method', 'status'])
+
+def observe_request(route, method, status, seconds):
+    """Record one request; also used by asgi.py for the routes it serves natively"""
+    REQUEST_SECONDS.observe(seconds, route=route, method=method)
+    REQUESTS.inc(route=route, method=method, status=status)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        # The URL rule rather than the path keeps one series per route
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+@metrics.collector
+def collect_app_metrics():
+    """Gauges read from the caches, queues, clock and janitor at scrape time"""
+    caches = {'exam': exam_cache, 'payload': payload_cache, 'results': results_cache,
+              'published': published_cache, 'fragment': fragment_cache,
+              'analysis': analysis_cache}
+    stats = {name: cache.stats() for name, cache in caches.items()}
+    for key, kind, help in (('hits', 'counter', 'Cache hits'),
+                            ('misses', 'counter', 'Cache misses'),
+                            ('evictions', 'counter', 'Cache evictions'),
+                            ('hit_rate', 'gauge', 'Cache hit rate since start'),
+                            ('entries', 'gauge', 'Cached entries'),
+                            ('bytes', 'gauge', 'Approximate bytes cached')):
+        name = f'exam_cache_{key}' + ('_total' if kind == 'counter' else '')
+        yield name, kind, help, [({'cache': cache}, s[key]) for cache, s in stats.items()]
+    
+    yield ('exam_parse_queue_pending', 'gauge', 'Parse jobs running or waiting in this worker',
+           [({}, parse_queue.pending_count())])
+    if question_bank is not None:
+        yield ('exam_question_bank_questions', 'gauge', 'Questions in the question bank (all workers)',
+               [({}, question_bank.count())])
+    yield ('exam_clock_pending', 'gauge', 'Tests with a scheduled auto-submit in this worker',
+           [({}, exam_clock.pending_count())])
+    yield ('exam_clock_auto_submitted_total', 'counter', 'Tests auto-submitted by the clock sweeper',
+           [({}, exam_clock.expired_count)])
+    
+    totals = janitor.totals
+    yield ('exam_janitor_runs_total', 'counter', 'Janitor sweeps', [({}, janitor.runs)])
+    yield ('exam_janitor_removed_files_total', 'counter', 'Files removed by the janitor',
+           [({'category': c}, totals['files'][c]) for c in CATEGORIES])
+    yield ('exam_janitor_removed_bytes_total', 'counter', 'Bytes reclaimed by the janitor',
+           [({'category': c}, totals['bytes'][c]) for c in CATEGORIES])
+    yield ('exam_janitor_purged_rows_total', 'counter', 'Database rows purged by the janitor',
+           [({'table': 'sessions'}, totals['sessions']), ({'table': 'parse_jobs'}, totals['parse_jobs']),
+            ({'table': 'exam_banks'}, totals['exam_banks'])])
+    
+    if isinstance(app.session_interface, SqlSessionInterface):
+        yield ('exam_active_sessions', 'gauge', 'Unexpired sessions (all workers)',
+               [({}, count_active_sessions(app.config['DATABASE_URL']))])
 
 def allowed_file(filename):
     """Check if uploaded file has allowed extension"""
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def load_session_data(session_id):
-    """Load questions and answers from temporary files"""
-    questions_file = os.path.join(app.config['UPLOAD_FOLDER'], f'questions_{session_id}.json')
-    answers_file = os.path.join(app.config['UPLOAD_FOLDER'], f'answers_{session_id}.json')
+def load_session_data(exam_id):
+    """Load questions and answers for a shared exam bank (cached per worker)"""
+    cached = exam_cache.get(exam_id)
+    if cached is not None:
+        return cached
     
-    try:
-        with open(questions_file, 'r') as f:
-            questions = json.load(f)
-        
-        with open(answers_file, 'r') as f:
-            answer_key = json.load(f)
-        
-        return questions, answer_key
-    except FileNotFoundError:
+    bank = exam_store.load(exam_id)
+    if bank is None:
         return None, None
+    
+    questions, answer_key, size = bank
+    exam_cache.put(exam_id, (questions, answer_key), size)
+    return questions, answer_key
+
+def load_published_exam(code):
+    """Published exam for a join code (cached per worker), or None"""
+    exam = published_cache.get(code)
+    if exam is None:
+        exam = exam_directory.get(code)
+        if exam is not None:
+            published_cache.put(code, exam, len(json.dumps(exam)))
+    return exam
+
+def reuse_or_queue_paper(exam_id, filepath, source, tags=()):
+    """
+    Return (questions, job_id) for an uploaded paper
+    
+    Reuses the parsed bank if this exact paper was seen before (and removes
+    the upload), otherwise hands the file to the background parse queue,
+    which also adds it to the question bank under source and tags.
+    Raises QueueFullError when the queue has no room.
+    """
+    questions, answer_key = load_session_data(exam_id)
+    if questions is not None:
+        logging.debug("Reusing parsed exam bank %s", exam_id)
+        os.remove(filepath)
+        if tags and question_bank is not None:
+            # Already pooled when first parsed; only the new tags need adding
+            question_bank.ingest(questions, answer_key, source, tags)
+        return questions, None
+    return None, parse_queue.submit(exam_id, filepath, source, tags)
+
+def proctor_authorized(form=None):
+    """
+    Whether this session may use the proctor pages
+    
+    Always true without an ADMIN_TOKEN. Otherwise the token must be in form,
+    or have been given earlier in this session.
+    """
+    if not app.config['ADMIN_TOKEN'] or session.get('proctor'):
+        return True
+    if form is not None and secrets.compare_digest(form.get('admin_token', ''),
+                                                   app.config['ADMIN_TOKEN']):
+        session['proctor'] = True
+        return True
+    return False
+
+def test_settings(form):
+    """Duration, marking and feedback settings from a submitted form"""
+    return {
+        'duration': int(form.get('duration', '30')),
+        'positive_marks': float(form.get('positive_marks', '1')),
+        'negative_marks': float(form.get('negative_marks', '0')),
+        'feedback_mode': form.get('feedback_mode', 'final')
+    }
+
+def begin_test(name, email, settings, exam_id, total_questions, job_id=None, exam_code=None):
+    """Store a new test for this candidate in the session (only ids, never the bank)"""
+    session['test_config'] = {
+        'name': name,
+        'email': email,
+        'duration': settings['duration'],
+        'positive_marks': settings['positive_marks'],
+        'negative_marks': settings['negative_marks'],
+        'feedback_mode': settings['feedback_mode'],
+        'total_questions': total_questions,
+        'session_id': str(uuid.uuid4()),
+        'exam_id': exam_id,
+        'job_id': job_id,
+        'exam_code': exam_code
+    }
+    
+    # Initialize test state
+    session['test_state'] = {
+        'current_question': 0,
+        'answers': {},
+        'answer_times': {},
+        'sync_seq': 0,
+        'start_time': None,
+        'completed': False,
+        # Running counts kept up to date as answers arrive (see record_answer)
+        'tally': {'correct': 0, 'incorrect': 0}
+    }
+
+def record_answer(config, state, question_num, answer, answer_key):
+    """Store one answer and move the running tally from the old answer to the new one"""
+    key = str(question_num)
+    tally = state.get('tally')
+    if tally is not None and 0 <= question_num < config['total_questions']:
+        if answer_key is None:
+            # Without the key the tally cannot be kept exact; grade from scratch at the end
+            state.pop('tally')
+        else:
+            update_tally(tally, state['answers'].get(key, ''), answer,
+                         answer_key.get(str(question_num + 1), ''))
+    state['answers'][key] = answer
+
+def complete_test(config, state, auto=False):
+    """Mark a test as submitted and freeze its score summary"""
+    state['completed'] = True
+    if auto:
+        state['auto_submitted'] = True
+    state['results'] = final_results(config, state)
+    record_item_responses(config, state)
+
+def record_item_responses(config, state):
+    """Add a submitted test to its exam's item analysis"""
+    try:
+        item_stats.record(config['exam_id'], state['results']['correct'],
+                          encode_answers(state['answers'], config['total_questions']))
+    except Exception as e:
+        # Statistics must never cost a candidate their submission
+        logging.error(f"Could not record item responses for {config.get('exam_id')}: {str(e)}")
+
+def item_analysis_report(exam_id):
+    """Item analysis of an exam, or None if its paper is not parsed yet"""
+    totals = item_stats.attempts(exam_id) or (0, 0, 0)
+    cache_key = f"{exam_id}:{totals[0]}"
+    report = analysis_cache.get(cache_key)
+    if report is None:
+        questions, answer_key = load_session_data(exam_id)
+        if questions is None:
+            return None
+        key_codes = encode_key(answer_key, len(questions))
+        report = analyze(*totals, item_stats.responses(exam_id) if totals[0] else [], key_codes)
+        analysis_cache.put(cache_key, report, len(json.dumps(report)))
+    return report
+
+def final_results(config, state):
+    """Score summary of a test, from its running tally when it has one"""
+    tally = state.get('tally')
+    if tally is not None:
+        return summarize_results(config, state, tally['correct'], tally['incorrect'])
+    
+    _, answer_key = load_session_data(config['exam_id'])
+    return grade_session(config, state, answer_key or {})
 
 def cleanup_session_data(session_id):
-    """Clean up temporary files for a session"""
-    questions_file = os.path.join(app.config['UPLOAD_FOLDER'], f'questions_{session_id}.json')
-    answers_file = os.path.join(app.config['UPLOAD_FOLDER'], f'answers_{session_id}.json')
+    """Clean up per-session temporary files (exam banks are shared and kept)"""
+    questions_file = os.path.join(app.config['LEGACY_TEMP_FOLDER'], f'questions_{session_id}.json')
+    answers_file = os.path.join(app.config['LEGACY_TEMP_FOLDER'], f'answers_{session_id}.json')
     
     for file_path in [questions_file, answers_file]:
         if os.path.exists(file_path):
@@ -51,6 +399,57 @@ def cleanup_session_data(session_id):
             except OSError:
                 pass
 
+def auto_submit_session(sid):
+    """
+    Submit an overdue test from outside a request (called by the clock sweeper)
+    
+    Returns whether a test was submitted.
+    """
+    data = app.session_interface.load(sid)
+    state = data.get('test_state') if data else None
+    # The entry may be stale: the session restarted (possibly cancelled in another
+    # worker) or its test is a new one that has not started or run out yet
+    if not state or not is_overdue(data['test_config'], state):
+        return False
+    
+    complete_test(data['test_config'], state, auto=True)
+    app.session_interface.store(sid, data, app.permanent_session_lifetime)
+    logging.info(f"Auto-submitted overdue test {data['test_config'].get('session_id')}")
+    return True
+
+exam_clock = ExamClock(auto_submit_session, grace=app.config['EXAM_CLOCK_GRACE'])
+
+def schedule_auto_submit(config, state):
+    """Register the current session's deadline with the sweeper"""
+    deadline = exam_deadline(config, state)
+    sid = getattr(session, 'sid', None)
+    # Only server-side sessions can be updated without the candidate's request
+    if deadline is not None and sid and hasattr(app.session_interface, 'store'):
+        exam_clock.schedule(sid, deadline)
+
+def is_overdue(config, state):
+    """Whether a test is still open although its time (plus grace) has run out"""
+    remaining = remaining_seconds(config, state)
+    return (not state.get('completed') and remaining is not None
+            and remaining <= -app.config['EXAM_CLOCK_GRACE'])
+
+def expire_if_overdue(config, state):
+    """Submit the current session's test if its time (plus grace) has run out"""
+    if not is_overdue(config, state):
+        return False
+    
+    complete_test(config, state, auto=True)
+    session.modified = True
+    return True
+
+def clock_event(config, state):
+    """The clock event for a session: ("submitted", ...) once over, else ("tick", ...)"""
+    if state['completed']:
+        return 'submitted', {'auto': bool(state.get('auto_submitted'))}
+    
+    remaining = remaining_seconds(config, state)
+    return 'tick', {'remaining': max(0, int(remaining)) if remaining is not None else None}
+
 @app.route('/')
 def index():
     """Home page with test configuration form"""
@@ -59,98 +458,334 @@ def index():
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Handle file upload and test configuration"""
+    # The file has already been streamed to a unique spool path and hashed;
+    # it is discarded on every path that does not hand it to a parse job.
+    # A part with no file chosen is falsy but still has a spool.
+    file = request.files.get('file')
+    spool = file.stream if file is not None else None
     try:
         # Get form data
         name = request.form.get('name', '').strip()
         email = request.form.get('email', '').strip()
-        duration = request.form.get('duration', '30')
-        positive_marks = request.form.get('positive_marks', '1')
-        negative_marks = request.form.get('negative_marks', '0')
-        feedback_mode = request.form.get('feedback_mode', 'final')
+        settings = test_settings(request.form)
+        
+        # Check if file was uploaded
+        if not file:
+            flash('No file selected', 'error')
+            return redirect(url_for('index'))
         
         # Validate required fields
         if not name or not email:
             flash('Name and email are required', 'error')
             return redirect(url_for('index'))
         
-        # Check if file was uploaded
-        if 'file' not in request.files:
-            flash('No file selected', 'error')
-            return redirect(url_for('index'))
-        
-        file = request.files['file']
         if file.filename == '':
             flash('No file selected', 'error')
             return redirect(url_for('index'))
         
-        if not allowed_file(file.filename):
+        if not allowed_file(file.filename) or not spool.is_valid():
             flash('Invalid file format. Please upload PDF or DOCX files only.', 'error')
             return redirect(url_for('index'))
         
-        # Save uploaded file temporarily
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        file.save(filepath)
+        spool.close()
+        exam_id = spool.hexdigest()
         
-        # Parse questions from file
         try:
-            questions, answer_key = parse_questions_from_file(filepath)
-            
-            if not questions:
-                flash('No questions found in the uploaded file. Please ensure questions are in Q1, Q2... format.', 'error')
-                os.remove(filepath)  # Clean up
-                return redirect(url_for('index'))
-            
-            # Store questions and answers in temporary files to avoid session size limits
-            import uuid
-            session_id = str(uuid.uuid4())
-            
-            questions_file = os.path.join(app.config['UPLOAD_FOLDER'], f'questions_{session_id}.json')
-            answers_file = os.path.join(app.config['UPLOAD_FOLDER'], f'answers_{session_id}.json')
-            
-            with open(questions_file, 'w') as f:
-                json.dump(questions, f)
-            
-            with open(answers_file, 'w') as f:
-                json.dump(answer_key, f)
-            
-            # Store only essential data in session
-            session['test_config'] = {
-                'name': name,
-                'email': email,
-                'duration': int(duration),
-                'positive_marks': float(positive_marks),
-                'negative_marks': float(negative_marks),
-                'feedback_mode': feedback_mode,
-                'total_questions': len(questions),
-                'session_id': session_id
-            }
-            
-            # Initialize test state
-            session['test_state'] = {
-                'current_question': 0,
-                'answers': {},
-                'start_time': None,
-                'completed': False
-            }
-            
-            # Clean up uploaded file
-            os.remove(filepath)
-            
-            flash(f'Successfully loaded {len(questions)} questions. Starting test...', 'success')
-            return redirect(url_for('start_test'))
-            
+            questions, job_id = reuse_or_queue_paper(exam_id, spool.path, secure_filename(file.filename))
+        except QueueFullError:
+            flash('The server is busy processing other papers. Please try again in a minute.', 'error')
+            return render_template('index.html'), 429
         except Exception as e:
-            logging.error(f"Error parsing file: {str(e)}")
+            logging.error(f"Error queueing file: {str(e)}")
             flash(f'Error parsing file: {str(e)}', 'error')
-            if os.path.exists(filepath):
-                os.remove(filepath)
             return redirect(url_for('index'))
+        spool = None
+        
+        begin_test(name, email, settings, exam_id, len(questions) if questions else 0, job_id)
+        
+        if job_id:
+            return redirect(url_for('parse_status', job_id=job_id))
+        
+        flash(f'Successfully loaded {len(questions)} questions. Starting test...', 'success')
+        return redirect(url_for('start_test'))
     
+    except HTTPException:
+        # Oversized or wrong-type uploads rejected while streaming
+        raise
     except Exception as e:
         logging.error(f"Upload error: {str(e)}")
         flash('An error occurred during file upload', 'error')
         return redirect(url_for('index'))
+    finally:
+        if spool is not None:
+            spool.discard()
+
+@app.route('/parse_status/<job_id>')
+def parse_status(job_id):
+    """Report background parsing progress, then move on to the test"""
+    config = session.get('test_config')
+    if not config or config.get('job_id') != job_id:
+        flash('Please upload a test file first', 'error')
+        return redirect(url_for('index'))
+    
+    status = parse_queue.status(job_id)
+    if status is None:
+        status = {'state': 'error', 'error': 'Parsing job not found'}
+    
+    if status['state'] == 'done':
+        config['total_questions'] = status['total_questions']
+        config['job_id'] = None
+        session.modified = True
+        flash(f'Successfully loaded {status["total_questions"]} questions. Starting test...', 'success')
+    elif status['state'] == 'error':
+        session.pop('test_config', None)
+        session.pop('test_state', None)
+        flash(status['error'], 'error')
+    
+    if request.args.get('format') == 'json':
+        if status['state'] == 'done':
+            status['redirect'] = url_for('start_test')
+        elif status['state'] == 'error':
+            status['redirect'] = url_for('index')
+        return jsonify(status)
+    
+    if status['state'] == 'done':
+        return redirect(url_for('start_test'))
+    if status['state'] == 'error':
+        return redirect(url_for('index'))
+    
+    return render_template('parse_status.html', job_id=job_id, status=status)
+
+@app.route('/admin/publish', methods=['GET', 'POST'])
+def publish_exam():
+    """Proctor form: publish a paper once and get a join code for candidates"""
+    token_required = not proctor_authorized()
+    if request.method == 'GET':
+        return render_template('publish.html', token_required=token_required)
+    
+    file = request.files.get('file')
+    spool = file.stream if file is not None else None
+    try:
+        if not proctor_authorized(request.form):
+            flash('Invalid proctor key', 'error')
+            return render_template('publish.html', token_required=token_required), 403
+        
+        title = request.form.get('title', '').strip()
+        if not title:
+            flash('Exam title is required', 'error')
+            return redirect(url_for('publish_exam'))
+        
+        if not file or file.filename == '':
+            flash('No file selected', 'error')
+            return redirect(url_for('publish_exam'))
+        
+        if not allowed_file(file.filename) or not spool.is_valid():
+            flash('Invalid file format. Please upload PDF or DOCX files only.', 'error')
+            return redirect(url_for('publish_exam'))
+        
+        try:
+            settings = dict(test_settings(request.form), title=title)
+        except ValueError:
+            flash('Invalid duration or marks', 'error')
+            return redirect(url_for('publish_exam'))
+        
+        spool.close()
+        exam_id = spool.hexdigest()
+        _, job_id = reuse_or_queue_paper(exam_id, spool.path, secure_filename(file.filename),
+                                         parse_tags(request.form.get('tags', '')))
+        spool = None
+        
+        code = exam_directory.publish(exam_id, settings, job_id)
+        session['published_exams'] = session.get('published_exams', []) + [code]
+        return redirect(url_for('published_exam', code=code))
+    
+    except QueueFullError:
+        flash('The server is busy processing other papers. Please try again in a minute.', 'error')
+        return render_template('publish.html', token_required=token_required), 429
+    except HTTPException:
+        # Oversized or wrong-type uploads rejected while streaming
+        raise
+    except Exception as e:
+        logging.error(f"Publish error: {str(e)}")
+        flash('An error occurred while publishing the exam', 'error')
+        return redirect(url_for('publish_exam'))
+    finally:
+        if spool is not None:
+            spool.discard()
+
+# Most questions listed on the question bank page for one search
+BANK_SEARCH_LIMIT = 50
+
+@app.route('/admin/bank', methods=['GET', 'POST'])
+def question_bank_page():
+    """Proctor view of the question bank: search it and assemble new exams from it"""
+    if question_bank is None:
+        flash('The question bank is disabled', 'error')
+        return redirect(url_for('publish_exam'))
+    
+    if request.method == 'POST':
+        if not proctor_authorized(request.form):
+            flash('Invalid proctor key', 'error')
+            return render_template('bank.html', locked=True), 403
+        return redirect(url_for('question_bank_page'))
+    
+    if not proctor_authorized():
+        return render_template('bank.html', locked=True)
+    
+    query = request.args.get('q', '').strip()
+    tags = parse_tags(request.args.get('tags', ''))
+    source = request.args.get('source', '').strip()
+    started = time.perf_counter()
+    matched, questions = question_bank.search(query, tags, source or None, limit=BANK_SEARCH_LIMIT)
+    search_ms = (time.perf_counter() - started) * 1000
+    
+    return render_template('bank.html', locked=False, stats=question_bank.stats(),
+                           query=query, tags=', '.join(tags), source=source,
+                           matched=matched, questions=questions, search_ms=search_ms,
+                           stratify_choices=STRATIFY_CHOICES)
+
+@app.route('/admin/bank/assemble', methods=['POST'])
+def assemble_exam():
+    """Draw a new exam from the question bank and publish it under a join code"""
+    if question_bank is None or not proctor_authorized():
+        flash('Please enter the proctor key first', 'error')
+        return redirect(url_for('question_bank_page'))
+    
+    query = request.form.get('q', '').strip()
+    tags = parse_tags(request.form.get('tags', ''))
+    source = request.form.get('source', '').strip()
+    filters = {'q': query, 'tags': ', '.join(tags), 'source': source}
+    
+    title = request.form.get('title', '').strip()
+    if not title:
+        flash('Exam title is required', 'error')
+        return redirect(url_for('question_bank_page', **filters))
+    
+    try:
+        count = int(request.form.get('count', '0'))
+        settings = dict(test_settings(request.form), title=title)
+    except ValueError:
+        flash('Invalid question count, duration or marks', 'error')
+        return redirect(url_for('question_bank_page', **filters))
+    
+    stratify = request.form.get('stratify') or None
+    try:
+        questions, answer_key = question_bank.assemble(count, query, tags, source or None, stratify)
+    except ValueError as e:
+        flash(str(e), 'error')
+        return redirect(url_for('question_bank_page', **filters))
+    
+    # Content-addressed like uploaded papers, by the assembled exam itself
+    exam_id = hashlib.sha256(json.dumps([questions, answer_key], sort_keys=True)
+                             .encode('utf-8')).hexdigest()
+    exam_store.save(exam_id, questions, answer_key)
+    code = exam_directory.publish(exam_id, settings)
+    session['published_exams'] = session.get('published_exams', []) + [code]
+    return redirect(url_for('published_exam', code=code))
+
+@app.route('/admin/exams/<code>')
+def published_exam(code):
+    """Join code, link and parsing progress of an exam this proctor published"""
+    if code not in session.get('published_exams', []):
+        flash('Exam not found', 'error')
+        return redirect(url_for('publish_exam'))
+    
+    exam = load_published_exam(code)
+    if exam is None:
+        flash('Exam not found', 'error')
+        return redirect(url_for('publish_exam'))
+    
+    questions, _ = load_session_data(exam['exam_id'])
+    status = None
+    if questions is None:
+        status = parse_queue.status(exam['job_id']) if exam['job_id'] else None
+        if status is None:
+            status = {'state': 'error', 'error': 'Parsing job not found'}
+    
+    return render_template('published.html', exam=exam, status=status,
+                           total_questions=len(questions) if questions is not None else None,
+                           join_url=url_for('join_exam', code=code, _external=True))
+
+@app.route('/admin/exams/<code>/items')
+def published_exam_items(code):
+    """
+    Item analysis of an exam this proctor published, as JSON
+    
+    Difficulty, discrimination and distractor rates per question plus KR-20
+    reliability over every submission of the exam's paper so far (see
+    utils.item_analysis). Served from running sums, so the cost does not
+    grow with the number of attempts.
+    """
+    if code not in session.get('published_exams', []):
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    exam = load_published_exam(code)
+    if exam is None:
+        return jsonify({'error': 'Exam not found'}), 404
+    
+    report = item_analysis_report(exam['exam_id'])
+    if report is None:
+        status = parse_queue.status(exam['job_id']) if exam['job_id'] else None
+        if status and status['state'] in ('queued', 'running'):
+            return jsonify({'error': 'Exam is still being parsed'}), 409
+        return jsonify({'error': 'Exam is not available'}), 404
+    return jsonify(dict(report, code=code))
+
+@app.route('/join')
+def join_by_code():
+    """Join form on the home page: go to the exam for the typed code"""
+    code = request.args.get('code', '').strip().upper()
+    if not code:
+        flash('Please enter an exam code', 'error')
+        return redirect(url_for('index'))
+    return redirect(url_for('join_exam', code=code))
+
+@app.route('/join/<code>', methods=['GET', 'POST'])
+def join_exam(code):
+    """
+    Join a published exam
+    
+    Candidates share the published bank and settings; joining only creates
+    their session (both lookups are served from the per-worker caches), so
+    a whole cohort can join at once without any parsing.
+    """
+    code = code.upper()
+    exam = load_published_exam(code)
+    if exam is None:
+        flash('Unknown exam code', 'error')
+        return redirect(url_for('index'))
+    
+    config = session.get('test_config')
+    if config and config.get('exam_code') == code and not session['test_state']['completed']:
+        return redirect(url_for('start_test'))
+    
+    questions, _ = load_session_data(exam['exam_id'])
+    job_id = None
+    if questions is None:
+        # Published moments ago: wait for the proctor's parse job like an upload would.
+        # With no job running the bank is gone for good.
+        status = parse_queue.status(exam['job_id']) if exam['job_id'] else None
+        if not status or status['state'] not in ('queued', 'running'):
+            flash('This exam is not available. Please contact your proctor.', 'error')
+            return redirect(url_for('index'))
+        job_id = exam['job_id']
+    
+    if request.method == 'GET':
+        return render_template('join.html', exam=exam,
+                               total_questions=len(questions) if questions is not None else None)
+    
+    name = request.form.get('name', '').strip()
+    email = request.form.get('email', '').strip()
+    if not name or not email:
+        flash('Name and email are required', 'error')
+        return redirect(url_for('join_exam', code=code))
+    
+    begin_test(name, email, exam['settings'], exam['exam_id'],
+               len(questions) if questions is not None else 0, job_id, exam_code=code)
+    
+    if job_id:
+        return redirect(url_for('parse_status', job_id=job_id))
+    return redirect(url_for('start_test'))
 
 @app.route('/test')
 def start_test():
@@ -159,15 +794,27 @@ def start_test():
         flash('Please upload a test file first', 'error')
         return redirect(url_for('index'))
     
+    if session['test_config'].get('job_id'):
+        return redirect(url_for('parse_status', job_id=session['test_config']['job_id']))
+    
     # Initialize start time if not set
     if session['test_state']['start_time'] is None:
-        import time
         session['test_state']['start_time'] = time.time()
         session.modified = True
     
+    config = session['test_config']
+    state = session['test_state']
+    if state['completed'] or expire_if_overdue(config, state):
+        if state.get('auto_submitted'):
+            flash('Time is up. Your test was submitted automatically.', 'info')
+        return redirect(url_for('results'))
+    
+    schedule_auto_submit(config, state)
+    
     return render_template('test.html', 
-                         config=session['test_config'],
-                         state=session['test_state'])
+                         config=config,
+                         state=state,
+                         remaining=max(0, int(remaining_seconds(config, state))))
 
 @app.route('/submit_answer', methods=['POST'])
 def submit_answer():
@@ -175,20 +822,26 @@ def submit_answer():
     if 'test_config' not in session or 'test_state' not in session:
         return jsonify({'error': 'Test session not found'}), 400
     
+    if session['test_state']['completed']:
+        return jsonify({'error': 'Test already submitted'}), 409
+    
+    if expire_if_overdue(session['test_config'], session['test_state']):
+        return jsonify({'error': 'Time is up', 'redirect': url_for('results')}), 409
+    
     try:
         question_num = int(request.form.get('question_num', 0))
         answer = request.form.get('answer', '')
         
-        # Store answer (use string key for consistency)
-        session['test_state']['answers'][str(question_num)] = answer
-        session.modified = True
-        
         config = session['test_config']
         state = session['test_state']
+        _, answer_key = load_session_data(config['exam_id'])
+        
+        # Store answer (use string key for consistency)
+        record_answer(config, state, question_num, answer, answer_key)
+        session.modified = True
         
         # Check if immediate feedback is enabled
         if config['feedback_mode'] == 'immediate':
-            questions, answer_key = load_session_data(config['session_id'])
             if answer_key:
                 correct_answer = answer_key.get(str(question_num + 1), '')
                 is_correct = answer.upper() == correct_answer.upper()
@@ -210,6 +863,85 @@ def submit_answer():
         logging.error(f"Error submitting answer: {str(e)}")
         return jsonify({'error': 'Failed to submit answer'}), 500
 
+@app.route('/sync_answers', methods=['POST'])
+def sync_answers():
+    """
+    Apply a batch of answer changes from the client
+    
+    Expects JSON: {"seq": n, "current_question": i,
+                   "changes": [{"question_num": i, "answer": "A", "timestamp": ms}, ...]}
+    Batches are applied at most once: a seq at or below the last applied one
+    is acknowledged without being re-applied, and per-question timestamps
+    make sure an older change never overwrites a newer one.
+    """
+    if 'test_config' not in session or 'test_state' not in session:
+        return jsonify({'error': 'Test session not found'}), 400
+    
+    config = session['test_config']
+    state = session['test_state']
+    if state['completed']:
+        return jsonify({'error': 'Test already submitted'}), 409
+    
+    if expire_if_overdue(config, state):
+        return jsonify({'error': 'Time is up', 'redirect': url_for('results')}), 409
+    
+    payload = request.get_json(force=True, silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'error': 'Invalid sync payload'}), 400
+    
+    try:
+        seq = int(payload.get('seq', 0))
+        changes = payload.get('changes') or []
+        
+        last_seq = state.get('sync_seq', 0)
+        if seq <= last_seq:
+            return jsonify({'success': True, 'seq': last_seq, 'duplicate': True})
+        
+        answer_times = state.setdefault('answer_times', {})
+        feedback = {}
+        answer_key = None
+        if changes:
+            _, answer_key = load_session_data(config['exam_id'])
+        
+        for change in changes:
+            question_num = int(change['question_num'])
+            if question_num < 0 or question_num >= config['total_questions']:
+                continue
+            
+            key = str(question_num)
+            timestamp = float(change.get('timestamp', 0))
+            if timestamp < answer_times.get(key, 0):
+                continue
+            
+            answer = str(change.get('answer', ''))
+            record_answer(config, state, question_num, answer, answer_key)
+            answer_times[key] = timestamp
+            
+            if answer_key and config['feedback_mode'] == 'immediate':
+                correct_answer = answer_key.get(str(question_num + 1), '')
+                feedback[key] = {
+                    'correct': answer.upper() == correct_answer.upper(),
+                    'correct_answer': correct_answer,
+                    'user_answer': answer
+                }
+        
+        current_question = payload.get('current_question')
+        if current_question is not None:
+            state['current_question'] = max(0, min(int(current_question),
+                                                   config['total_questions'] - 1))
+        
+        state['sync_seq'] = seq
+        session.modified = True
+        
+        response = {'success': True, 'seq': seq}
+        if feedback:
+            response['feedback'] = feedback
+        return jsonify(response)
+    
+    except (KeyError, TypeError, ValueError) as e:
+        logging.error(f"Error syncing answers: {str(e)}")
+        return jsonify({'error': 'Invalid sync payload'}), 400
+
 @app.route('/next_question', methods=['POST'])
 def next_question():
     """Move to next question"""
@@ -250,7 +982,7 @@ def get_question(question_num):
         return jsonify({'error': 'Test session not found'}), 400
     
     config = session['test_config']
-    questions, _ = load_session_data(config['session_id'])
+    questions, _ = load_session_data(config['exam_id'])
     
     if not questions or question_num < 0 or question_num >= len(questions):
         return jsonify({'error': 'Question not found'}), 404
@@ -260,6 +992,112 @@ def get_question(question_num):
         'question': questions[question_num]
     })
 
+QUESTION_PAGE_CACHE_CONTROL = 'private, max-age=86400, immutable'
+
+def question_page_bounds(total, offset=None, limit=None):
+    """Clamp offset/limit query values to the bank; raises ValueError if not integers"""
+    offset = max(0, int(offset if offset is not None else 0))
+    limit = int(limit if limit is not None else total)
+    return offset, max(0, min(limit, total - offset))
+
+def question_page_etag(exam_id, offset, limit, use_gzip):
+    encoding = 'gzip' if use_gzip else 'identity'
+    return f"{exam_id[:32]}-v{PARSER_VERSION}-{offset}-{limit}-{encoding}"
+
+def question_page_cache_key(exam_id, offset, limit, use_gzip):
+    return f"{exam_id}:{offset}:{limit}:{'gzip' if use_gzip else 'identity'}"
+
+def question_page_body(exam_id, offset, limit, use_gzip):
+    """Serialized (optionally gzipped) page of questions, or None if the bank is missing"""
+    cache_key = question_page_cache_key(exam_id, offset, limit, use_gzip)
+    body = payload_cache.get(cache_key)
+    if body is not None:
+        return body
+    
+    questions, _ = load_session_data(exam_id)
+    if questions is None:
+        return None
+    
+    body = json.dumps({
+        'success': True,
+        'total': len(questions),
+        'offset': offset,
+        'limit': limit,
+        'questions': questions[offset:offset + limit]
+    }, separators=(',', ':')).encode('utf-8')
+    if use_gzip:
+        body = gzip.compress(body, compresslevel=6, mtime=0)
+    payload_cache.put(cache_key, body, len(body))
+    return body
+
+@app.route('/exam/<session_id>/questions')
+def exam_questions(session_id):
+    """
+    Return questions (never answers) in bulk so the client can prefetch them
+    
+    Optional offset/limit query parameters select a page of a large bank.
+    The bank behind a session never changes, so responses carry a strong
+    ETag derived from the paper's content hash and can be cached for a day.
+    """
+    config = session.get('test_config')
+    if not config or config.get('session_id') != session_id or not config.get('exam_id'):
+        return jsonify({'error': 'Test session not found'}), 404
+    
+    try:
+        offset, limit = question_page_bounds(config['total_questions'],
+                                             request.args.get('offset'), request.args.get('limit'))
+    except ValueError:
+        return jsonify({'error': 'Invalid offset or limit'}), 400
+    
+    use_gzip = 'gzip' in request.accept_encodings
+    etag = question_page_etag(config['exam_id'], offset, limit, use_gzip)
+    
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        body = question_page_body(config['exam_id'], offset, limit, use_gzip)
+        if body is None:
+            return jsonify({'error': 'Questions not found'}), 404
+        
+        response = make_response(body)
+        response.mimetype = 'application/json'
+        if use_gzip:
+            response.headers['Content-Encoding'] = 'gzip'
+    
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = QUESTION_PAGE_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding, Cookie'
+    return response
+
+@app.route('/exam/<session_id>/clock')
+def exam_clock_events(session_id):
+    """
+    Server-sent clock event for the test page
+    
+    Sends the authoritative remaining time as a "tick" event, or "submitted"
+    once the test is over, then ends the response with a retry hint so the
+    browser's EventSource reconnects after CLOCK_PUSH_INTERVAL seconds (or
+    at the deadline, if sooner) instead of the page polling every second.
+    Under asgi.py the stream is held open and pushed to instead.
+    """
+    config = session.get('test_config')
+    state = session.get('test_state')
+    if not config or not state or config.get('session_id') != session_id:
+        return jsonify({'error': 'Test session not found'}), 404
+    
+    expire_if_overdue(config, state)
+    event, data = clock_event(config, state)
+    
+    retry = app.config['CLOCK_PUSH_INTERVAL']
+    remaining = remaining_seconds(config, state)
+    if remaining is not None:
+        retry = min(retry, remaining + app.config['EXAM_CLOCK_GRACE'])
+    
+    response = app.response_class(format_sse(event, data, retry_ms=int(max(1, retry) * 1000)),
+                                  mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.route('/submit_test', methods=['POST'])
 def submit_test():
     """Submit the complete test"""
@@ -267,12 +1105,17 @@ def submit_test():
         flash('Test session not found', 'error')
         return redirect(url_for('index'))
     
-    # Mark test as completed
-    session['test_state']['completed'] = True
+    # Mark test as completed and freeze its score
+    if not session['test_state']['completed']:
+        complete_test(session['test_config'], session['test_state'])
     session.modified = True
+    exam_clock.cancel(getattr(session, 'sid', None))
     
     return redirect(url_for('results'))
 
+RESULTS_PAGE_SIZE = 50
+RESULT_FILTERS = ('all', 'correct', 'incorrect', 'unanswered')
+
 @app.route('/results')
 def results():
     """Display test results"""
@@ -280,75 +1123,69 @@ def results():
         flash('Test session not found', 'error')
         return redirect(url_for('index'))
     
-    if not session['test_state']['completed']:
+    if (not session['test_state']['completed'] and
+            not expire_if_overdue(session['test_config'], session['test_state'])):
         flash('Please complete the test first', 'error')
         return redirect(url_for('start_test'))
     
     config = session['test_config']
     state = session['test_state']
     
-    # Calculate results
-    results = calculate_results(config, state)
+    # Sessions completed before scores were frozen at submit time
+    if 'results' not in state:
+        state['results'] = final_results(config, state)
+        session.modified = True
+    
+    status_filter = request.args.get('status', 'all')
+    if status_filter not in RESULT_FILTERS:
+        status_filter = 'all'
+    page = max(request.args.get('page', 1, type=int), 1)
+    
+    breakdown = results_breakdown(config, state, status_filter, page)
     
     return render_template('results.html', 
                          config=config,
                          state=state,
-                         results=results)
-
-def calculate_results(config, state):
-    """Calculate test results with scoring"""
-    results = {
-        'total_questions': config['total_questions'],
-        'attempted': len(state['answers']),
-        'correct': 0,
-        'incorrect': 0,
-        'unanswered': 0,
-        'total_score': 0,
-        'percentage': 0,
-        'question_results': []
-    }
-    
-    # Load questions and answers from session data
-    questions, answer_key = load_session_data(config['session_id'])
+                         results=state['results'],
+                         breakdown=breakdown,
+                         status_filter=status_filter)
+
+def question_statuses(config, state, answer_key):
+    """Status name of every question, memoized since a completed test can no longer change"""
+    cache_key = f"{config['session_id']}:{config['positive_marks']}:{config['negative_marks']}"
+    statuses = results_cache.get(cache_key)
+    if statuses is None:
+        statuses = [STATUS_NAMES[status] for status in session_statuses(config, state, answer_key)]
+        results_cache.put(cache_key, statuses, len(json.dumps(statuses)))
+    return statuses
+
+def results_breakdown(config, state, status_filter, page):
+    """One page of the question-wise analysis, filtered by status"""
+    questions, answer_key = load_session_data(config['exam_id'])
     if not questions or not answer_key:
-        logging.error("Failed to load session data for results calculation")
-        return results
+        logging.error("Failed to load session data for results breakdown")
+        return {'rows': [], 'page': 1, 'pages': 1, 'matched': 0}
     
-    for i in range(config['total_questions']):
-        question_num = i + 1
-        user_answer = state['answers'].get(str(i), '')
-        correct_answer = answer_key.get(str(question_num), '')
-        
-        if not user_answer:
-            status = 'unanswered'
-            score = 0
-            results['unanswered'] += 1
-        elif user_answer.upper() == correct_answer.upper():
-            status = 'correct'
-            score = config['positive_marks']
-            results['correct'] += 1
-        else:
-            status = 'incorrect'
-            score = -config['negative_marks']
-            results['incorrect'] += 1
-        
-        results['total_score'] += score
-        
-        results['question_results'].append({
-            'question_num': question_num,
-            'question': questions[i] if i < len(questions) else {},
-            'user_answer': user_answer,
-            'correct_answer': correct_answer,
-            'status': status,
-            'score': score
-        })
+    statuses = question_statuses(config, state, answer_key)
+    indices = [i for i, status in enumerate(statuses)
+               if status_filter == 'all' or status == status_filter]
+    pages = max(1, -(-len(indices) // RESULTS_PAGE_SIZE))
+    page = min(page, pages)
     
-    # Calculate percentage
-    max_possible_score = config['total_questions'] * config['positive_marks']
-    if max_possible_score > 0:
-        results['percentage'] = max(0, (results['total_score'] / max_possible_score) * 100)
+    marks = {'correct': config['positive_marks'], 'incorrect': -config['negative_marks'], 'unanswered': 0}
+    rows = []
+    for i in indices[(page - 1) * RESULTS_PAGE_SIZE:page * RESULTS_PAGE_SIZE]:
+        rows.append({
+            'question_num': i + 1,
+            'question': questions[i].get('question', '') if i < len(questions) else '',
+            'options': questions[i].get('options', {}) if i < len(questions) else {},
+            'user_answer': state['answers'].get(str(i), ''),
+            'correct_answer': answer_key.get(str(i + 1), ''),
+            'status': statuses[i],
+            'score': marks[statuses[i]]
+        })
     
-    return results
+    return {'rows': rows, 'page': page, 'pages': pages, 'matched': len(indices)}
 
 @app.route('/restart')
 def restart():
@@ -357,14 +1194,70 @@ def restart():
     if 'test_config' in session and 'session_id' in session['test_config']:
         cleanup_session_data(session['test_config']['session_id'])
     
+    exam_clock.cancel(getattr(session, 'sid', None))
     session.clear()
     flash('Test session cleared. You can start a new test.', 'info')
     return redirect(url_for('index'))
 
+@app.route('/assets/<path:filename>')
+def fingerprinted_asset(filename):
+    """Static file under its content-hashed name, in the best encoding the client accepts"""
+    asset = static_assets.lookup(filename)
+    if asset is None:
+        return 'Not found', 404
+    
+    encoding, body = asset.negotiate(request.accept_encodings)
+    etag = f"{asset.digest}-{encoding}"
+    if etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+        response.headers['Content-Type'] = asset.content_type
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = ASSET_CACHE_CONTROL
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Metrics for this worker in the Prometheus text format"""
+    response = app.response_class(metrics.render(), mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 @app.errorhandler(413)
 def too_large(e):
     flash('File too large. Please upload a file smaller than 16MB.', 'error')
     return redirect(url_for('index'))
 
+@app.errorhandler(415)
+def unsupported_file(e):
+    flash('Invalid file format. Please upload PDF or DOCX files only.', 'error')
+    return redirect(url_for('index'))
+
+def warm_up():
+    """
+    Do the one-off work otherwise paid by the first requests of a cold worker
+    
+    Imports the parser libraries and numpy, creates the database tables and
+    loads the question bank index. With `gunicorn --preload` and
+    PRELOAD_PARSERS=1 this runs once in the master, and forked workers and
+    parse processes share the loaded modules and index.
+    """
+    preload_parsers()
+    if NUMPY_AVAILABLE:
+        import numpy
+    if question_bank is not None:
+        question_bank.refresh(force=True)
+    # Pooled connections must not be shared with forked workers
+    get_engine(app.config['DATABASE_URL']).dispose()
+
+if os.environ.get('PRELOAD_PARSERS') == '1':
+    warm_up()
+
 if __name__ == '__main__':
+    static_assets.auto_reload = True
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,259 @@
+"""
+ASGI entry point for serving the exam simulator asynchronously
+
+    gunicorn -k uvicorn.workers.UvicornWorker -w 2 --bind 0.0.0.0:5000 asgi:app
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+The read-heavy JSON routes hit by every candidate at exam start
+(/get_question/<n> and /exam/<session_id>/questions) and the exam clock's
+server-sent event stream (/exam/<session_id>/clock) are served natively on
+the event loop: a question from a cached bank is answered without leaving
+the loop, session and exam bank lookups that have to touch the database or
+disk run on a bounded I/O thread pool, and each candidate's clock stream is
+one idle connection that is pushed a tick every CLOCK_PUSH_INTERVAL seconds
+and a "submitted" event at the deadline. Every other route, including
+/results, is handed to the Flask app through a2wsgi's WSGI bridge on its own
+thread pool. Idle and slow connections are held by the event loop instead
+of a worker, and parsing stays on the ParseJobQueue process pool.
+
+Requires the optional a2wsgi and uvicorn packages; `gunicorn main:app`
+keeps working without them.
+"""
+import asyncio
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from a2wsgi import WSGIMiddleware
+from werkzeug.http import parse_accept_header, parse_cookie, parse_etags, quote_etag
+
+from app import (QUESTION_PAGE_CACHE_CONTROL, app as flask_app, auto_submit_session, clock_event,
+                 exam_cache, is_overdue, load_session_data, observe_request, payload_cache,
+                 question_page_body, question_page_bounds, question_page_cache_key,
+                 question_page_etag)
+from utils.exam_clock import format_sse, remaining_seconds
+
+flask_app.config['ASYNC_IO_WORKERS'] = int(os.environ.get('ASYNC_IO_WORKERS', 16))
+flask_app.config['WSGI_WORKERS'] = int(os.environ.get('WSGI_WORKERS', 16))
+
+GET_QUESTION_PATH = re.compile(r'^/get_question/(\d+)$')
+EXAM_QUESTIONS_PATH = re.compile(r'^/exam/([^/]+)/questions$')
+EXAM_CLOCK_PATH = re.compile(r'^/exam/([^/]+)/clock$')
+
+
+class ExamAsgiApp:
+    """ASGI app serving the question read and clock routes natively and the rest through Flask"""
+
+    def __init__(self, flask_app, io_workers: int = 16, wsgi_workers: int = 16):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_workers)
+        self.io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix='exam-io')
+        self.cookie_name = flask_app.session_interface.get_cookie_name(flask_app)
+        # The native routes need to read sessions without a Flask request
+        self.native = hasattr(flask_app.session_interface, 'load')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+
+        if self.native and scope['type'] == 'http' and scope['method'] == 'GET':
+            match = GET_QUESTION_PATH.match(scope['path'])
+            if match:
+                return await self.timed('/get_question/<int:question_num>', send, self.get_question,
+                                        scope, int(match.group(1)))
+            match = EXAM_QUESTIONS_PATH.match(scope['path'])
+            if match:
+                return await self.timed('/exam/<session_id>/questions', send, self.exam_questions,
+                                        scope, match.group(1))
+            # Not timed: the stream stays open for the whole test
+            match = EXAM_CLOCK_PATH.match(scope['path'])
+            if match:
+                return await self.exam_clock_stream(scope, receive, send, match.group(1))
+
+        await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.io_executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def timed(self, route, send, handler, scope, *args):
+        """Run a native handler, recording it under the same route label Flask uses"""
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_and_capture(message):
+            if message['type'] == 'http.response.start':
+                status[0] = message['status']
+            await send(message)
+
+        try:
+            await handler(scope, send_and_capture, *args)
+        finally:
+            observe_request(route, 'GET', status[0], time.perf_counter() - started)
+
+    async def run_io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.io_executor, fn, *args)
+
+    def session_id(self, headers):
+        return parse_cookie(headers.get('cookie', '')).get(self.cookie_name)
+
+    async def load_session(self, headers):
+        sid = self.session_id(headers)
+        if not sid:
+            return {}
+        return await self.run_io(self.flask_app.session_interface.load, sid) or {}
+
+    async def load_bank(self, exam_id):
+        cached = exam_cache.get(exam_id)
+        if cached is not None:
+            return cached
+        return await self.run_io(load_session_data, exam_id)
+
+    async def get_question(self, scope, send, question_num):
+        """Native equivalent of app.get_question"""
+        session = await self.load_session(_headers(scope))
+        config = session.get('test_config')
+        if config is None:
+            return await _send_json(send, {'error': 'Test session not found'}, 400)
+
+        questions, _ = await self.load_bank(config['exam_id'])
+        if not questions or question_num >= len(questions):
+            return await _send_json(send, {'error': 'Question not found'}, 404)
+
+        await _send_json(send, {'success': True, 'question': questions[question_num]})
+
+    async def exam_questions(self, scope, send, session_id):
+        """Native equivalent of app.exam_questions"""
+        headers = _headers(scope)
+        config = (await self.load_session(headers)).get('test_config')
+        if not config or config.get('session_id') != session_id or not config.get('exam_id'):
+            return await _send_json(send, {'error': 'Test session not found'}, 404)
+
+        query = parse_qs(scope['query_string'].decode('latin-1'))
+        try:
+            offset, limit = question_page_bounds(config['total_questions'],
+                                                 query.get('offset', [None])[0],
+                                                 query.get('limit', [None])[0])
+        except ValueError:
+            return await _send_json(send, {'error': 'Invalid offset or limit'}, 400)
+
+        exam_id = config['exam_id']
+        use_gzip = 'gzip' in parse_accept_header(headers.get('accept-encoding'))
+        etag = question_page_etag(exam_id, offset, limit, use_gzip)
+        response_headers = [
+            ('etag', quote_etag(etag)),
+            ('cache-control', QUESTION_PAGE_CACHE_CONTROL),
+            ('vary', 'Accept-Encoding, Cookie'),
+        ]
+
+        if parse_etags(headers.get('if-none-match')).contains(etag):
+            return await _send(send, 304, None, response_headers)
+
+        body = payload_cache.get(question_page_cache_key(exam_id, offset, limit, use_gzip))
+        if body is None:
+            body = await self.run_io(question_page_body, exam_id, offset, limit, use_gzip)
+        if body is None:
+            return await _send_json(send, {'error': 'Questions not found'}, 404)
+
+        response_headers.append(('content-type', 'application/json'))
+        if use_gzip:
+            response_headers.append(('content-encoding', 'gzip'))
+        await _send(send, 200, body, response_headers)
+
+    async def exam_clock_stream(self, scope, receive, send, session_id):
+        """Long-lived equivalent of app.exam_clock_events"""
+        headers = _headers(scope)
+        session = await self.load_session(headers)
+        config = session.get('test_config')
+        state = session.get('test_state')
+        if not config or not state or config.get('session_id') != session_id:
+            return await _send_json(send, {'error': 'Test session not found'}, 404)
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-store'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+
+        grace = self.flask_app.config['EXAM_CLOCK_GRACE']
+        interval = self.flask_app.config['CLOCK_PUSH_INTERVAL']
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        try:
+            while True:
+                remaining = remaining_seconds(config, state)
+                if is_overdue(config, state):
+                    await self.run_io(auto_submit_session, self.session_id(headers))
+                    # Report whatever is stored now: this or another worker may have submitted it
+                    config, state = await self._reload_test(headers, session_id)
+                    if state is None:
+                        return await _end_stream(send)
+                    continue
+
+                event, data = clock_event(config, state)
+                done = event == 'submitted'
+                await send({'type': 'http.response.body',
+                            'body': format_sse(event, data).encode('utf-8'),
+                            'more_body': not done})
+                if done:
+                    return
+
+                # Sleep until the next periodic tick or the deadline, whichever is first
+                wait = interval if remaining is None else min(interval, remaining + grace)
+                await asyncio.wait({disconnected}, timeout=max(1, wait))
+                if disconnected.done():
+                    return
+
+                # The candidate may have submitted or restarted meanwhile
+                config, state = await self._reload_test(headers, session_id)
+                if state is None:
+                    return await _end_stream(send)
+        finally:
+            disconnected.cancel()
+
+    async def _reload_test(self, headers, session_id):
+        """(config, state) of the test session_id as stored now, or (None, None) once it is gone"""
+        session = await self.load_session(headers)
+        config = session.get('test_config')
+        if not config or 'test_state' not in session or config.get('session_id') != session_id:
+            return None, None
+        return config, session['test_state']
+
+
+async def _end_stream(send):
+    await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _headers(scope):
+    return {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+
+
+async def _send(send, status, body, headers):
+    headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+    if body is not None:
+        headers.append((b'content-length', str(len(body)).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body or b''})
+
+
+async def _send_json(send, data, status=200):
+    body = json.dumps(data, separators=(',', ':')).encode('utf-8')
+    await _send(send, status, body, [('content-type', 'application/json')])
+
+
+app = ExamAsgiApp(flask_app,
+                  io_workers=flask_app.config['ASYNC_IO_WORKERS'],
+                  wsgi_workers=flask_app.config['WSGI_WORKERS'])
@@ -0,0 +1,410 @@
+"""
+Simulated-candidate load test of the full exam flow
+
+Usage:
+    python benchmarks/bench_candidates.py [--levels 25,50,100,200,400] [--duration 30]
+        [--questions 20] [--think-median 20] [--time-scale 0.05]
+        [--workers 2] [--worker-class sync|gthread|uvicorn] [--threads 4]
+        [--url http://127.0.0.1:5000] [--paper PATH] [--save results.json]
+
+Unless --url is given, a gunicorn serving the app is spawned on a free local
+port with a throwaway SQLite database and upload folder, and stopped at the
+end. One unrecorded exam is taken first so the paper is already parsed.
+At each level, that many simulated candidates run concurrently for
+--duration seconds. Each one walks the real route sequence as a fresh
+session:
+
+    POST /upload -> (poll /parse_status) -> GET /test
+    -> --questions x (GET /get_question/<n>, think, POST /submit_answer,
+                      POST /next_question)
+    -> POST /submit_test -> GET /results
+
+It then starts over as a new candidate. Think times are log-normal with
+median --think-median seconds and shape --think-sigma, multiplied by
+--time-scale so a run stays short. With the defaults a candidate thinks
+about a second per question, so 400 candidates offer roughly the load of
+8000 real ones at 20 s per question. About one question in ten is left
+unanswered.
+
+For every level the script reports throughput, error rate, finished exams
+and p50/p95/p99 latency per route. It then names the saturation point: the
+first level where throughput grew by less than --min-gain over the previous
+level, the error rate passed --max-error-rate, or the overall p95 passed
+--slo-ms. --save writes every level's numbers as JSON, so runs can be
+compared across changes.
+
+All candidates run on one event loop in this process. At high levels,
+check that the load generator is not the bottleneck: its CPU should stay
+well below one core.
+"""
+import argparse
+import asyncio
+import glob
+import json
+import math
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER_CLASSES = {
+    'sync': ('sync', 'main:app'),
+    'gthread': ('gthread', 'main:app'),
+    'uvicorn': ('uvicorn.workers.UvicornWorker', 'asgi:app'),
+}
+
+# Routes with ids in the path are reported under one label
+ROUTE_LABELS = [(re.compile(r'^/get_question/\d+'), '/get_question/<n>'),
+                (re.compile(r'^/parse_status/[^?]+'), '/parse_status/<job>')]
+
+TEST_CONFIG = re.compile(rb'const testConfig = (\{.*?\});')
+
+
+def default_paper():
+    matches = sorted(glob.glob(os.path.join(ROOT, 'attached_assets', 'oee1_*.pdf')))
+    return matches[0] if matches else None
+
+
+def route_label(path):
+    for pattern, label in ROUTE_LABELS:
+        if pattern.match(path):
+            return label
+    return path.split('?')[0]
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class RequestFailed(Exception):
+    pass
+
+
+class Recorder:
+    """Latencies and errors per route for one level"""
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self.exams = 0
+        self.recording = True
+
+    def add(self, route, seconds, ok):
+        if not self.recording:
+            return
+        self.latencies.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self, elapsed):
+        routes = {}
+        everything = []
+        for route, values in self.latencies.items():
+            values.sort()
+            everything.extend(values)
+            routes[route] = {'count': len(values), 'errors': self.errors.get(route, 0),
+                             'p50_ms': percentile(values, 50) * 1000,
+                             'p95_ms': percentile(values, 95) * 1000,
+                             'p99_ms': percentile(values, 99) * 1000}
+        everything.sort()
+        requests = len(everything)
+        errors = sum(self.errors.values())
+        return {'requests': requests, 'errors': errors, 'exams': self.exams,
+                'throughput': requests / elapsed if elapsed else 0.0,
+                'error_rate': errors / requests if requests else 0.0,
+                'p50_ms': percentile(everything, 50) * 1000,
+                'p95_ms': percentile(everything, 95) * 1000,
+                'p99_ms': percentile(everything, 99) * 1000,
+                'routes': routes}
+
+
+class Candidate:
+    """One simulated candidate: its own cookies, speaking HTTP/1.1 over fresh connections"""
+
+    def __init__(self, host, port, recorder, timeout):
+        self.host = host
+        self.port = port
+        self.recorder = recorder
+        self.timeout = timeout
+        self.cookies = {}
+
+    async def request(self, method, path, body=b'', content_type=None, expect=(200,)):
+        """Send one request and return (status, headers, body); failures raise RequestFailed"""
+        head = [f'{method} {path} HTTP/1.1', f'Host: {self.host}', 'Connection: close',
+                'Accept-Encoding: identity']
+        if self.cookies:
+            head.append('Cookie: ' + '; '.join(f'{k}={v}' for k, v in self.cookies.items()))
+        if method == 'POST':
+            head.append(f'Content-Length: {len(body)}')
+            if content_type:
+                head.append(f'Content-Type: {content_type}')
+
+        route = route_label(path)
+        start = time.perf_counter()
+        try:
+            status, headers, data = await asyncio.wait_for(
+                self._exchange(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body),
+                timeout=self.timeout)
+        except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+            self.recorder.add(route, time.perf_counter() - start, False)
+            raise RequestFailed(f'{method} {route}: {e!r}')
+
+        ok = status in expect
+        self.recorder.add(route, time.perf_counter() - start, ok)
+        if not ok:
+            raise RequestFailed(f'{method} {route}: HTTP {status}')
+        for value in headers.get('set-cookie', []):
+            name, _, rest = value.partition('=')
+            self.cookies[name.strip()] = rest.split(';', 1)[0]
+        return status, headers, data
+
+    async def _exchange(self, raw):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(raw)
+            await writer.drain()
+            response = await reader.read()
+        finally:
+            writer.close()
+        head, _, data = response.partition(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(':')
+            headers.setdefault(name.strip().lower(), []).append(value.strip())
+        return int(lines[0].split()[1]), headers, data
+
+
+async def think(args, rng):
+    seconds = rng.lognormvariate(math.log(args.think_median), args.think_sigma) * args.time_scale
+    await asyncio.sleep(seconds)
+
+
+async def take_exam(candidate, args, paper, rng):
+    """Walk one candidate through upload, the questions, submission and results"""
+    boundary = uuid.uuid4().hex
+    fields = {'name': 'Load Candidate', 'email': 'candidate@load.test', 'duration': '60',
+              'positive_marks': '1', 'negative_marks': '0.25', 'feedback_mode': 'final'}
+    body = b''.join(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                    f'{value}\r\n'.encode('utf-8') for name, value in fields.items())
+    body += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+             f'filename="{os.path.basename(args.paper)}"\r\n'
+             f'Content-Type: application/pdf\r\n\r\n').encode('utf-8')
+    body += paper + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+    _, headers, _ = await candidate.request('POST', '/upload', body,
+                                            f'multipart/form-data; boundary={boundary}', expect=(302,))
+    location = urllib.parse.urlparse(headers['location'][0]).path
+    while location.startswith('/parse_status/'):
+        await asyncio.sleep(0.5)
+        _, _, data = await candidate.request('GET', location + '?format=json')
+        redirect = json.loads(data).get('redirect')
+        if redirect:
+            location = redirect
+    if location != '/test':
+        raise RequestFailed(f'upload ended on {location}')
+
+    _, _, page = await candidate.request('GET', '/test')
+    match = TEST_CONFIG.search(page)
+    if not match:
+        raise RequestFailed('no test config on /test')
+    total = json.loads(match.group(1))['total_questions']
+
+    form = 'application/x-www-form-urlencoded'
+    for number in range(min(total, args.questions)):
+        await candidate.request('GET', f'/get_question/{number}')
+        await think(args, rng)
+        if rng.random() >= 0.1:
+            answer = urllib.parse.urlencode({'question_num': number, 'answer': rng.choice('ABCD')})
+            await candidate.request('POST', '/submit_answer', answer.encode('ascii'), form)
+        await candidate.request('POST', '/next_question', b'', form)
+
+    await candidate.request('POST', '/submit_test', b'', form, expect=(302,))
+    await candidate.request('GET', '/results')
+    candidate.recorder.exams += 1
+
+
+async def candidate_loop(host, port, args, paper, recorder, seed):
+    rng = random.Random(seed)
+    # Stagger arrivals over one think time so candidates do not move in lockstep
+    await asyncio.sleep(rng.random() * args.think_median * args.time_scale)
+    while True:
+        candidate = Candidate(host, port, recorder, args.timeout)
+        try:
+            await take_exam(candidate, args, paper, rng)
+        except (RequestFailed, KeyError, ValueError):
+            # A real candidate would retry after a pause
+            await think(args, rng)
+
+
+async def warm_up(host, port, args, paper):
+    """Take one unrecorded exam so the paper is parsed before the first level"""
+    recorder = Recorder()
+    recorder.recording = False
+    await take_exam(Candidate(host, port, recorder, 300), args, paper, random.Random())
+
+
+async def run_level(host, port, args, paper, candidates):
+    recorder = Recorder()
+    tasks = [asyncio.ensure_future(candidate_loop(host, port, args, paper, recorder, seed))
+             for seed in range(candidates)]
+    start = time.perf_counter()
+    await asyncio.sleep(args.duration)
+    elapsed = time.perf_counter() - start
+    recorder.recording = False
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return recorder.summary(elapsed)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def spawn_server(args, workdir):
+    """Start gunicorn on a free port; return (process, port)"""
+    worker_class, target = WORKER_CLASSES[args.worker_class]
+    port = free_port()
+    command = [sys.executable, '-m', 'gunicorn', '-w', str(args.workers), '-k', worker_class,
+               '--bind', f'127.0.0.1:{port}', '--log-level', 'warning']
+    if args.worker_class == 'gthread':
+        command += ['--threads', str(args.threads)]
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'load.db')}",
+               UPLOAD_FOLDER=os.path.join(workdir, 'uploads'),
+               LOG_LEVEL='WARNING')
+    log = open(os.path.join(workdir, 'server.log'), 'wb')
+    process = subprocess.Popen(command + [target], cwd=ROOT, env=env, stdout=log, stderr=log)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    with open(os.path.join(workdir, 'server.log'), 'r', errors='replace') as f:
+        raise SystemExit(f'gunicorn did not start:\n{f.read()[-2000:]}')
+
+
+def saturation_point(levels, args):
+    """(candidates, reason) for the first saturated level, or None"""
+    previous = None
+    for candidates, result in levels:
+        if result['error_rate'] > args.max_error_rate:
+            return candidates, f"error rate {result['error_rate']:.1%}"
+        if result['p95_ms'] > args.slo_ms:
+            return candidates, f"p95 {result['p95_ms']:.0f} ms over the {args.slo_ms:.0f} ms SLO"
+        if previous and result['throughput'] < previous['throughput'] * (1 + args.min_gain):
+            return candidates, (f"throughput {result['throughput']:.0f} req/s, "
+                                f"up less than {args.min_gain:.0%} from {previous['throughput']:.0f}")
+        previous = result
+    return None
+
+
+def print_level(candidates, result):
+    print(f"\n{candidates} candidates: {result['throughput']:.1f} req/s, "
+          f"{result['error_rate']:.2%} errors, {result['exams']} exams finished")
+    print(f"{'route':>22} {'count':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for route, r in sorted(result['routes'].items()):
+        print(f"{route:>22} {r['count']:>7} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--levels', default='25,50,100,200,400',
+                        help='comma-separated numbers of concurrent candidates')
+    parser.add_argument('--duration', type=float, default=30, help='seconds per level')
+    parser.add_argument('--questions', type=int, default=20, help='questions answered per exam')
+    parser.add_argument('--think-median', type=float, default=20, help='median think time, seconds')
+    parser.add_argument('--think-sigma', type=float, default=0.8, help='log-normal shape of think times')
+    parser.add_argument('--time-scale', type=float, default=0.05, help='multiplier applied to think times')
+    parser.add_argument('--timeout', type=float, default=30, help='per-request timeout, seconds')
+    parser.add_argument('--url', default=None, help='test this server instead of spawning gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--worker-class', choices=sorted(WORKER_CLASSES), default='sync')
+    parser.add_argument('--threads', type=int, default=4, help='threads per gthread worker')
+    parser.add_argument('--paper', default=default_paper())
+    parser.add_argument('--slo-ms', type=float, default=1000, help='p95 latency objective')
+    parser.add_argument('--max-error-rate', type=float, default=0.01)
+    parser.add_argument('--min-gain', type=float, default=0.1,
+                        help='smallest throughput gain per level that is not saturation')
+    parser.add_argument('--save', default=None, help='write the results as JSON')
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(',')]
+
+    if not args.paper:
+        parser.error('no paper given and no bundled sample found')
+    with open(args.paper, 'rb') as f:
+        paper = f.read()
+
+    workdir = None
+    process = None
+    try:
+        if args.url:
+            url = urllib.parse.urlparse(args.url)
+            host, port = url.hostname, url.port or 80
+            target = args.url
+        else:
+            workdir = tempfile.mkdtemp(prefix='bench_candidates_')
+            process, port = spawn_server(args, workdir)
+            host = '127.0.0.1'
+            target = f"gunicorn -w {args.workers} -k {args.worker_class} on port {port}"
+        print(f"{target}: {args.questions} questions per exam, think median "
+              f"{args.think_median * args.time_scale:.2f} s, {args.duration:.0f} s per level")
+
+        asyncio.run(warm_up(host, port, args, paper))
+        results = []
+        for candidates in levels:
+            result = asyncio.run(run_level(host, port, args, paper, candidates))
+            results.append((candidates, result))
+            print_level(candidates, result)
+
+        print(f"\n{'candidates':>10} {'req/s':>9} {'exams':>7} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'p99 ms':>8} {'errors':>7}")
+        for candidates, r in results:
+            print(f"{candidates:>10} {r['throughput']:>9.1f} {r['exams']:>7} {r['p50_ms']:>8.1f} "
+                  f"{r['p95_ms']:>8.1f} {r['p99_ms']:>8.1f} {r['error_rate']:>7.2%}")
+
+        saturated = saturation_point(results, args)
+        if saturated:
+            print(f"\nsaturation: {saturated[0]} candidates ({saturated[1]})")
+        else:
+            print(f"\nsaturation: not reached up to {levels[-1]} candidates")
+
+        if args.save:
+            with open(args.save, 'w') as f:
+                json.dump({'target': target, 'settings': vars(args),
+                           'levels': [dict(r, candidates=c) for c, r in results],
+                           'saturation': saturated[0] if saturated else None}, f, indent=2)
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
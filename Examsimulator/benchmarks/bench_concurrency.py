@@ -0,0 +1,190 @@
+"""
+Load-test the question read routes against a running server
+
+Usage:
+    python benchmarks/bench_concurrency.py [--url http://127.0.0.1:5000]
+        [--concurrency 10,50,200] [--requests 1000] [--slow-clients 0]
+
+Start the server to compare in another shell, e.g. the sync setup
+
+    gunicorn -w 2 --bind 127.0.0.1:5000 main:app
+
+against the async one
+
+    gunicorn -k uvicorn.workers.UvicornWorker -w 2 --bind 127.0.0.1:5000 asgi:app
+
+The harness uploads the bundled sample paper (or --paper), waits for it to
+be parsed, then fires --requests GETs at /get_question/<n> and the bulk
+/exam/<session_id>/questions endpoint at each concurrency level and reports
+throughput, latency percentiles and errors. --slow-clients keeps that many
+extra connections open for the whole run, trickling their request headers
+one byte a second like candidates on poor networks; under sync workers each
+of them pins a worker.
+"""
+import argparse
+import asyncio
+import glob
+import http.cookiejar
+import json
+import os
+import random
+import re
+import time
+import urllib.parse
+import urllib.request
+import uuid
+
+
+def default_paper():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    matches = sorted(glob.glob(os.path.join(root, 'attached_assets', 'oee1_*.pdf')))
+    return matches[0] if matches else None
+
+
+def start_exam(base_url, paper):
+    """Upload paper, wait for parsing and return (cookie_header, test_config)"""
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+
+    boundary = uuid.uuid4().hex
+    fields = {'name': 'Load Test', 'email': 'load@test.local', 'duration': '60',
+              'positive_marks': '1', 'negative_marks': '0', 'feedback_mode': 'final'}
+    body = b''
+    for name, value in fields.items():
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n'
+                 f'{value}\r\n').encode('utf-8')
+    with open(paper, 'rb') as f:
+        body += (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; '
+                 f'filename="{os.path.basename(paper)}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n').encode('utf-8')
+        body += f.read() + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+    request = urllib.request.Request(f'{base_url}/upload', data=body, headers={
+        'Content-Type': f'multipart/form-data; boundary={boundary}'})
+    response = opener.open(request)
+
+    # Poll the parse job until it redirects to the test page
+    deadline = time.monotonic() + 300
+    while '/parse_status/' in response.url and time.monotonic() < deadline:
+        time.sleep(0.5)
+        status = json.load(opener.open(response.url.split('?')[0] + '?format=json'))
+        if status.get('redirect'):
+            response = opener.open(urllib.parse.urljoin(base_url, status['redirect']))
+
+    page = response.read().decode('utf-8')
+    match = re.search(r'const testConfig = (\{.*?\});', page)
+    if not match:
+        raise SystemExit(f'Could not start a test (ended on {response.url})')
+
+    cookie = '; '.join(f'{c.name}={c.value}' for c in jar)
+    return cookie, json.loads(match.group(1))
+
+
+async def fetch(host, port, path, cookie):
+    """One GET over a fresh connection; returns (status, seconds)"""
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write((f'GET {path} HTTP/1.1\r\nHost: {host}\r\nCookie: {cookie}\r\n'
+                      f'Accept-Encoding: gzip\r\nConnection: close\r\n\r\n').encode('latin-1'))
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+    return int(status_line.split()[1]), time.perf_counter() - start
+
+
+async def slow_client(host, port, stop):
+    """Hold a connection open by sending a request one byte per second"""
+    request = f'GET / HTTP/1.1\r\nHost: {host}\r\nX-Padding: {"x" * 600}\r\n\r\n'.encode('latin-1')
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        for byte in request:
+            if stop.is_set():
+                break
+            writer.write(bytes([byte]))
+            await writer.drain()
+            await asyncio.sleep(1)
+        writer.close()
+    except OSError:
+        pass
+
+
+async def run_level(host, port, paths, cookie, concurrency, total):
+    latencies = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            try:
+                status, elapsed = await asyncio.wait_for(
+                    fetch(host, port, random.choice(paths), cookie), timeout=30)
+                latencies.append(elapsed)
+                if status >= 400:
+                    errors += 1
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - start, sorted(latencies), errors
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def main_async(args, cookie, config):
+    url = urllib.parse.urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    total = config['total_questions']
+    paths = [f'/get_question/{n}' for n in range(total)]
+    paths += [f"/exam/{config['session_id']}/questions?offset={offset}&limit=20"
+              for offset in range(0, total, 20)]
+
+    stop = asyncio.Event()
+    slow = [asyncio.ensure_future(slow_client(host, port, stop)) for _ in range(args.slow_clients)]
+    if slow:
+        await asyncio.sleep(1)
+
+    print(f"{'concurrency':>11} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for concurrency in args.concurrency:
+        elapsed, latencies, errors = await run_level(host, port, paths, cookie,
+                                                     concurrency, args.requests)
+        print(f"{concurrency:>11} {args.requests / elapsed:>9.1f} "
+              f"{percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f} {errors:>7}")
+
+    stop.set()
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--paper', default=default_paper())
+    parser.add_argument('--concurrency', default='10,50,200',
+                        help='comma-separated numbers of concurrent clients')
+    parser.add_argument('--requests', type=int, default=1000, help='requests per level')
+    parser.add_argument('--slow-clients', type=int, default=0,
+                        help='extra connections that trickle headers for the whole run')
+    args = parser.parse_args()
+    args.concurrency = [int(c) for c in args.concurrency.split(',')]
+
+    if not args.paper:
+        parser.error('no paper given and no bundled sample found')
+
+    cookie, config = start_exam(args.url.rstrip('/'), args.paper)
+    print(f"{args.url}: {config['total_questions']} questions, {args.slow_clients} slow clients")
+    asyncio.run(main_async(args, cookie, config))
+
+
+if __name__ == '__main__':
+    main()
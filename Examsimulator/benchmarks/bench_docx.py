@@ -0,0 +1,104 @@
+"""
+Benchmark DOCX readers: streaming iterparse vs python-docx
+
+Usage:
+    python benchmarks/bench_docx.py [--sizes 500,2000,10000] [--repeat 3] [--keep DIR]
+
+Builds synthetic papers with python-docx in which every other question keeps
+its options in a 2x2 table, then parses each with every installed reader
+(see DOCX_READERS). Reports the best parse time over --repeat runs, peak
+RSS growth of a fresh process parsing the paper once, and whether the
+reader's questions and answer key match the streaming reader's.
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_parser import (DOCX_AVAILABLE, docx_reader_candidates, parse_docx_questions,
+                               preload_parsers)
+
+
+def make_paper(path, num_questions):
+    """Write a paper with paragraph and table options, and an answer key"""
+    from docx import Document
+    doc = Document()
+    for i in range(1, num_questions + 1):
+        doc.add_paragraph(f"Q{i}. Which of the following best describes item {i} in the series?")
+        options = [f"({letter}) The {word} value" for letter, word in zip('abcd', ('first', 'second', 'third', 'last'))]
+        if i % 2:
+            for option in options:
+                doc.add_paragraph(option)
+        else:
+            table = doc.add_table(rows=2, cols=2)
+            for cell, option in zip((cell for row in table.rows for cell in row.cells), options):
+                cell.text = option
+    doc.add_paragraph("Answer Key:")
+    for i in range(1, num_questions + 1):
+        doc.add_paragraph(f"{i}. {'ABCD'[i % 4]}")
+    doc.save(path)
+
+
+def parse_once(path, reader):
+    """Parse in a fresh process; return (questions, answer_key, peak RSS growth in KB)"""
+    preload_parsers()
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    questions, answer_key = parse_docx_questions(path, backend=reader)
+    return questions, answer_key, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+
+
+def best_time(path, reader, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_docx_questions(path, backend=reader)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='500,2000,10000', help='comma-separated question counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--keep', default=None, help='write the generated papers here')
+    args = parser.parse_args()
+
+    if not DOCX_AVAILABLE:
+        parser.error('python-docx is needed to generate the papers')
+
+    readers = docx_reader_candidates('auto')
+    spawn = multiprocessing.get_context('spawn')
+    workdir = args.keep or tempfile.mkdtemp(prefix='bench_docx_')
+    os.makedirs(workdir, exist_ok=True)
+    try:
+        print(f"{'questions':>9} {'reader':>12} {'best s':>8} {'q/s':>9} {'speedup':>8} "
+              f"{'peak MB':>8} {'parsed':>7} {'match':>6}")
+        for size in (int(s) for s in args.sizes.split(',')):
+            path = os.path.join(workdir, f'paper_{size}.docx')
+            make_paper(path, size)
+            reference = None
+            for reader in readers:
+                elapsed = best_time(path, reader, args.repeat)
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                    questions, answer_key, peak_kb = pool.submit(parse_once, path, reader).result()
+                if reference is None:
+                    reference = (elapsed, questions, answer_key)
+                match = questions == reference[1] and answer_key == reference[2]
+                print(f"{size:>9} {reader:>12} {elapsed:>8.3f} {size / elapsed:>9.0f} "
+                      f"{reference[0] / elapsed:>7.2f}x {peak_kb / 1024:>8.1f} {len(questions):>7} "
+                      f"{'yes' if match else 'NO':>6}")
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark single-question lookups: JSON bank vs memory-mapped binary bank
+
+Usage:
+    python benchmarks/bench_exam_bank.py [paper_path] [--scale 10] [--lookups 2000]
+
+Parses the paper (defaults to the bundled attached_assets/oee1_*.pdf sample),
+repeats its questions --scale times to model a large bank, then times looking
+up random questions from each on-disk format.
+"""
+import argparse
+import glob
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.exam_bank import MappedExamBank, encode_bank
+from utils.exam_store import PARSER_VERSION, make_bank
+from utils.file_parser import parse_questions_from_file
+
+
+def default_paper():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    matches = sorted(glob.glob(os.path.join(root, 'attached_assets', 'oee1_*.pdf')))
+    return matches[0] if matches else None
+
+
+def per_lookup_us(fn, indexes):
+    start = time.perf_counter()
+    for index in indexes:
+        fn(index)
+    return (time.perf_counter() - start) / len(indexes) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paper', nargs='?', default=default_paper())
+    parser.add_argument('--scale', type=int, default=10,
+                        help='repeat the parsed questions this many times')
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    if not args.paper:
+        parser.error('no paper given and no bundled sample found')
+
+    questions, answer_key = parse_questions_from_file(args.paper)
+    questions = [dict(q, number=i + 1) for i, q in enumerate(questions * args.scale)]
+    answer_key = {str(i + 1): answer_key.get(str(i % len(answer_key) + 1), 'A')
+                  for i in range(len(questions))} if answer_key else {}
+    indexes = [random.randrange(len(questions)) for _ in range(args.lookups)]
+
+    workdir = tempfile.mkdtemp(prefix='bench_bank_')
+    json_path = os.path.join(workdir, 'bank.json')
+    bank_path = os.path.join(workdir, 'bank.bank')
+    with open(json_path, 'w') as f:
+        json.dump(make_bank(questions, answer_key), f)
+    with open(bank_path, 'wb') as f:
+        f.write(encode_bank(questions, answer_key, PARSER_VERSION))
+
+    def json_lookup(index):
+        with open(json_path, 'r') as f:
+            return json.load(f)['questions'][index]
+
+    def mmap_open_lookup(index):
+        with MappedExamBank.open(bank_path) as bank:
+            return bank[index]
+
+    bank = MappedExamBank.open(bank_path)
+    assert bank.to_tuple() == (questions, answer_key)
+
+    print(f"{len(questions)} questions  json={os.path.getsize(json_path)} B  "
+          f"binary={os.path.getsize(bank_path)} B")
+    print(f"{'lookup':>26} {'us/question':>12}")
+    print(f"{'json load + index':>26} {per_lookup_us(json_lookup, indexes[:200]):>12.1f}")
+    print(f"{'mmap open + get_question':>26} {per_lookup_us(mmap_open_lookup, indexes):>12.1f}")
+    print(f"{'open bank get_question':>26} {per_lookup_us(bank.get_question, indexes):>12.1f}")
+
+    bank.close()
+    os.remove(json_path)
+    os.remove(bank_path)
+    os.rmdir(workdir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Measure cold-start import time of the app with `python -X importtime`
+
+Usage:
+    python benchmarks/bench_import_time.py [--module main] [--runs 5] [--top 10]
+        [--max-ms 800] [--forbid pdfplumber,pypdfium2,pdfminer,docx,numpy] [--preload]
+
+Imports --module in --runs fresh interpreters, reports the median and best
+cumulative import time and the slowest imports it pulled in, and checks
+that none of the --forbid modules (the parser libraries and numpy, which
+are loaded on first use) were imported. Exits with status 1 if the median
+exceeds --max-ms or a forbidden module was imported, so the check can run
+in CI to keep cold starts bounded. --preload sets PRELOAD_PARSERS=1 to show
+what the gunicorn --preload warm-up costs (the forbid check is skipped).
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_FORBID = 'pdfplumber,pypdfium2,pdfminer,docx,numpy'
+
+
+def import_once(module, env):
+    """Return ({name: cumulative_us}, root_cumulative_us) for one fresh import"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f'import {module} failed:\n{result.stderr}')
+
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cum, name = line[len('import time:'):].split('|')
+        if not cum.strip().isdigit():
+            continue  # column header
+        cumulative[name.strip()] = max(cumulative.get(name.strip(), 0), int(cum))
+    return cumulative, cumulative.get(module, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='slowest imports to list')
+    parser.add_argument('--max-ms', type=float, default=None,
+                        help='fail if the median import time exceeds this')
+    parser.add_argument('--forbid', default=DEFAULT_FORBID,
+                        help='comma-separated modules that must not be imported')
+    parser.add_argument('--preload', action='store_true', help='import with PRELOAD_PARSERS=1')
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.pop('PRELOAD_PARSERS', None)
+    if args.preload:
+        env['PRELOAD_PARSERS'] = '1'
+
+    totals = []
+    modules = {}
+    for _ in range(args.runs):
+        cumulative, total = import_once(args.module, env)
+        totals.append(total / 1000)
+        for name, us in cumulative.items():
+            modules.setdefault(name, []).append(us / 1000)
+
+    median = statistics.median(totals)
+    print(f"import {args.module}: median {median:.1f} ms, best {min(totals):.1f} ms "
+          f"over {args.runs} runs{' (PRELOAD_PARSERS=1)' if args.preload else ''}")
+
+    slowest = sorted(((statistics.median(times), name) for name, times in modules.items()
+                      if name != args.module), reverse=True)[:args.top]
+    print(f"{'cumulative ms':>14}  module")
+    for ms, name in slowest:
+        print(f"{ms:>14.1f}  {name}")
+
+    failed = False
+    forbidden = [] if args.preload else [name for name in args.forbid.split(',') if name]
+    imported = sorted(name for name in forbidden
+                      if any(m == name or m.startswith(name + '.') for m in modules))
+    if imported:
+        print(f"FAIL: imported at startup: {', '.join(imported)}")
+        failed = True
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"FAIL: median {median:.1f} ms exceeds the {args.max_ms:.0f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
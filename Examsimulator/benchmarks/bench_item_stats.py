@@ -0,0 +1,118 @@
+"""
+Benchmark streaming item analysis against recomputing it from every submission
+
+Usage:
+    python benchmarks/bench_item_stats.py [--attempts 30000] [--questions 100]
+        [--checkpoints 1000,10000,30000] [--database-url sqlite:///items.db]
+
+Records --attempts simulated submissions (candidates of varying ability
+answering --questions four-option questions) into a fresh SQLite database
+unless --database-url is given, reporting the median and p99 latency of
+recording one submission. At each checkpoint it times an item-analysis
+report built from the running sums (what the admin endpoint does), and
+the same statistics computed the batch way, by regrading every submission
+kept so far. It also checks that the two agree.
+"""
+import argparse
+import math
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db_store import SqlItemStats
+from utils.item_analysis import analyze
+from utils.scoring import NUMPY_AVAILABLE, UNANSWERED, score_matrix
+
+
+def simulate(rng, key_codes):
+    """Choice codes of one candidate: right with probability ability, else a random option"""
+    ability = rng.betavariate(4, 3)
+    choices = []
+    for key in key_codes:
+        if rng.random() < 0.05:
+            choices.append(UNANSWERED)
+        elif rng.random() < ability:
+            choices.append(key)
+        else:
+            choices.append(rng.randint(1, 4))
+    return choices
+
+
+def batch_kr20(responses, key_codes):
+    """KR-20 the batch way: regrade every submission, then p per item and the score variance"""
+    graded = score_matrix(responses, key_codes, 1, 0)
+    n, k = len(responses), len(key_codes)
+    scores = [int(score) for score in graded['score']]
+    mean = sum(scores) / n
+    variance = sum((score - mean) ** 2 for score in scores) / n
+    correct = [0] * k
+    for row in graded['status']:
+        for question, status in enumerate(row):
+            correct[question] += status == 1
+    sum_pq = sum(c / n * (1 - c / n) for c in correct)
+    return k / (k - 1) * (1 - sum_pq / variance)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--attempts', type=int, default=30000)
+    parser.add_argument('--questions', type=int, default=100)
+    parser.add_argument('--checkpoints', default='1000,10000,30000')
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    checkpoints = sorted(int(n) for n in args.checkpoints.split(',') if int(n) <= args.attempts)
+    workdir = None
+    database_url = args.database_url
+    if database_url is None:
+        workdir = tempfile.mkdtemp(prefix='bench_items_')
+        database_url = f"sqlite:///{os.path.join(workdir, 'items.db')}"
+
+    rng = random.Random(42)
+    key_codes = [rng.randint(1, 4) for _ in range(args.questions)]
+    exam_id = f'bench_{rng.getrandbits(64):016x}'
+    print(f"{args.questions} questions, scoring with {'numpy' if NUMPY_AVAILABLE else 'pure Python'}")
+    try:
+        stats = SqlItemStats(database_url)
+        responses = []
+        record_ms = []
+        print(f"{'attempts':>9} {'record p50 ms':>14} {'record p99 ms':>14} "
+              f"{'report ms':>10} {'batch ms':>9} {'kr20':>7}")
+        for attempt in range(1, args.attempts + 1):
+            choices = simulate(rng, key_codes)
+            responses.append(choices)
+            score = sum(choice == key for choice, key in zip(choices, key_codes))
+            start = time.perf_counter()
+            stats.record(exam_id, score, choices)
+            record_ms.append((time.perf_counter() - start) * 1000)
+
+            if attempt not in checkpoints:
+                continue
+            start = time.perf_counter()
+            report = analyze(*stats.attempts(exam_id), stats.responses(exam_id), key_codes)
+            report_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            kr20 = batch_kr20(responses, key_codes)
+            batch_ms = (time.perf_counter() - start) * 1000
+            if not math.isclose(kr20, report['kr20'], rel_tol=1e-9):
+                raise SystemExit(f"KR-20 mismatch: streaming {report['kr20']} vs batch {kr20}")
+
+            record_ms.sort()
+            print(f"{attempt:>9} {statistics.median(record_ms):>14.2f} "
+                  f"{record_ms[int(len(record_ms) * 0.99)]:>14.2f} {report_ms:>10.1f} "
+                  f"{batch_ms:>9.1f} {report['kr20']:>7.3f}")
+            record_ms = []
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Parser hot-path benchmark on synthetic question papers
+
+Generates papers of 1k-50k questions in both supported option styles
+(inline "(a) ... (b) ..." and multiline "A) ...") and reports throughput
+in questions per second for each parsing stage.
+
+Usage:
+    python benchmarks/bench_parser.py [--sizes 1000,10000,50000] [--repeat 3]
+    python benchmarks/bench_parser.py --save baseline.json
+    python benchmarks/bench_parser.py --compare baseline.json [--tolerance 0.25]
+
+With --compare the script exits non-zero if any stage is slower than the
+saved baseline by more than the tolerance, so it can gate changes.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_parser import (QUESTION_BOUNDARY, StreamingQuestionExtractor, clean_pdf_text,
+                               extract_answer_key, iter_questions, parse_single_question)
+
+STYLES = ('inline', 'multiline')
+
+
+def make_paper(num_questions, style):
+    """Build a synthetic paper with an answer key and some page-footer noise"""
+    parts = []
+    for i in range(1, num_questions + 1):
+        if style == 'inline':
+            parts.append(f"Q{i}. Which of the following best describes item {i} in the series?\n"
+                         f"(a) The first value {i} (b) The second value\n"
+                         f"(c) The third value (d) None of these\n")
+        else:
+            parts.append(f"Q{i}. Which of the following best describes item {i} in the series?\n"
+                         f"A) The first value {i}\nB) The second value\n"
+                         f"C) The third value\nD) None of these\n")
+        if i % 6 == 0:
+            parts.append(f"{i // 6} www.example.com\n")
+    parts.append("Answer Key:\n")
+    parts.extend(f"{i}. {'ABCD'[i % 4]}\n" for i in range(1, num_questions + 1))
+    return "".join(parts)
+
+
+def best_time(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_paper(num_questions, style, repeat):
+    """Return {stage: questions_per_second} for one synthetic paper"""
+    text = make_paper(num_questions, style)
+    answer_start = text.index("Answer Key:")
+    questions_text, answer_text = text[:answer_start], text[answer_start:]
+
+    boundaries = [m.start() for m in QUESTION_BOUNDARY.finditer(questions_text)] + [len(questions_text)]
+    segments = [clean_pdf_text(questions_text[a:b]) for a, b in zip(boundaries, boundaries[1:])]
+    # Roughly one PDF page worth of text per chunk
+    chunks = [text[i:i + 3000] for i in range(0, len(text), 3000)]
+
+    stages = {
+        'cleanup': lambda: clean_pdf_text(questions_text),
+        'question_split': lambda: [m.start() for m in QUESTION_BOUNDARY.finditer(questions_text)],
+        'per_question_parse': lambda: [parse_single_question(seg) for seg in segments],
+        'answer_key': lambda: extract_answer_key(answer_text),
+        'end_to_end': lambda: list(iter_questions(chunks, StreamingQuestionExtractor())),
+    }
+    return {stage: num_questions / best_time(func, repeat) for stage, func in stages.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,50000',
+                        help='comma-separated question counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--save', help='write results to this JSON file')
+    parser.add_argument('--compare', help='compare against a saved JSON baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed fractional slowdown per stage (default 0.25)')
+    args = parser.parse_args()
+
+    # Per-question debug logging is not what we are measuring
+    logging.disable(logging.CRITICAL)
+
+    results = {}
+    print(f"{'paper':>16} {'stage':>20} {'questions/s':>14}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        for style in STYLES:
+            key = f"{style}-{size}"
+            results[key] = bench_paper(size, style, args.repeat)
+            for stage, qps in results[key].items():
+                print(f"{key:>16} {stage:>20} {qps:>14,.0f}")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = []
+        for key, stages in results.items():
+            for stage, qps in stages.items():
+                expected = baseline.get(key, {}).get(stage)
+                if expected and qps < expected * (1 - args.tolerance):
+                    regressions.append(f"{key} {stage}: {qps:,.0f} q/s vs baseline {expected:,.0f} q/s")
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark PDF text extraction backends: throughput and parse accuracy
+
+Usage:
+    python benchmarks/bench_pdf_backends.py [pdf_path] [--backends pdfium,pdfminer,pdfplumber]
+        [--repeat 3]
+
+Defaults to the bundled attached_assets/oee1_*.pdf sample paper. Each
+installed backend extracts the whole paper serially (best of --repeat) and
+its text is run through the question parser. Accuracy is measured against
+pdfplumber, the reference backend: how many question numbers it also
+found, how many questions parsed identically, and how many answer key
+entries agree.
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_parser import (PDF_BACKENDS, available_pdf_backends, extract_pdf_text,
+                               extract_questions_from_text, pdf_backend_candidates)
+
+
+def default_pdf():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    matches = sorted(glob.glob(os.path.join(root, 'attached_assets', 'oee1_*.pdf')))
+    return matches[0] if matches else None
+
+
+def time_backend(pdf_path, backend, repeat):
+    """Return (best_seconds, text) over repeat serial extractions"""
+    best = None
+    text = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extract_pdf_text(pdf_path, workers=1, backend=backend)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, text
+
+
+def keyed(questions):
+    """Questions keyed by (number, occurrence), since sections restart at Q1"""
+    seen = {}
+    keys = {}
+    for question in questions:
+        occurrence = seen[question['number']] = seen.get(question['number'], 0) + 1
+        keys[(question['number'], occurrence)] = question
+    return keys
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdf', nargs='?', default=default_pdf())
+    parser.add_argument('--backends', default=','.join(PDF_BACKENDS),
+                        help='comma-separated backends to compare')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if not args.pdf:
+        parser.error('no PDF given and no bundled sample found')
+
+    available = available_pdf_backends()
+    backends = [name for name in args.backends.split(',') if name in available]
+    if 'pdfplumber' not in backends and 'pdfplumber' in available:
+        backends.append('pdfplumber')
+    pages = PDF_BACKENDS[backends[0]].page_count(args.pdf)
+    print(f"PDF: {args.pdf}  ({pages} pages, auto tries {' -> '.join(pdf_backend_candidates('auto'))})")
+
+    results = {}
+    for name in backends:
+        elapsed, text = time_backend(args.pdf, name, args.repeat)
+        questions, answer_key = extract_questions_from_text(text)
+        results[name] = (elapsed, questions, answer_key)
+
+    reference = results.get('pdfplumber')
+    ref_questions = keyed(reference[1]) if reference else {}
+    ref_key = reference[2] if reference else {}
+
+    print(f"{'backend':>10} {'best s':>8} {'pages/s':>9} {'speedup':>8} {'questions':>9} "
+          f"{'found':>7} {'same':>6} {'key ok':>7}")
+    for name, (elapsed, questions, answer_key) in results.items():
+        questions = keyed(questions)
+        found = sum(1 for key in questions if key in ref_questions)
+        same = sum(1 for key, q in questions.items() if ref_questions.get(key) == q)
+        key_ok = sum(1 for number, answer in answer_key.items() if ref_key.get(number) == answer)
+        speedup = reference[0] / elapsed if reference else float('nan')
+        print(f"{name:>10} {elapsed:>8.3f} {pages / elapsed:>9.1f} {speedup:>7.1f}x {len(questions):>9} "
+              f"{found:>7} {same:>6} {key_ok:>7}")
+
+
+if __name__ == '__main__':
+    main()
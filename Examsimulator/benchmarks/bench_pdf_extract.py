@@ -0,0 +1,68 @@
+"""
+Benchmark serial vs page-parallel PDF text extraction
+
+Usage:
+    python benchmarks/bench_pdf_extract.py [pdf_path] [--workers 1,2,4] [--repeat 3]
+        [--backend pdfplumber]
+
+Defaults to the bundled attached_assets/oee1_*.pdf sample paper and the
+pdfplumber backend (see bench_pdf_backends.py to compare backends).
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.file_parser import extract_pdf_text, extract_questions_from_text
+
+
+def default_pdf():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    matches = sorted(glob.glob(os.path.join(root, 'attached_assets', 'oee1_*.pdf')))
+    return matches[0] if matches else None
+
+
+def time_extraction(pdf_path, workers, repeat, backend):
+    """Return (best_seconds, text) over repeat runs"""
+    best = None
+    text = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = extract_pdf_text(pdf_path, workers=workers, backend=backend)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('pdf', nargs='?', default=default_pdf())
+    parser.add_argument('--workers', default='1,2,4',
+                        help='comma-separated worker counts to compare')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--backend', default='pdfplumber')
+    args = parser.parse_args()
+
+    if not args.pdf:
+        parser.error('no PDF given and no bundled sample found')
+
+    worker_counts = [int(w) for w in args.workers.split(',')]
+    print(f"PDF: {args.pdf}  (cpu_count={os.cpu_count()})")
+
+    baseline_time, baseline_text = time_extraction(args.pdf, 1, args.repeat, args.backend)
+    questions, _ = extract_questions_from_text(baseline_text)
+    print(f"{'workers':>8} {'best s':>9} {'speedup':>8}  identical")
+    for workers in worker_counts:
+        if workers == 1:
+            elapsed, text = baseline_time, baseline_text
+        else:
+            elapsed, text = time_extraction(args.pdf, workers, args.repeat, args.backend)
+        print(f"{workers:>8} {elapsed:>9.3f} {baseline_time / elapsed:>7.2f}x  {text == baseline_text}")
+    print(f"questions parsed: {len(questions)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Benchmark the question bank: ingest, index load, search and exam assembly
+
+Usage:
+    python benchmarks/bench_question_bank.py [--questions 100000] [--per-paper 100]
+        [--exam-size 50] [--repeat 20] [--database-url sqlite:///bank.db]
+
+Ingests synthetic papers (random words from a fixed vocabulary, one source
+per paper, a subject tag per paper) into a fresh SQLite database unless
+--database-url is given, with a tenth of each paper repeating earlier
+questions to exercise deduplication. Then reports the time to load the
+index in a new QuestionBank (a fresh worker's first request) and the
+median and worst latency of searches and of assembling --exam-size
+question exams: random, and stratified by source and by tag.
+"""
+import argparse
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.db_store import SqlQuestionStore
+from utils.question_bank import QuestionBank
+
+SUBJECTS = ('physics', 'chemistry', 'biology', 'mathematics', 'history', 'geography')
+
+
+def make_paper(rng, vocabulary, first, count, earlier):
+    """count questions, about a tenth of them repeated from earlier"""
+    questions = []
+    for i in range(count):
+        if earlier and rng.random() < 0.1:
+            questions.append(rng.choice(earlier))
+            continue
+        words = ' '.join(rng.choices(vocabulary, k=12))
+        questions.append({'question': f"Question {first + i}: {words}?",
+                          'options': {letter: ' '.join(rng.choices(vocabulary, k=3)) for letter in 'ABCD'},
+                          'number': i + 1})
+    return questions
+
+
+def latencies(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), max(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--questions', type=int, default=100000)
+    parser.add_argument('--per-paper', type=int, default=100)
+    parser.add_argument('--exam-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--database-url', default=None)
+    args = parser.parse_args()
+
+    workdir = None
+    database_url = args.database_url
+    if database_url is None:
+        workdir = tempfile.mkdtemp(prefix='bench_bank_')
+        database_url = f"sqlite:///{os.path.join(workdir, 'bank.db')}"
+
+    rng = random.Random(42)
+    vocabulary = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(3, 9)))
+                  for _ in range(5000)]
+    try:
+        bank = QuestionBank(SqlQuestionStore(database_url))
+        earlier = []
+        added = 0
+        start = time.perf_counter()
+        for paper, first in enumerate(range(0, args.questions, args.per_paper)):
+            questions = make_paper(rng, vocabulary, first, args.per_paper, earlier)
+            answer_key = {i + 1: rng.choice('ABCD') for i in range(len(questions))}
+            added += bank.ingest(questions, answer_key, f'paper_{paper}.pdf', [SUBJECTS[paper % len(SUBJECTS)]])
+            earlier.extend(questions[:5])
+        elapsed = time.perf_counter() - start
+        print(f"ingest: {added} new questions in {elapsed:.1f} s ({added / elapsed:.0f}/s)")
+
+        bank = QuestionBank(SqlQuestionStore(database_url))
+        start = time.perf_counter()
+        bank.refresh(force=True)
+        stats = bank.stats()
+        print(f"index load: {(time.perf_counter() - start) * 1000:.0f} ms for {stats['questions']} questions, "
+              f"{stats['words']} words, {stats['sources']} sources")
+
+        common, rare = vocabulary[0], vocabulary[-1]
+        cases = [
+            ('search 1 word', lambda: bank.search(rare)),
+            ('search 2 words + tag', lambda: bank.search(f'{common} {rare}', ['physics'])),
+            ('assemble random', lambda: bank.assemble(args.exam_size)),
+            ('assemble by source', lambda: bank.assemble(args.exam_size, stratify='source')),
+            ('assemble by tag', lambda: bank.assemble(args.exam_size, stratify='tag')),
+            ('assemble tag filter', lambda: bank.assemble(args.exam_size, tags=['chemistry'],
+                                                          stratify='source')),
+        ]
+        print(f"{'operation':>22} {'median ms':>10} {'max ms':>8}")
+        for label, func in cases:
+            median, worst = latencies(func, args.repeat)
+            print(f"{label:>22} {median:>10.2f} {worst:>8.2f}")
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
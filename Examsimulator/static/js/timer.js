@@ -248,7 +248,220 @@ class AutoSave {
     }
 }
 
+// Server-authoritative exam clock
+class ExamClock {
+    /**
+     * Counts down to a deadline owned by the server.
+     *
+     * The remaining time comes from the server and is corrected by "tick"
+     * events on an EventSource stream, so a suspended tab or a wrong local
+     * clock cannot stretch the test. The display is redrawn once per second
+     * locally, which needs no requests. A "submitted" event means the server
+     * has already submitted the test.
+     */
+    constructor(url, remaining, options = {}) {
+        this.url = url;
+        this.onTick = options.onTick || null;
+        this.onExpire = options.onExpire || null;
+        this.onSubmitted = options.onSubmitted || null;
+        this.timer = null;
+        this.source = null;
+        this.expired = false;
+        this.setRemaining(remaining);
+    }
+
+    start() {
+        if (typeof EventSource !== 'undefined') {
+            this.source = new EventSource(this.url);
+            this.source.addEventListener('tick', (e) => {
+                const data = JSON.parse(e.data);
+                if (data.remaining !== null) this.setRemaining(data.remaining);
+            });
+            this.source.addEventListener('submitted', (e) => {
+                this.stop();
+                if (this.onSubmitted) this.onSubmitted(JSON.parse(e.data));
+            });
+        }
+        this.tick();
+    }
+
+    stop() {
+        if (this.timer) {
+            clearTimeout(this.timer);
+            this.timer = null;
+        }
+        if (this.source) {
+            this.source.close();
+            this.source = null;
+        }
+    }
+
+    setRemaining(seconds) {
+        this.deadline = Date.now() + seconds * 1000;
+    }
+
+    getTimeLeft() {
+        return Math.max(0, Math.ceil((this.deadline - Date.now()) / 1000));
+    }
+
+    tick() {
+        const timeLeft = this.getTimeLeft();
+        if (this.onTick) this.onTick(timeLeft);
+
+        if (timeLeft <= 0) {
+            if (!this.expired) {
+                this.expired = true;
+                if (this.onExpire) this.onExpire();
+            }
+            return;
+        }
+
+        // Wake on the next whole second of the countdown
+        const wait = (this.deadline - Date.now()) % 1000 || 1000;
+        this.timer = setTimeout(() => this.tick(), wait);
+    }
+}
+
+// Batched answer synchronisation
+class AnswerSync {
+    /**
+     * Coalesces answer changes and sends them to the server in batches.
+     *
+     * Changes to the same question replace each other until the batch is
+     * sent. Batches carry increasing sequence numbers so the server applies
+     * each one at most once; a failed batch is retried with the same number.
+     */
+    constructor(url, options = {}) {
+        this.url = url;
+        this.delay = options.delay !== undefined ? options.delay : 2000; // debounce, ms
+        this.maxDelay = options.maxDelay !== undefined ? options.maxDelay : 10000;
+        this.seq = options.seq || 0;
+        this.onResponse = options.onResponse;
+        this.pending = {};          // question_num -> change
+        this.currentQuestion = options.currentQuestion !== undefined ? options.currentQuestion : null;
+        this.currentQuestionDirty = false;
+        this.unacked = null;        // batch sent but not yet acknowledged
+        this.inFlight = null;
+        this.timer = null;
+        this.firstPendingAt = null;
+        this.retryDelay = 1000;
+    }
+
+    record(questionNum, answer) {
+        this.pending[questionNum] = {
+            question_num: questionNum,
+            answer: answer,
+            timestamp: Date.now()
+        };
+        this.schedule();
+    }
+
+    setCurrentQuestion(questionNum) {
+        if (questionNum === this.currentQuestion) return;
+        this.currentQuestion = questionNum;
+        this.currentQuestionDirty = true;
+        this.schedule();
+    }
+
+    hasPending() {
+        return this.unacked !== null || this.currentQuestionDirty ||
+            Object.keys(this.pending).length > 0;
+    }
+
+    schedule(delay) {
+        if (this.timer) clearTimeout(this.timer);
+
+        const now = Date.now();
+        if (this.firstPendingAt === null) this.firstPendingAt = now;
+
+        // Debounce, but never hold changes back longer than maxDelay
+        let wait = delay !== undefined ? delay : this.delay;
+        wait = Math.min(wait, Math.max(0, this.maxDelay - (now - this.firstPendingAt)));
+        this.timer = setTimeout(() => this.flush(), wait);
+    }
+
+    takeBatch() {
+        if (this.unacked) return this.unacked;
+
+        const batch = {
+            seq: this.seq + 1,
+            changes: Object.values(this.pending)
+        };
+        if (this.currentQuestionDirty) {
+            batch.current_question = this.currentQuestion;
+        }
+
+        this.pending = {};
+        this.currentQuestionDirty = false;
+        this.seq = batch.seq;
+        this.unacked = batch;
+        return batch;
+    }
+
+    async flush() {
+        if (this.timer) {
+            clearTimeout(this.timer);
+            this.timer = null;
+        }
+        // One batch at a time keeps sequence numbers in order
+        while (this.inFlight) {
+            await this.inFlight;
+        }
+        if (!this.hasPending()) return true;
+
+        const batch = this.takeBatch();
+        this.firstPendingAt = null;
+        this.inFlight = this.send(batch);
+        try {
+            return await this.inFlight;
+        } finally {
+            this.inFlight = null;
+        }
+    }
+
+    async send(batch) {
+        try {
+            const response = await fetch(this.url, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(batch)
+            });
+            const data = await response.json();
+
+            if (!response.ok) {
+                if (response.status >= 500) throw new Error(data.error || response.statusText);
+                // Rejected outright (e.g. test already submitted); retrying will not help
+                console.error('Answer sync rejected:', data.error);
+                this.unacked = null;
+                return false;
+            }
+
+            this.unacked = null;
+            this.retryDelay = 1000;
+            if (this.onResponse) this.onResponse(data, batch);
+            if (this.hasPending()) this.schedule();
+            return true;
+        } catch (error) {
+            console.error('Error syncing answers:', error);
+            this.schedule(this.retryDelay);
+            this.retryDelay = Math.min(this.retryDelay * 2, 30000);
+            return false;
+        }
+    }
+
+    /**
+     * Best-effort flush while the page is going away (no response is read)
+     */
+    flushOnUnload() {
+        if (!this.hasPending() || !navigator.sendBeacon) return;
+
+        const batch = this.takeBatch();
+        const blob = new Blob([JSON.stringify(batch)], {type: 'application/json'});
+        navigator.sendBeacon(this.url, blob);
+    }
+}
+
 // Export for use in other scripts
 if (typeof module !== 'undefined' && module.exports) {
-    module.exports = { TestTimer, TimerUtils, AutoSave };
+    module.exports = { TestTimer, TimerUtils, AutoSave, ExamClock, AnswerSync };
 }
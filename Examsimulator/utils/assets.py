@@ -0,0 +1,128 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from importlib.util import find_spec
+from typing import Dict, Optional, Tuple
+
+from markupsafe import Markup
+
+# Optional: brotli variants are built when the library is installed
+BROTLI_AVAILABLE = find_spec('brotli') is not None
+
+# A fingerprinted URL always names the same bytes, so clients never revalidate
+ASSET_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Below this size compression saves less than its own overhead
+MIN_COMPRESS_BYTES = 256
+
+DIGEST_LENGTH = 12
+
+
+class Asset:
+    """One static file: its fingerprint and every encoding of its bytes"""
+
+    def __init__(self, path: str, data: bytes, mtime: float):
+        self.path = path
+        self.mtime = mtime
+        self.digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if self.content_type.startswith('text/') or self.content_type.endswith('javascript'):
+            self.content_type += '; charset=utf-8'
+
+        stem, ext = os.path.splitext(path)
+        self.fingerprinted = f'{stem}.{self.digest}{ext}'
+
+        self.variants = {'identity': data}
+        if len(data) >= MIN_COMPRESS_BYTES:
+            self.variants['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+            if BROTLI_AVAILABLE:
+                import brotli
+                self.variants['br'] = brotli.compress(data, quality=11)
+
+    def negotiate(self, accept_encodings) -> Tuple[str, bytes]:
+        """(encoding, body) of the smallest variant the client accepts"""
+        best = 'identity'
+        for encoding, body in self.variants.items():
+            if encoding != 'identity' and accept_encodings[encoding] \
+                    and len(body) < len(self.variants[best]):
+                best = encoding
+        return best, self.variants[best]
+
+
+class StaticAssets:
+    """
+    Content-fingerprinted, precompressed copies of the static folder
+
+    Each file is read, hashed and compressed (gzip, plus brotli when
+    installed) once, on first use, and kept in memory. url() returns
+    <url_prefix>/<name>.<sha256[:12]>.<ext>. That URL changes whenever
+    the file does, so responses can be cached as immutable for a year, and
+    pages never revalidate their CSS or JS. With auto_reload (debug mode)
+    files are re-read when their mtime changes.
+    """
+
+    def __init__(self, folder: str, url_prefix: str = '/assets', auto_reload: bool = False):
+        self.folder = folder
+        self.url_prefix = url_prefix
+        self.auto_reload = auto_reload
+        self._assets = None  # path -> Asset
+        self._fingerprinted = {}  # fingerprinted path -> Asset
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Asset]:
+        with self._lock:
+            if self._assets is None or self.auto_reload:
+                assets = {}
+                for directory, _, filenames in os.walk(self.folder):
+                    for filename in filenames:
+                        full_path = os.path.join(directory, filename)
+                        path = os.path.relpath(full_path, self.folder).replace(os.sep, '/')
+                        mtime = os.path.getmtime(full_path)
+                        previous = (self._assets or {}).get(path)
+                        if previous is not None and previous.mtime == mtime:
+                            assets[path] = previous
+                            continue
+                        with open(full_path, 'rb') as f:
+                            assets[path] = Asset(path, f.read(), mtime)
+                self._assets = assets
+                self._fingerprinted = {asset.fingerprinted: asset for asset in assets.values()}
+            return self._assets
+
+    def url(self, path: str) -> Optional[str]:
+        """Fingerprinted URL of a static file, or None if there is no such file"""
+        asset = self._load().get(path)
+        return f'{self.url_prefix}/{asset.fingerprinted}' if asset else None
+
+    def lookup(self, fingerprinted: str) -> Optional[Asset]:
+        self._load()
+        return self._fingerprinted.get(fingerprinted)
+
+
+class FragmentCache:
+    """
+    Server-side cache of rendered template fragments
+
+    Called from Jinja as a call block around markup that depends only on
+    its key parts, typically the exam id and a question number:
+
+        {% call fragment_cache('result-question', config.exam_id, n) %}...{% endcall %}
+
+    The body is rendered once per key and served from cache (an
+    utils.exam_cache.ExamCache) after that. Exam ids are content hashes, so
+    only a parser change can alter an exam's markup; version goes into every
+    key for that reason.
+    """
+
+    def __init__(self, cache, version=''):
+        self.cache = cache
+        self.version = version
+
+    def __call__(self, name, *key, caller):
+        cache_key = ':'.join(str(part) for part in (name, self.version, *key))
+        html = self.cache.get(cache_key)
+        if html is None:
+            html = str(caller())
+            self.cache.put(cache_key, html, len(html))
+        return Markup(html)
@@ -0,0 +1,613 @@
+import json
+import logging
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import (BigInteger, Column, DateTime, Integer, MetaData, String, Table, Text,
+                        UniqueConstraint, bindparam, create_engine, delete, event, func, insert,
+                        select, update)
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import CallbackDict
+
+from utils.exam_store import PARSER_VERSION, make_bank
+from utils.item_analysis import CHOICES
+
+metadata = MetaData()
+
+exam_banks = Table(
+    'exam_banks', metadata,
+    Column('exam_id', String(64), primary_key=True),
+    Column('parser_version', Integer, nullable=False),
+    Column('payload', Text, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False),
+)
+
+test_sessions = Table(
+    'test_sessions', metadata,
+    Column('session_id', String(64), primary_key=True),
+    Column('data', Text, nullable=False),
+    Column('expires_at', DateTime(timezone=True), nullable=False, index=True),
+)
+
+published_exams = Table(
+    'published_exams', metadata,
+    Column('code', String(16), primary_key=True),
+    Column('exam_id', String(64), nullable=False),
+    Column('job_id', String(32)),
+    Column('settings', Text, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False),
+)
+
+# Question bank: deduplicated questions pooled from every parsed paper. Rows
+# are append-only, so per-process indexes catch up by reading past their last id
+bank_questions = Table(
+    'bank_questions', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('question_hash', String(64), nullable=False, unique=True),
+    Column('source', String(255), nullable=False),
+    Column('payload', Text, nullable=False),
+    Column('created_at', DateTime(timezone=True), nullable=False),
+)
+
+bank_question_tags = Table(
+    'bank_question_tags', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=True),
+    Column('question_hash', String(64), nullable=False),
+    Column('tag', String(64), nullable=False),
+    UniqueConstraint('question_hash', 'tag'),
+)
+
+# Item analysis: running sums per exam and per question option, only ever
+# incremented (see utils.item_analysis)
+item_attempts = Table(
+    'item_attempts', metadata,
+    Column('exam_id', String(64), primary_key=True),
+    Column('attempts', BigInteger, nullable=False),
+    Column('score_sum', BigInteger, nullable=False),
+    Column('score_sq_sum', BigInteger, nullable=False),
+)
+
+item_responses = Table(
+    'item_responses', metadata,
+    Column('exam_id', String(64), primary_key=True),
+    Column('question', Integer, primary_key=True),
+    Column('choice', Integer, primary_key=True),
+    Column('chosen', BigInteger, nullable=False),
+    Column('score_sum', BigInteger, nullable=False),
+)
+
+parse_jobs = Table(
+    'parse_jobs', metadata,
+    Column('job_id', String(32), primary_key=True),
+    Column('status', Text, nullable=False),
+    Column('updated_at', DateTime(timezone=True), nullable=False),
+)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(database_url: str):
+    """
+    Return the pooled engine for database_url in this process
+
+    Engines are cached per process id so that forked gunicorn workers and
+    parse pool processes never share pooled connections with their parent.
+    """
+    key = (os.getpid(), database_url)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = _create_engine(database_url)
+            metadata.create_all(engine)
+            _engines[key] = engine
+        return engine
+
+
+def _create_engine(database_url: str):
+    if database_url.startswith('sqlite'):
+        engine = create_engine(database_url, connect_args={'check_same_thread': False, 'timeout': 30})
+
+        @event.listens_for(engine, 'connect')
+        def _sqlite_pragmas(dbapi_connection, connection_record):
+            # WAL lets readers proceed while another worker writes
+            cursor = dbapi_connection.cursor()
+            cursor.execute('PRAGMA journal_mode=WAL')
+            cursor.execute('PRAGMA synchronous=NORMAL')
+            cursor.close()
+
+        return engine
+
+    return create_engine(
+        database_url,
+        pool_size=int(os.environ.get('DB_POOL_SIZE', 5)),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        pool_recycle=300,
+        pool_pre_ping=True,
+    )
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+class SqlExamStore:
+    """
+    Content-addressed store of parsed exam banks, backed by SQLAlchemy
+
+    Drop-in replacement for utils.exam_store.ExamStore that works across
+    instances (SQLite locally, Postgres in production). Only the database
+    URL is pickled, so the store can be handed to parse pool processes.
+    """
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+
+    @property
+    def engine(self):
+        return get_engine(self.database_url)
+
+    def has(self, exam_id: str) -> bool:
+        return self.load(exam_id) is not None
+
+    def load(self, exam_id: str) -> Optional[Tuple[List[Dict], Dict[str, str], int]]:
+        """Return (questions, answer_key, size_in_bytes), or None if missing or stale"""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(exam_banks.c.parser_version, exam_banks.c.payload)
+                .where(exam_banks.c.exam_id == exam_id)
+            ).first()
+
+        if row is None or row.parser_version != PARSER_VERSION:
+            return None
+
+        bank = json.loads(row.payload)
+        return bank['questions'], bank['answer_key'], len(row.payload)
+
+    def save(self, exam_id: str, questions: List[Dict], answer_key: Dict) -> None:
+        payload = json.dumps(make_bank(questions, answer_key))
+        values = {'parser_version': PARSER_VERSION, 'payload': payload, 'created_at': _now()}
+        with self.engine.begin() as conn:
+            result = conn.execute(update(exam_banks).where(exam_banks.c.exam_id == exam_id)
+                                  .values(**values))
+            if result.rowcount == 0:
+                try:
+                    with conn.begin_nested():
+                        conn.execute(insert(exam_banks).values(exam_id=exam_id, **values))
+                except IntegrityError:
+                    # Another worker stored the same paper first; content is identical
+                    pass
+
+    def load_job_status(self, job_id: str) -> Optional[Dict]:
+        with self.engine.connect() as conn:
+            status = conn.execute(
+                select(parse_jobs.c.status).where(parse_jobs.c.job_id == job_id)
+            ).scalar()
+        return json.loads(status) if status is not None else None
+
+    def save_job_status(self, job_id: str, status: Dict) -> None:
+        values = {'status': json.dumps(status), 'updated_at': _now()}
+        with self.engine.begin() as conn:
+            result = conn.execute(update(parse_jobs).where(parse_jobs.c.job_id == job_id)
+                                  .values(**values))
+            if result.rowcount == 0:
+                conn.execute(insert(parse_jobs).values(job_id=job_id, **values))
+
+
+class SqlExamDirectory:
+    """
+    Published exams: a short join code mapped to a shared exam bank and fixed settings
+
+    A proctor publishes a paper once; every candidate joining with the code
+    sits the same content-addressed bank under the same duration and
+    marking. Published exams are never modified, so callers may cache them.
+    """
+
+    # No 0/O or 1/I so codes survive being read out or copied by hand
+    CODE_ALPHABET = 'ABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+    CODE_LENGTH = 8
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+
+    @property
+    def engine(self):
+        return get_engine(self.database_url)
+
+    def publish(self, exam_id: str, settings: Dict, job_id: Optional[str] = None) -> str:
+        """Publish exam_id under a new random code and return the code"""
+        values = {'exam_id': exam_id, 'job_id': job_id, 'settings': json.dumps(settings),
+                  'created_at': _now()}
+        while True:
+            code = ''.join(secrets.choice(self.CODE_ALPHABET) for _ in range(self.CODE_LENGTH))
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(published_exams).values(code=code, **values))
+                return code
+            except IntegrityError:
+                # Code already taken; draw another
+                continue
+
+    def get(self, code: str) -> Optional[Dict]:
+        """Return {'code', 'exam_id', 'job_id', 'settings'} for code, or None"""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(published_exams.c.exam_id, published_exams.c.job_id, published_exams.c.settings)
+                .where(published_exams.c.code == code)
+            ).first()
+        if row is None:
+            return None
+        return {'code': code, 'exam_id': row.exam_id, 'job_id': row.job_id,
+                'settings': json.loads(row.settings)}
+
+
+class SqlQuestionStore:
+    """
+    Persistent, deduplicated pool of bank questions and their tags
+
+    Storage behind utils.question_bank.QuestionBank. Only the database URL
+    is pickled, so the store can be handed to parse pool processes, which
+    ingest each paper as soon as it is parsed.
+    """
+
+    # Rows per IN (...) lookup, well under SQLite's bound parameter limit
+    BATCH_SIZE = 500
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+
+    @property
+    def engine(self):
+        return get_engine(self.database_url)
+
+    def add(self, records: Sequence[Dict], source: str, tags: Iterable[str] = ()) -> int:
+        """
+        Store records not seen before and tag every record; return how many were new
+
+        Each record is {'hash', 'question', 'options', 'answer'}, with hashes
+        unique within records.
+        """
+        tags = list(tags)
+        for attempt in range(3):
+            try:
+                with self.engine.begin() as conn:
+                    return self._add(conn, records, source, tags)
+            except IntegrityError:
+                # Another worker ingested some of the same questions concurrently
+                if attempt == 2:
+                    raise
+
+    def _add(self, conn, records, source, tags):
+        hashes = [record['hash'] for record in records]
+        known = set()
+        for batch in _batches(hashes, self.BATCH_SIZE):
+            known.update(conn.execute(select(bank_questions.c.question_hash)
+                                      .where(bank_questions.c.question_hash.in_(batch))).scalars())
+
+        now = _now()
+        new = [{'question_hash': record['hash'], 'source': source[:255], 'created_at': now,
+                'payload': json.dumps({key: record[key] for key in ('question', 'options', 'answer')})}
+               for record in records if record['hash'] not in known]
+        if new:
+            conn.execute(insert(bank_questions), new)
+
+        if tags:
+            tagged = set()
+            for batch in _batches(hashes, self.BATCH_SIZE):
+                tagged.update(conn.execute(
+                    select(bank_question_tags.c.question_hash, bank_question_tags.c.tag)
+                    .where(bank_question_tags.c.question_hash.in_(batch),
+                           bank_question_tags.c.tag.in_(tags))).tuples())
+            rows = [{'question_hash': question_hash, 'tag': tag}
+                    for question_hash in hashes for tag in tags if (question_hash, tag) not in tagged]
+            if rows:
+                conn.execute(insert(bank_question_tags), rows)
+        return len(new)
+
+    def count(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.count()).select_from(bank_questions)).scalar()
+
+    def questions_after(self, last_id: int) -> List[Tuple[int, str, str, Dict]]:
+        """(id, hash, source, payload) of every question stored after id last_id"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(bank_questions.c.id, bank_questions.c.question_hash,
+                       bank_questions.c.source, bank_questions.c.payload)
+                .where(bank_questions.c.id > last_id).order_by(bank_questions.c.id)
+            ).all()
+        return [(row.id, row.question_hash, row.source, json.loads(row.payload)) for row in rows]
+
+    def questions_in(self, ids: Sequence[int]) -> List[Tuple[int, str, str, Dict]]:
+        """(id, hash, source, payload) of the stored questions among ids"""
+        rows = []
+        with self.engine.connect() as conn:
+            for batch in _batches(ids, self.BATCH_SIZE):
+                rows.extend(conn.execute(
+                    select(bank_questions.c.id, bank_questions.c.question_hash,
+                           bank_questions.c.source, bank_questions.c.payload)
+                    .where(bank_questions.c.id.in_(batch))
+                ).all())
+        return [(row.id, row.question_hash, row.source, json.loads(row.payload)) for row in rows]
+
+    def tags_after(self, last_id: int) -> List[Tuple[int, str, str]]:
+        """(id, hash, tag) of every tag added after id last_id"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(bank_question_tags.c.id, bank_question_tags.c.question_hash,
+                       bank_question_tags.c.tag)
+                .where(bank_question_tags.c.id > last_id).order_by(bank_question_tags.c.id)
+            ).all()
+        return [tuple(row) for row in rows]
+
+    def tags_in(self, ids: Sequence[int]) -> List[Tuple[int, str, str]]:
+        """(id, hash, tag) of the stored tags among ids"""
+        rows = []
+        with self.engine.connect() as conn:
+            for batch in _batches(ids, self.BATCH_SIZE):
+                rows.extend(conn.execute(
+                    select(bank_question_tags.c.id, bank_question_tags.c.question_hash,
+                           bank_question_tags.c.tag)
+                    .where(bank_question_tags.c.id.in_(batch))
+                ).all())
+        return [tuple(row) for row in rows]
+
+
+class SqlItemStats:
+    """
+    Running item-analysis sums of every exam, updated as each test is submitted
+
+    Every submission adds to one exam row and one row per question (the
+    option the candidate chose) with UPDATE ... SET x = x + ?, so
+    concurrent workers never lose each other's counts. The rows of an exam
+    are created together, all zero, by its first submission.
+    """
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+
+    @property
+    def engine(self):
+        return get_engine(self.database_url)
+
+    def record(self, exam_id: str, score: int, choices: Sequence[int]) -> None:
+        """Add one submission: its number-correct score and the choice code for each question"""
+        add_attempt = (update(item_attempts).where(item_attempts.c.exam_id == exam_id)
+                       .values(attempts=item_attempts.c.attempts + 1,
+                               score_sum=item_attempts.c.score_sum + score,
+                               score_sq_sum=item_attempts.c.score_sq_sum + score * score))
+        add_responses = (update(item_responses)
+                         .where(item_responses.c.exam_id == exam_id,
+                                item_responses.c.question == bindparam('b_question'),
+                                item_responses.c.choice == bindparam('b_choice'))
+                         .values(chosen=item_responses.c.chosen + 1,
+                                 score_sum=item_responses.c.score_sum + score))
+        with self.engine.begin() as conn:
+            if conn.execute(add_attempt).rowcount == 0:
+                try:
+                    with conn.begin_nested():
+                        self._create(conn, exam_id, len(choices))
+                except IntegrityError:
+                    # Another worker recorded this exam's first submission concurrently
+                    pass
+                conn.execute(add_attempt)
+            # Rows in question order, so concurrent submissions lock them in the same order
+            conn.execute(add_responses, [{'b_question': question, 'b_choice': choice}
+                                         for question, choice in enumerate(choices)])
+
+    def _create(self, conn, exam_id, num_questions):
+        conn.execute(insert(item_attempts).values(exam_id=exam_id, attempts=0, score_sum=0,
+                                                  score_sq_sum=0))
+        conn.execute(insert(item_responses), [
+            {'exam_id': exam_id, 'question': question, 'choice': choice, 'chosen': 0, 'score_sum': 0}
+            for question in range(num_questions) for choice in CHOICES])
+
+    def attempts(self, exam_id: str) -> Optional[Tuple[int, int, int]]:
+        """(attempts, score_sum, score_sq_sum) of exam_id, or None before its first submission"""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(item_attempts.c.attempts, item_attempts.c.score_sum, item_attempts.c.score_sq_sum)
+                .where(item_attempts.c.exam_id == exam_id)
+            ).first()
+        return tuple(row) if row is not None else None
+
+    def responses(self, exam_id: str) -> List[Tuple[int, int, int, int]]:
+        """(question, choice, chosen, score_sum) of every option chosen at least once"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(item_responses.c.question, item_responses.c.choice,
+                       item_responses.c.chosen, item_responses.c.score_sum)
+                .where(item_responses.c.exam_id == exam_id, item_responses.c.chosen > 0)
+            ).all()
+        return [tuple(row) for row in rows]
+
+
+def _batches(items: Sequence, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    """Session dict whose contents live server-side, keyed by an opaque id"""
+
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class SqlSessionInterface(SessionInterface):
+    """
+    Flask session interface storing session data in the database
+
+    The cookie only carries a random session id. Session contents (test
+    configuration, answers, flashes) are stored as JSON in test_sessions,
+    looked up by primary key, and written back only when modified.
+    """
+
+    def __init__(self, database_url: str):
+        self.database_url = database_url
+
+    @property
+    def engine(self):
+        return get_engine(self.database_url)
+
+    def load(self, sid: str) -> Optional[Dict]:
+        """Return the stored data for session id sid, or None if unknown or expired"""
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(test_sessions.c.data, test_sessions.c.expires_at)
+                .where(test_sessions.c.session_id == sid)
+            ).first()
+        if row is None or _as_utc(row.expires_at) <= _now():
+            return None
+        return json.loads(row.data)
+
+    def store(self, sid: str, data: Dict, lifetime: timedelta) -> None:
+        """Write data for session id sid, valid for lifetime from now"""
+        values = {'data': json.dumps(data), 'expires_at': _now() + lifetime}
+        with self.engine.begin() as conn:
+            result = conn.execute(update(test_sessions)
+                                  .where(test_sessions.c.session_id == sid)
+                                  .values(**values))
+            if result.rowcount == 0:
+                conn.execute(insert(test_sessions).values(session_id=sid, **values))
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid:
+            data = self.load(sid)
+            if data is not None:
+                return ServerSession(data, sid=sid)
+
+        return ServerSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                with self.engine.begin() as conn:
+                    conn.execute(delete(test_sessions).where(test_sessions.c.session_id == session.sid))
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if not session.modified and not session.new:
+            return
+
+        self.store(session.sid, dict(session), app.permanent_session_lifetime)
+
+        if session.new:
+            response.set_cookie(
+                name, session.sid,
+                expires=self.get_expiration_time(app, session),
+                httponly=self.get_cookie_httponly(app),
+                domain=domain,
+                path=path,
+                secure=self.get_cookie_secure(app),
+                samesite=self.get_cookie_samesite(app),
+            )
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive datetimes even for timezone-aware columns
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def count_active_sessions(database_url: str) -> int:
+    """Number of sessions that have not expired yet"""
+    with get_engine(database_url).connect() as conn:
+        return conn.execute(select(func.count()).select_from(test_sessions)
+                            .where(test_sessions.c.expires_at > _now())).scalar()
+
+
+def published_exam_ids(database_url: str) -> Set[str]:
+    """Exam ids behind any join code, whose banks must never be evicted"""
+    with get_engine(database_url).connect() as conn:
+        return set(conn.execute(select(published_exams.c.exam_id).distinct()).scalars())
+
+
+def purge_expired_sessions(database_url: str) -> int:
+    """Delete expired sessions and return how many were removed"""
+    with get_engine(database_url).begin() as conn:
+        result = conn.execute(delete(test_sessions).where(test_sessions.c.expires_at <= _now()))
+    if result.rowcount:
+        logging.info(f"Purged {result.rowcount} expired sessions")
+    return result.rowcount
+
+
+
+def purge_exam_banks(database_url: str, older_than: timedelta, max_bytes: int,
+                     min_age: timedelta) -> Tuple[int, int]:
+    """
+    Expire and evict stored exam banks that nothing references any more
+
+    Banks of published exams and of unexpired sessions are kept. Of the
+    rest, those stored before older_than ago (or by an older parser) are
+    deleted, then the oldest until the table fits max_bytes; banks stored
+    within min_age are never touched, as their session may not be saved
+    yet. Sizes are payload lengths, as SqlExamStore.load reports them.
+
+    Returns:
+        (banks deleted, bytes reclaimed)
+    """
+    engine = get_engine(database_url)
+    now = _now()
+    with engine.connect() as conn:
+        pinned = set(conn.execute(select(published_exams.c.exam_id).distinct()).scalars())
+        for data in conn.execute(select(test_sessions.c.data)
+                                 .where(test_sessions.c.expires_at > now)).scalars():
+            exam_id = (json.loads(data).get('test_config') or {}).get('exam_id')
+            if exam_id:
+                pinned.add(exam_id)
+        rows = conn.execute(
+            select(exam_banks.c.exam_id, exam_banks.c.parser_version, exam_banks.c.created_at,
+                   func.length(exam_banks.c.payload).label('size'))
+            .order_by(exam_banks.c.created_at)
+        ).all()
+
+    total = sum(row.size for row in rows)
+    doomed = []
+    for row in rows:
+        age = now - _as_utc(row.created_at)
+        if row.exam_id in pinned or age < min_age:
+            continue
+        if age > older_than or row.parser_version != PARSER_VERSION or total > max_bytes:
+            doomed.append(row.exam_id)
+            total -= row.size
+    if not doomed:
+        return 0, 0
+
+    sizes = {row.exam_id: row.size for row in rows}
+    deleted = reclaimed = 0
+    with engine.begin() as conn:
+        for batch in _batches(doomed, 500):
+            # Only rows still as old as when they were scanned: a worker may have re-saved one
+            gone = conn.execute(delete(exam_banks)
+                                .where(exam_banks.c.exam_id.in_(batch),
+                                       exam_banks.c.created_at <= now - min_age)
+                                .returning(exam_banks.c.exam_id)).scalars().all()
+            deleted += len(gone)
+            reclaimed += sum(sizes[exam_id] for exam_id in gone)
+    if deleted:
+        logging.info(f"Purged {deleted} unreferenced exam banks ({reclaimed} bytes)")
+    return deleted, reclaimed
+
+
+def purge_parse_jobs(database_url: str, older_than: timedelta) -> int:
+    """Delete parse job statuses not updated within older_than and return how many"""
+    with get_engine(database_url).begin() as conn:
+        result = conn.execute(delete(parse_jobs).where(parse_jobs.c.updated_at <= _now() - older_than))
+    if result.rowcount:
+        logging.info(f"Purged {result.rowcount} old parse jobs")
+    return result.rowcount
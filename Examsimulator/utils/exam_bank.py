@@ -0,0 +1,250 @@
+"""
+Compact binary exam bank format
+
+Layout (all integers little-endian):
+
+    header          magic "EXBK", format version, parser version, flags,
+                    question count, answer key offset
+    question index  one u32 absolute offset per question record
+    string pool     length-prefixed UTF-8 option texts shared by records
+    records         one length-prefixed record per question
+    answer key      entry count, then (question number, answer) string pairs
+
+A question record is a presence byte, the question number, the question
+text, the options as (letter, text) pairs and a JSON blob for any other keys
+(empty when there are none). Strings are a u32 length followed by UTF-8
+bytes. When a bank is written with interning, option texts that occur more
+than once (placeholders such as "Option A", "None of these") are stored
+once in the string pool and a record holds POOLED | offset in place of the
+length.
+
+MappedExamBank opens a bank with mmap and behaves as a read-only sequence of
+question dicts: indexing seeks straight to one record through the index and
+decodes only that record, and every worker that maps the same file shares it
+through the page cache.
+"""
+import json
+import mmap
+import struct
+from collections import Counter
+from collections.abc import Sequence
+from typing import Dict, List, Tuple
+
+MAGIC = b'EXBK'
+FORMAT_VERSION = 1
+FLAG_INTERNED = 0x1
+
+HEADER = struct.Struct('<4sHHHII')
+U32 = struct.Struct('<I')
+NUMBER = struct.Struct('<i')
+BYTE = struct.Struct('<B')
+
+# Set on an option's length word when it is an offset into the string pool
+POOLED = 0x80000000
+
+# Presence bits of a question record
+HAS_NUMBER = 0x1
+HAS_QUESTION = 0x2
+HAS_OPTIONS = 0x4
+
+STANDARD_KEYS = ('number', 'question', 'options')
+
+
+class BankFormatError(ValueError):
+    """Raised when a buffer is not a bank this code can read"""
+    pass
+
+
+def _pack_str(out: bytearray, value: str) -> None:
+    data = value.encode('utf-8')
+    out += U32.pack(len(data))
+    out += data
+
+
+def _option_items(question: Dict) -> List[Tuple[str, str]]:
+    options = question.get('options')
+    if not isinstance(options, dict):
+        return []
+    return [(str(letter), str(text)) for letter, text in options.items()]
+
+
+def encode_bank(questions: List[Dict], answer_key: Dict, parser_version: int,
+                intern_options: bool = True) -> bytes:
+    """Serialise a parsed (questions, answer_key) pair into the binary format"""
+    position = HEADER.size + U32.size * len(questions)
+
+    pool = bytearray()
+    pooled = {}
+    if intern_options:
+        counts = Counter(text for question in questions for _, text in _option_items(question))
+        for text, count in counts.items():
+            if count > 1:
+                pooled[text] = position + len(pool)
+                _pack_str(pool, text)
+    position += len(pool)
+
+    records = bytearray()
+    record_offsets = []
+    for question in questions:
+        number = question.get('number')
+        has_number = isinstance(number, int) and -2 ** 31 <= number < 2 ** 31
+        has_options = isinstance(question.get('options'), dict)
+
+        record = bytearray()
+        record += BYTE.pack((HAS_NUMBER if has_number else 0) |
+                            (HAS_QUESTION if 'question' in question else 0) |
+                            (HAS_OPTIONS if has_options else 0))
+        record += NUMBER.pack(number if has_number else 0)
+        _pack_str(record, str(question.get('question', '')))
+
+        option_items = _option_items(question)
+        record += BYTE.pack(len(option_items))
+        for letter, text in option_items:
+            letter_bytes = letter.encode('utf-8')
+            record += BYTE.pack(len(letter_bytes))
+            record += letter_bytes
+            if text in pooled:
+                record += U32.pack(POOLED | pooled[text])
+            else:
+                _pack_str(record, text)
+
+        extras = {k: v for k, v in question.items() if k not in STANDARD_KEYS}
+        if not has_number and 'number' in question:
+            extras['number'] = number
+        if not has_options and 'options' in question:
+            extras['options'] = question['options']
+        _pack_str(record, json.dumps(extras, separators=(',', ':')) if extras else '')
+
+        record_offsets.append(position + len(records))
+        records += U32.pack(len(record))
+        records += record
+    position += len(records)
+
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, parser_version,
+                                FLAG_INTERNED if intern_options else 0,
+                                len(questions), position))
+    for offset in record_offsets:
+        out += U32.pack(offset)
+    out += pool
+    out += records
+
+    out += U32.pack(len(answer_key))
+    for key, value in answer_key.items():
+        _pack_str(out, str(key))
+        _pack_str(out, str(value))
+
+    return bytes(out)
+
+
+class MappedExamBank(Sequence):
+    """
+    Read-only view of a binary exam bank
+
+    Behaves like the questions list returned by parse_questions_from_file:
+    len(), indexing, slicing and iteration all work, but each access decodes
+    only the records it touches. The answer key is decoded in full on first
+    use because grading always needs all of it.
+    """
+
+    def __init__(self, buffer):
+        self._buf = buffer
+        if len(buffer) < HEADER.size:
+            raise BankFormatError('Truncated exam bank')
+
+        (magic, format_version, self.parser_version, self.flags,
+         self._num_questions, self._answer_key_offset) = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC or format_version != FORMAT_VERSION:
+            raise BankFormatError('Not a supported exam bank')
+
+        self._answer_key = None
+
+    @classmethod
+    def open(cls, path: str) -> 'MappedExamBank':
+        """Memory-map the bank stored at path"""
+        with open(path, 'rb') as f:
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def __len__(self) -> int:
+        return self._num_questions
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.get_question(i) for i in range(*index.indices(self._num_questions))]
+        if index < 0:
+            index += self._num_questions
+        if not 0 <= index < self._num_questions:
+            raise IndexError('question index out of range')
+        return self.get_question(index)
+
+    @property
+    def answer_key(self) -> Dict[str, str]:
+        if self._answer_key is None:
+            self._answer_key = self._read_answer_key(self._answer_key_offset)
+        return self._answer_key
+
+    @property
+    def size(self) -> int:
+        """Size of the encoded bank in bytes"""
+        return len(self._buf)
+
+    def get_question(self, index: int) -> Dict:
+        """Decode question index (0-based) without touching any other record"""
+        offset, = U32.unpack_from(self._buf, HEADER.size + U32.size * index)
+        offset += U32.size
+        present, = BYTE.unpack_from(self._buf, offset)
+        number, = NUMBER.unpack_from(self._buf, offset + BYTE.size)
+        text, offset = self._read_str(offset + BYTE.size + NUMBER.size)
+
+        question = {}
+        if present & HAS_QUESTION:
+            question['question'] = text
+
+        count, = BYTE.unpack_from(self._buf, offset)
+        offset += BYTE.size
+        options = {}
+        for _ in range(count):
+            letter_length, = BYTE.unpack_from(self._buf, offset)
+            offset += BYTE.size
+            letter = bytes(self._buf[offset:offset + letter_length]).decode('utf-8')
+            offset += letter_length
+            options[letter], offset = self._read_str(offset)
+        if present & HAS_OPTIONS:
+            question['options'] = options
+        if present & HAS_NUMBER:
+            question['number'] = number
+
+        extras, offset = self._read_str(offset)
+        if extras:
+            question.update(json.loads(extras))
+        return question
+
+    def to_tuple(self) -> Tuple[List[Dict], Dict[str, str]]:
+        """Fully decode into the (questions, answer_key) pair the parser produces"""
+        return self[:], dict(self.answer_key)
+
+    def close(self) -> None:
+        if hasattr(self._buf, 'close'):
+            self._buf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read_str(self, offset: int) -> Tuple[str, int]:
+        """Decode the string at offset, returning it and the offset just past it"""
+        length, = U32.unpack_from(self._buf, offset)
+        end = offset + U32.size
+        if length & POOLED:
+            return self._read_str(length & ~POOLED)[0], end
+        return bytes(self._buf[end:end + length]).decode('utf-8'), end + length
+
+    def _read_answer_key(self, offset: int) -> Dict[str, str]:
+        count, = U32.unpack_from(self._buf, offset)
+        offset += U32.size
+        answer_key = {}
+        for _ in range(count):
+            key, offset = self._read_str(offset)
+            answer_key[key], offset = self._read_str(offset)
+        return answer_key
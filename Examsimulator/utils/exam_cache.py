@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class ExamCache:
+    """
+    Bounded per-worker LRU/TTL cache of parsed exam banks
+
+    The exam bank cache is keyed by exam_id (the SHA-256 of the uploaded
+    file, shared by every session taking that paper) and holds the
+    (questions, answer_key) tuple exactly as the exam store loaded it; the
+    other instances in app.py key theirs by session, publish code or
+    fragment. The cache is bounded both by entry count and by an
+    approximate size in bytes (for banks, the size of the stored bank),
+    evicting least recently used entries first. Entries older than the TTL
+    are treated as misses.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, size, stored_at = entry
+            if self.ttl and time.monotonic() - stored_at > self.ttl:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value: Any, size: int) -> None:
+        """Store value under key, evicting old entries to stay within bounds"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            # Never cache something that alone would blow the byte budget
+            if size > self.max_bytes:
+                return
+
+            self._entries[key] = (value, size, time.monotonic())
+            self.current_bytes += size
+
+            while (len(self._entries) > self.max_entries or
+                   self.current_bytes > self.max_bytes):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate(self, key: str) -> None:
+        """Drop key from the cache if present"""
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self) -> None:
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0
+            }
+
+    def _remove(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
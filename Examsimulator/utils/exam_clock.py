@@ -0,0 +1,108 @@
+import heapq
+import json
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+
+def exam_deadline(config: Dict, state: Dict) -> Optional[float]:
+    """Wall-clock time at which the test ends, or None if it has not started"""
+    if not state.get('start_time'):
+        return None
+    return state['start_time'] + config['duration'] * 60
+
+
+def remaining_seconds(config: Dict, state: Dict, now: Optional[float] = None) -> Optional[float]:
+    """Seconds left on the test (negative once overdue), or None if it has not started"""
+    deadline = exam_deadline(config, state)
+    if deadline is None:
+        return None
+    return deadline - (time.time() if now is None else now)
+
+
+def format_sse(event: str, data: Dict, retry_ms: Optional[int] = None) -> str:
+    """Encode one server-sent event"""
+    lines = []
+    if retry_ms is not None:
+        lines.append(f'retry: {retry_ms}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+class ExamClock:
+    """
+    Deadline scheduler that auto-submits overdue tests
+
+    Deadlines sit in a min-heap served by a single background sweeper
+    thread, which sleeps until the earliest deadline (plus a grace period
+    for in-flight answer syncs) and then calls on_expire(key), which returns
+    whether it actually expired anything (the entry may be stale). Scheduling
+    and cancelling are O(log n), so one thread covers thousands of
+    candidates without per-second polling. Rescheduled and cancelled
+    entries are dropped lazily when they reach the top of the heap.
+    """
+
+    def __init__(self, on_expire: Callable[[str], bool], grace: float = 5.0):
+        self.on_expire = on_expire
+        self.grace = grace
+        self.expired_count = 0
+        self._heap = []  # (fire_at, key)
+        self._fire_at = {}  # key -> fire_at of its live heap entry
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, key: str, deadline: float) -> None:
+        """Auto-submit key once deadline (plus grace) has passed"""
+        fire_at = deadline + self.grace
+        with self._cond:
+            if self._fire_at.get(key) == fire_at:
+                return
+            self._fire_at[key] = fire_at
+            heapq.heappush(self._heap, (fire_at, key))
+            self._compact()
+
+            # Started lazily so each forked gunicorn worker gets its own sweeper
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='exam-clock', daemon=True)
+                self._thread.start()
+            elif self._heap[0][1] == key:
+                self._cond.notify()
+
+    def cancel(self, key: str) -> None:
+        with self._cond:
+            self._fire_at.pop(key, None)
+
+    def pending_count(self) -> int:
+        with self._cond:
+            return len(self._fire_at)
+
+    def _compact(self):
+        # Keep stale entries from piling up when sessions are rescheduled often
+        if len(self._heap) > 2 * len(self._fire_at) + 64:
+            self._heap = [(fire_at, key) for key, fire_at in self._fire_at.items()]
+            heapq.heapify(self._heap)
+
+    def _next_due(self) -> str:
+        with self._cond:
+            while True:
+                while self._heap and self._fire_at.get(self._heap[0][1]) != self._heap[0][0]:
+                    heapq.heappop(self._heap)
+
+                now = time.time()
+                if self._heap and self._heap[0][0] <= now:
+                    _, key = heapq.heappop(self._heap)
+                    del self._fire_at[key]
+                    return key
+
+                self._cond.wait(timeout=self._heap[0][0] - now if self._heap else None)
+
+    def _run(self):
+        while True:
+            key = self._next_due()
+            try:
+                if self.on_expire(key):
+                    self.expired_count += 1
+            except Exception as e:
+                logging.error(f"Error auto-submitting session: {str(e)}")
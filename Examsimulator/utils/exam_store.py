@@ -0,0 +1,119 @@
+import json
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from utils.exam_bank import MappedExamBank, encode_bank
+
+# Bump when the parser output changes so stale banks are re-parsed
+PARSER_VERSION = 5
+
+# Subdirectories of the store root; see sharded_path
+BANKS_DIR = 'banks'
+JOBS_DIR = 'jobs'
+
+
+def sharded_path(root: str, kind: str, key: str, filename: str) -> str:
+    """
+    Path of filename under root/kind/<first two characters of key>/
+
+    Spreading files over up to 256 shard directories keeps every directory
+    small, so lookups and the janitor's scans stay fast with many banks.
+    """
+    return os.path.join(root, kind, key[:2], filename)
+
+
+class ExamStore:
+    """
+    Content-addressed store of parsed exam banks, backed by local files
+
+    Each bank is written once as banks/<sha[:2]>/exam_<sha256>.bank, keyed by the digest of
+    the uploaded file, and shared by every session that uploads the same
+    paper. Banks use the binary format in utils.exam_bank and are loaded as
+    memory-mapped views, so a question lookup decodes one record and workers
+    share the file through the page cache. Writes go through a temporary file
+    and os.replace so concurrent uploads of the same paper never observe a
+    half-written bank. Loading a bank touches its mtime, which utils.janitor
+    uses as the last-used time when evicting.
+
+    Parse job status lives under jobs/ as job_<id>.json. See
+    utils.db_store.SqlExamStore for the database-backed equivalent.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def path_for(self, exam_id: str) -> str:
+        return sharded_path(self.root, BANKS_DIR, exam_id, f'exam_{exam_id}.bank')
+
+    def job_path(self, job_id: str) -> str:
+        return sharded_path(self.root, JOBS_DIR, job_id, f'job_{job_id}.json')
+
+    def has(self, exam_id: str) -> bool:
+        return self.load(exam_id) is not None
+
+    def load(self, exam_id: str) -> Optional[Tuple[Sequence[Dict], Dict[str, str], int]]:
+        """
+        Open a bank from disk
+
+        Returns:
+            Tuple of (questions, answer_key, size_in_bytes), or None if the
+            bank is missing or was written by another parser version.
+            questions is a MappedExamBank that decodes records on access.
+        """
+        path = self.path_for(exam_id)
+        try:
+            bank = MappedExamBank.open(path)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            return None
+
+        if bank.parser_version != PARSER_VERSION:
+            bank.close()
+            return None
+
+        return bank, bank.answer_key, bank.size
+
+    def save(self, exam_id: str, questions: List[Dict], answer_key: Dict) -> None:
+        """Atomically write a bank for exam_id"""
+        self._write_file(self.path_for(exam_id),
+                         encode_bank(questions, answer_key, PARSER_VERSION))
+
+    def load_job_status(self, job_id: str) -> Optional[Dict]:
+        """Read a parse job status, or None if the job is unknown"""
+        try:
+            with open(self.job_path(job_id), 'r') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def save_job_status(self, job_id: str, status: Dict) -> None:
+        """Atomically publish a parse job status so any worker can poll it"""
+        self._write_file(self.job_path(job_id), json.dumps(status).encode('utf-8'))
+
+    def _write_file(self, path: str, data: bytes) -> None:
+        # The temporary file must share a directory (and filesystem) with path
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            logging.error(f"Failed to write {path}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def make_bank(questions: List[Dict], answer_key: Dict) -> Dict:
+    """Build the serialisable form of a parsed exam bank"""
+    return {
+        'parser_version': PARSER_VERSION,
+        'questions': questions,
+        # JSON object keys are strings; normalise up front so the
+        # in-memory and stored forms agree
+        'answer_key': {str(k): v for k, v in answer_key.items()}
+    }
@@ -1,28 +1,96 @@
 import re
 import logging
-from typing import Dict, List, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
 import os
 
-try:
-    import pdfplumber
-    PDF_AVAILABLE = True
-except ImportError:
-    PDF_AVAILABLE = False
+from utils.metrics import StageTimer
+
+# Parser libraries (and the pdfminer, PIL and lxml trees behind them) are only
+# looked up here and imported on first use, so importing the app stays fast;
+# see preload_parsers for loading them up front
+PDFPLUMBER_AVAILABLE = find_spec('pdfplumber') is not None
+if not PDFPLUMBER_AVAILABLE:
     logging.warning("pdfplumber not available. PDF parsing will be disabled.")
 
-try:
-    from docx import Document
-    DOCX_AVAILABLE = True
-except ImportError:
-    DOCX_AVAILABLE = False
-    logging.warning("python-docx not available. DOCX parsing will be disabled.")
+# Optional fast text extractors; their text differs from pdfplumber's layout-aware
+# extraction on real papers, so they are only used when asked for (see PDF_BACKEND)
+PDFIUM_AVAILABLE = find_spec('pypdfium2') is not None
+PDFMINER_AVAILABLE = find_spec('pdfminer') is not None
+
+# DOCX files are streamed with the standard library; python-docx is the fallback
+DOCX_AVAILABLE = find_spec('docx') is not None
+
+# Progress callbacks receive (units_done, units_total); units are pages for PDFs
+ProgressCallback = Callable[[int, int], None]
+
+# Worker processes used for PDF text extraction (1 disables the pool)
+PDF_EXTRACT_WORKERS = int(os.environ.get('PDF_EXTRACT_WORKERS', min(4, os.cpu_count() or 1)))
+
+# Below this many pages per worker the pool costs more than it saves
+MIN_PAGES_PER_WORKER = 8
+
+# PDF text extractor: "auto" uses pdfplumber and falls back to pdfium when
+# pdfplumber is missing or finds no questions, or one of "pdfium", "pdfminer", "pdfplumber"
+PDF_BACKEND = os.environ.get('PDF_BACKEND', 'auto')
+
+# DOCX reader: "auto" streams word/document.xml and falls back to python-docx
+# when that finds no questions, or one of "stream", "python-docx"
+DOCX_BACKEND = os.environ.get('DOCX_BACKEND', 'auto')
+
+# Precompiled patterns: every regex used while parsing is compiled once here
+
+# The first question may omit the dot after its number; later boundaries may not
+QUESTION_HEADER = re.compile(r'Q(\d+)\.?\s*', re.IGNORECASE)
+QUESTION_BOUNDARY = re.compile(r'Q\d+\.', re.IGNORECASE)
+QUESTION_LINE = re.compile(r'^\s*Q\d+\.', re.IGNORECASE)
+
+# Look for patterns that indicate an actual answer key section,
+# not just "correct answers" in instructions. Tried in priority order: the
+# first pattern found anywhere in the document wins, wherever the others are.
+ANSWER_KEY_PATTERNS = tuple(re.compile(pattern, re.IGNORECASE) for pattern in (
+    r'answer\s*key\s*:?\s*[\r\n]',  # Answer Key: followed by newline
+    r'answers?\s*:?\s*[\r\n]\s*(?:Q?\d+[\.\:]\s*[A-D]|1[\.\:]\s*[A-D])',  # Answers: followed by actual answers
+    r'solution\s*key\s*:?\s*[\r\n]',
+    r'correct\s*answers?\s*:?\s*[\r\n]\s*(?:Q?\d+[\.\:]\s*[A-D]|1[\.\:]\s*[A-D])',  # Correct answers: followed by actual answers
+))
+
+# PDF artifact cleanup, applied in order by clean_pdf_text
+PDF_CLEANUP_RULES = [
+    (re.compile(r'\s+'), ' '),  # Normalize whitespace (this also folds line breaks)
+    (re.compile(r'\s[a-z]\s'), ' '),  # Remove isolated lowercase letters
+    (re.compile(r'\s[A-Z]\s(?![A-D]\))'), ' '),  # Remove isolated uppercase letters (except option letters)
+    (re.compile(r'www\.[a-zA-Z.]+'), ''),  # Remove website URLs
+    (re.compile(r'[0-9]+\s*www\.[a-zA-Z.]+'), ''),  # Remove page numbers with URLs
+    (re.compile(r'\(\s*([a-dA-D])\s*\)'), r'(\1)'),  # Fix spaced parentheses
+]
+
+# Options inside a single question
+INLINE_OPTION = re.compile(r'\(([a-dA-D])\)')  # (a) Option1 (b) Option2
+INLINE_OPTION_WITH_TEXT = re.compile(r'\(([a-dA-D])\)\s*([^(]*?)(?=\s*\([a-dA-D]\)|$)')
+LINE_OPTION_START = re.compile(r'^[A-D]\)', re.IGNORECASE)  # A) Option1 \n B) Option2
+LINE_OPTION = re.compile(r'^([A-D])\)\s*(.*)', re.IGNORECASE)
+WHITESPACE_RUN = re.compile(r'\s+')
+LEADING_NON_WORD = re.compile(r'^[^\w]*')
+
+# Answer key entries like "1. A", "2. B", etc.
+ANSWER_ENTRY_PATTERNS = [
+    re.compile(r'(\d+)\.?\s*([A-D])', re.IGNORECASE),  # 1. A or 1 A
+    re.compile(r'Q?(\d+)[\.\:\s]*([A-D])', re.IGNORECASE),  # Q1: A or Q1 A
+]
 
-def parse_questions_from_file(filepath: str) -> Tuple[List[Dict], Dict[int, str]]:
+def parse_questions_from_file(filepath: str,
+                              progress: Optional[ProgressCallback] = None,
+                              timings: Optional[StageTimer] = None) -> Tuple[List[Dict], Dict[int, str]]:
     """
     Parse questions and answers from uploaded file (PDF or DOCX)
     
     Args:
         filepath: Path to the uploaded file
+        progress: Optional callback reporting extraction progress
+        timings: Optional StageTimer charged with the time spent in each
+            stage (extract, split, cleanup, parse_question, answer_key)
         
     Returns:
         Tuple of (questions_list, answer_key_dict)
@@ -32,46 +100,358 @@ def parse_questions_from_file(filepath: str) -> Tuple[List[Dict], Dict[int, str]
     file_ext = os.path.splitext(filepath)[1].lower()
     
     if file_ext == '.pdf':
-        if not PDF_AVAILABLE:
+        if not available_pdf_backends():
             raise Exception("PDF processing not available. Please install pdfplumber.")
-        return parse_pdf_questions(filepath)
+        return parse_pdf_questions(filepath, progress, timings=timings)
     elif file_ext == '.docx':
-        if not DOCX_AVAILABLE:
-            raise Exception("DOCX processing not available. Please install python-docx.")
-        return parse_docx_questions(filepath)
+        return parse_docx_questions(filepath, progress, timings)
     else:
         raise Exception(f"Unsupported file format: {file_ext}")
 
-def parse_pdf_questions(filepath: str) -> Tuple[List[Dict], Dict[int, str]]:
-    """Parse questions from PDF file"""
+def parse_pdf_questions(filepath: str,
+                        progress: Optional[ProgressCallback] = None,
+                        workers: Optional[int] = None,
+                        timings: Optional[StageTimer] = None,
+                        backend: Optional[str] = None) -> Tuple[List[Dict], Dict[int, str]]:
+    """
+    Parse questions from PDF file, page by page as text is extracted
+    
+    Backends are tried in the order given by pdf_backend_candidates: when
+    pdfplumber's layout-aware extraction yields no questions (or cannot read
+    the file) the next extractor is tried.
+    """
     try:
-        with pdfplumber.open(filepath) as pdf:
-            text = ""
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        
-        return extract_questions_from_text(text)
+        timings = timings or StageTimer()
+        candidates = pdf_backend_candidates(backend)
+        for name in candidates:
+            extractor = StreamingQuestionExtractor(timings)
+            try:
+                pages = timings.timed_iter('extract', iter_pdf_text(filepath, progress, workers, name))
+                questions = list(iter_questions(pages, extractor))
+            except Exception as e:
+                if name == candidates[-1]:
+                    raise
+                logging.warning(f"{name} could not read {os.path.basename(filepath)}: {str(e)}")
+                continue
+            
+            if questions or name == candidates[-1]:
+                logging.debug("Parsed %d questions with the %s backend", len(questions), name)
+                return questions, extractor.answer_key
+            logging.info(f"No questions found with the {name} backend, falling back")
     
     except Exception as e:
         logging.error(f"Error parsing PDF: {str(e)}")
         raise Exception(f"Failed to parse PDF file: {str(e)}")
 
-def parse_docx_questions(filepath: str) -> Tuple[List[Dict], Dict[int, str]]:
-    """Parse questions from DOCX file"""
+class PdfBackend:
+    """Extracts the text of a range of PDF pages; instances are picklable for the pool"""
+    
+    name = None
+    # Below this many pages per worker the pool costs more than it saves
+    min_pages_per_worker = MIN_PAGES_PER_WORKER
+    
+    def available(self) -> bool:
+        raise NotImplementedError
+    
+    def page_count(self, filepath: str) -> int:
+        raise NotImplementedError
+    
+    def iter_pages(self, filepath: str, start: int, end: int) -> Iterator[Optional[str]]:
+        """Yield the text of pages [start, end) in order (None for pages without text)"""
+        raise NotImplementedError
+
+class PdfplumberBackend(PdfBackend):
+    """Layout-aware extraction; slowest, but the reference for parse accuracy"""
+    
+    name = 'pdfplumber'
+    
+    def available(self):
+        return PDFPLUMBER_AVAILABLE
+    
+    def page_count(self, filepath):
+        import pdfplumber
+        with pdfplumber.open(filepath) as pdf:
+            return len(pdf.pages)
+    
+    def iter_pages(self, filepath, start, end):
+        import pdfplumber
+        with pdfplumber.open(filepath, pages=list(range(start + 1, end + 1))) as pdf:
+            for page in pdf.pages:
+                yield page.extract_text()
+
+class PdfiumBackend(PdfBackend):
+    """PDFium's native text extraction, tens of times faster than pdfplumber"""
+    
+    name = 'pdfium'
+    # Whole papers take milliseconds, so worker processes never pay off
+    min_pages_per_worker = 1000
+    
+    def available(self):
+        return PDFIUM_AVAILABLE
+    
+    def page_count(self, filepath):
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(filepath)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+    
+    def iter_pages(self, filepath, start, end):
+        import pypdfium2
+        pdf = pypdfium2.PdfDocument(filepath)
+        try:
+            for index in range(start, end):
+                page = pdf[index]
+                text_page = page.get_textpage()
+                try:
+                    yield text_page.get_text_range().replace('\r\n', '\n')
+                finally:
+                    text_page.close()
+                    page.close()
+        finally:
+            pdf.close()
+
+class PdfminerBackend(PdfBackend):
+    """pdfminer in low-level text mode (content stream order, no layout analysis)"""
+    
+    name = 'pdfminer'
+    
+    def available(self):
+        return PDFMINER_AVAILABLE
+    
+    def page_count(self, filepath):
+        from pdfminer.pdfpage import PDFPage
+        with open(filepath, 'rb') as f:
+            return sum(1 for _ in PDFPage.get_pages(f))
+    
+    def iter_pages(self, filepath, start, end):
+        from pdfminer.high_level import extract_text as pdfminer_extract_text
+        text = pdfminer_extract_text(filepath, page_numbers=range(start, end), laparams=None)
+        # Every page is terminated by a form feed
+        yield from text.split('\f')[:end - start]
+
+PDF_BACKENDS = {backend.name: backend for backend in (PdfiumBackend(), PdfminerBackend(),
+                                                       PdfplumberBackend())}
+# pdfplumber is the reference: on the bundled paper pdfium text drops or garbles
+# options in about half the questions, so it is only a fallback
+AUTO_BACKEND_ORDER = ('pdfplumber', 'pdfium')
+
+def preload_parsers() -> None:
+    """
+    Import the installed parser libraries now rather than on the first upload
+    
+    Called before forking (gunicorn --preload) so workers and parse pool
+    processes share the already-imported modules.
+    """
+    modules = [name for name, available in (('pypdfium2', PDFIUM_AVAILABLE),
+                                            ('pdfplumber', PDFPLUMBER_AVAILABLE),
+                                            ('docx', DOCX_AVAILABLE)) if available]
+    for name in modules:
+        __import__(name)
+
+def available_pdf_backends() -> List[str]:
+    return [name for name, backend in PDF_BACKENDS.items() if backend.available()]
+
+def pdf_backend_candidates(backend: Optional[str] = None) -> List[str]:
+    """Backends to try for one document, in order"""
+    backend = backend or PDF_BACKEND
+    available = available_pdf_backends()
+    if backend != 'auto':
+        if backend not in available:
+            raise Exception(f"PDF backend {backend} is not available")
+        return [backend]
+    
+    candidates = [name for name in AUTO_BACKEND_ORDER if name in available]
+    if not candidates:
+        raise Exception("PDF processing not available. Please install pdfplumber.")
+    return candidates
+
+def extract_pdf_text(filepath: str,
+                     progress: Optional[ProgressCallback] = None,
+                     workers: Optional[int] = None,
+                     backend: Optional[str] = None) -> str:
+    """Extract the whole text of a PDF (see iter_pdf_text)"""
+    return "".join(iter_pdf_text(filepath, progress, workers, backend))
+
+def iter_pdf_text(filepath: str,
+                  progress: Optional[ProgressCallback] = None,
+                  workers: Optional[int] = None,
+                  backend: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the text of each non-empty PDF page, newline-terminated, in page order
+    
+    Large documents are split into contiguous page ranges that are
+    extracted in parallel worker processes; ranges are yielded in order as
+    soon as they and every range before them are done.
+    
+    Args:
+        filepath: Path to the PDF file
+        progress: Optional callback reporting pages extracted so far
+        workers: Number of worker processes (defaults to PDF_EXTRACT_WORKERS)
+        backend: Name of the extractor (defaults to the first auto candidate)
+    """
+    if workers is None:
+        workers = PDF_EXTRACT_WORKERS
+    name = pdf_backend_candidates(backend)[0]
+    extractor = PDF_BACKENDS[name]
+    
+    total_pages = extractor.page_count(filepath)
+    workers = max(1, min(workers, total_pages // extractor.min_pages_per_worker))
+    
+    if workers == 1:
+        for page_num, page_text in enumerate(extractor.iter_pages(filepath, 0, total_pages), 1):
+            if progress:
+                progress(page_num, total_pages)
+            if page_text:
+                yield page_text + "\n"
+        return
+    
+    # Several ranges per worker keeps the pool busy when pages vary in cost
+    range_size = -(-total_pages // (workers * 4))
+    ranges = [(start, min(start + range_size, total_pages))
+              for start in range(0, total_pages, range_size)]
+    
+    pages_done = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_extract_page_range, name, filepath, start, end)
+                   for start, end in ranges]
+        for future in futures:
+            page_texts = future.result()
+            pages_done += len(page_texts)
+            if progress:
+                progress(pages_done, total_pages)
+            for page_text in page_texts:
+                if page_text:
+                    yield page_text + "\n"
+
+def _extract_page_range(backend: str, filepath: str, start: int, end: int) -> List[Optional[str]]:
+    """Extract text for pages [start, end) in a worker process"""
+    return list(PDF_BACKENDS[backend].iter_pages(filepath, start, end))
+
+def parse_docx_questions(filepath: str,
+                         progress: Optional[ProgressCallback] = None,
+                         timings: Optional[StageTimer] = None,
+                         backend: Optional[str] = None) -> Tuple[List[Dict], Dict[int, str]]:
+    """
+    Parse questions from DOCX file, paragraph by paragraph as it is read
+    
+    Readers are tried in the order given by docx_reader_candidates: the
+    streaming reader is followed by python-docx when it finds no questions
+    or cannot read the file.
+    """
     try:
-        doc = Document(filepath)
-        text = ""
-        for paragraph in doc.paragraphs:
-            text += paragraph.text + "\n"
-        
-        return extract_questions_from_text(text)
+        timings = timings or StageTimer()
+        candidates = docx_reader_candidates(backend)
+        for name in candidates:
+            extractor = StreamingQuestionExtractor(timings)
+            try:
+                paragraphs = timings.timed_iter('extract', DOCX_READERS[name](filepath))
+                questions = list(iter_questions(paragraphs, extractor))
+            except Exception as e:
+                if name == candidates[-1]:
+                    raise
+                logging.warning(f"{name} could not read {os.path.basename(filepath)}: {str(e)}")
+                continue
+            
+            if questions or name == candidates[-1]:
+                logging.debug("Parsed %d questions with the %s reader", len(questions), name)
+                if progress:
+                    progress(1, 1)
+                return questions, extractor.answer_key
+            logging.info(f"No questions found with the {name} reader, falling back")
     
     except Exception as e:
         logging.error(f"Error parsing DOCX: {str(e)}")
         raise Exception(f"Failed to parse DOCX file: {str(e)}")
 
+def docx_reader_candidates(backend: Optional[str] = None) -> List[str]:
+    """Readers to try for one document, in order"""
+    backend = backend or DOCX_BACKEND
+    available = [name for name in DOCX_READERS if name != 'python-docx' or DOCX_AVAILABLE]
+    if backend != 'auto':
+        if backend not in available:
+            raise Exception(f"DOCX reader {backend} is not available")
+        return [backend]
+    return available
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+W_BODY = WORD_NS + 'body'
+W_PARAGRAPH = WORD_NS + 'p'
+W_TEXT = WORD_NS + 't'
+W_TAB = WORD_NS + 'tab'
+W_BREAKS = (WORD_NS + 'br', WORD_NS + 'cr')
+
+def iter_docx_stream(filepath: str) -> Iterator[str]:
+    """
+    Yield the text of each DOCX paragraph, newline-terminated, in document order
+    
+    word/document.xml is parsed incrementally straight out of the zip rather
+    than loaded into a document tree: each paragraph is released as soon as
+    it has been read, so memory stays flat however long the paper is.
+    Paragraphs inside table cells are yielded in place, one line per cell
+    paragraph; text boxes nested in a paragraph become extra lines of it.
+    """
+    import zipfile
+    from xml.etree.ElementTree import iterparse
+    
+    with zipfile.ZipFile(filepath) as archive, archive.open('word/document.xml') as xml:
+        body = None
+        depth = 0
+        paragraph_depth = 0
+        parts = None
+        for event, elem in iterparse(xml, events=('start', 'end')):
+            tag = elem.tag
+            if event == 'start':
+                depth += 1
+                if tag == W_PARAGRAPH and parts is None:
+                    parts = []
+                    paragraph_depth = depth
+                elif tag == W_BODY:
+                    body = elem
+                continue
+            
+            if parts is not None:
+                if tag == W_TEXT:
+                    parts.append(elem.text or '')
+                elif tag == W_TAB:
+                    parts.append('\t')
+                elif tag in W_BREAKS:
+                    parts.append('\n')
+                elif tag == W_PARAGRAPH:
+                    if depth == paragraph_depth:
+                        parts.append('\n')
+                        yield ''.join(parts)
+                        parts = None
+                    else:
+                        parts.append('\n')
+            
+            depth -= 1
+            # Drop each finished paragraph or table from the tree
+            if body is not None and depth == 2:
+                body.clear()
+
+def iter_docx_document(filepath: str) -> Iterator[str]:
+    """Yield the same paragraph lines as iter_docx_stream, through python-docx"""
+    from docx import Document
+    yield from _iter_block_text(Document(filepath))
+
+def _iter_block_text(container) -> Iterator[str]:
+    for block in container.iter_inner_content():
+        if not hasattr(block, 'rows'):
+            yield block.text + "\n"
+            continue
+        for row in block.rows:
+            # Merged cells are repeated once per grid column they span
+            seen = []
+            for cell in row.cells:
+                if cell._tc not in seen:
+                    seen.append(cell._tc)
+                    yield from _iter_block_text(cell)
+
+# Streaming first; "auto" falls back to python-docx's full object model
+DOCX_READERS = {'stream': iter_docx_stream, 'python-docx': iter_docx_document}
+
 def extract_questions_from_text(text: str) -> Tuple[List[Dict], Dict[int, str]]:
     """
     Extract questions and answer key from text content
@@ -97,126 +477,201 @@ def extract_questions_from_text(text: str) -> Tuple[List[Dict], Dict[int, str]]:
     3. C
     ...
     """
-    questions = []
-    answer_key = {}
-    
-    logging.debug(f"Processing text of length: {len(text)}")
-    
-    # Try to find a real answer key section, not just "correct answers" in instructions
-    # Look for patterns that indicate an actual answer key section
-    answer_key_patterns = [
-        r'(?i)answer\s*key\s*:?\s*[\r\n]',  # Answer Key: followed by newline
-        r'(?i)answers?\s*:?\s*[\r\n]\s*(?:Q?\d+[\.\:]\s*[A-D]|1[\.\:]\s*[A-D])',  # Answers: followed by actual answers
-        r'(?i)solution\s*key\s*:?\s*[\r\n]',
-        r'(?i)correct\s*answers?\s*:?\s*[\r\n]\s*(?:Q?\d+[\.\:]\s*[A-D]|1[\.\:]\s*[A-D])'  # Correct answers: followed by actual answers
-    ]
-    
-    questions_text = text
-    answer_text = ""
-    
-    for pattern in answer_key_patterns:
-        match = re.search(pattern, text)
-        if match:
-            split_pos = match.start()
-            questions_text = text[:split_pos]
-            answer_text = text[split_pos:]
-            logging.debug(f"Found answer key section using pattern: {pattern}")
-            break
-    
-    if not answer_text:
-        logging.debug("No answer key section found, processing entire text as questions")
-        # For this specific case, let's try to find where questions actually end
-        # Look for common endings like page numbers, URLs, etc.
-        end_patterns = [
-            r'www\.[a-zA-Z.]+\s*$',  # Website at end
-            r'\d+\s*www\.[a-zA-Z.]+\s*$',  # Page number + website
-            r'^\s*\d+\s*$'  # Just page numbers
-        ]
-        
-        lines = text.split('\n')
-        questions_end = len(lines)
-        
-        # Find where questions likely end by looking for the last Q pattern
-        for i in range(len(lines) - 1, -1, -1):
-            if re.match(r'^\s*Q\d+\.', lines[i], re.IGNORECASE):
-                # Found last question, include some lines after it for options
-                questions_end = min(len(lines), i + 10)
-                break
-        
-        questions_text = '\n'.join(lines[:questions_end])
+    logging.debug("Processing text of length: %d", len(text))
     
-    # Extract questions
-    questions = extract_questions_list(questions_text)
-    logging.debug(f"Extracted {len(questions)} questions")
-    
-    # Extract answer key
-    if answer_text:
-        answer_key = extract_answer_key(answer_text)
-        logging.debug(f"Extracted {len(answer_key)} answers")
-    
-    # If no answer key found, create a dummy answer key for testing purposes
-    if not answer_key and questions:
-        logging.debug("Creating dummy answer key for testing")
-        for i, q in enumerate(questions):
-            # Use first available option as dummy answer
-            if q.get('options'):
-                first_option = list(q['options'].keys())[0]
-                answer_key[i + 1] = first_option
-    
-    return questions, answer_key
+    extractor = StreamingQuestionExtractor()
+    questions = list(iter_questions([text], extractor))
+    return questions, extractor.answer_key
 
-def extract_questions_list(text: str) -> List[Dict]:
-    """Extract individual questions with options from text"""
-    questions = []
+def iter_questions(chunks: Iterable[str],
+                   extractor: Optional['StreamingQuestionExtractor'] = None) -> Iterator[Dict]:
+    """
+    Yield parsed questions from a stream of text chunks as soon as each is complete
     
-    # Extensive text cleanup for PDF artifacts
-    text = clean_pdf_text(text)
+    Pass an extractor to read its answer_key once the generator is exhausted.
+    """
+    if extractor is None:
+        extractor = StreamingQuestionExtractor()
     
-    # Pattern to match questions starting with Q1., Q2., etc.
-    # More flexible pattern to capture multiline questions
-    question_pattern = r'Q(\d+)\.?\s*(.*?)(?=Q\d+\.|\Z)'
-    question_matches = re.findall(question_pattern, text, re.DOTALL | re.IGNORECASE)
+    for chunk in chunks:
+        yield from extractor.feed(chunk)
+    yield from extractor.close()
+
+# Longest stretch of text a question boundary or answer key heading can span.
+# Anything further back than this from the end of the buffer is settled.
+STREAM_LOOKBEHIND = 256
+
+class StreamingQuestionExtractor:
+    """
+    Single-pass, incremental question extractor
+    
+    Text is fed in chunks (a PDF page or DOCX paragraph at a time) and each
+    question is returned as soon as the start of the next question, or the
+    answer key, has been seen. Only the current question plus a short
+    look-behind window is buffered, so the work is linear in document size
+    and the first question is available before the whole file is read.
+    
+    The answer key heading patterns keep their priority order: once a
+    lower-priority heading (say "Answers:" in the instructions) is seen,
+    text after it is held back until a higher-priority heading turns up or
+    the document ends, and only then split into questions and answer key.
+    
+    After close(), answer_key holds the parsed answer key (or a dummy key
+    using each question's first option when the paper has none). Time spent
+    splitting, cleaning and parsing questions and reading the answer key is
+    charged to the given StageTimer.
+    """
     
-    logging.debug(f"Found {len(question_matches)} potential question matches")
+    def __init__(self, timings: Optional[StageTimer] = None):
+        self.timings = timings or StageTimer()
+        self.answer_key = {}
+        self.question_count = 0
+        self._buffer = ""
+        self._scan_from = 0
+        self._key_scan_from = 0  # where heading patterns resume searching
+        self._key_split = None  # (priority, position) of the best answer key heading so far
+        self._in_question = False  # buffer starts at a question header
+        self._answer_parts = None  # raw answer key section, once found
+        self._first_options = []
+    
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume a chunk of text and return any questions it completed"""
+        if self._answer_parts is not None:
+            self._answer_parts.append(chunk)
+            return []
+        
+        self._buffer += chunk
+        with self.timings.stage('split'):
+            return self._drain(final=False)
+    
+    def close(self) -> List[Dict]:
+        """Flush the final question and build the answer key"""
+        questions = []
+        if self._answer_parts is None:
+            with self.timings.stage('split'):
+                questions = self._drain(final=True)
+        
+        if self._in_question:
+            # No answer key: keep the last question line plus some lines for its options
+            lines = self._buffer.split('\n')
+            for i in range(len(lines) - 1, -1, -1):
+                if QUESTION_LINE.match(lines[i]):
+                    lines = lines[:i + 10]
+                    break
+            with self.timings.stage('split'):
+                questions.extend(self._emit('\n'.join(lines)))
+            self._buffer = ""
+            self._in_question = False
+        
+        logging.debug("Extracted %d questions", self.question_count)
+        
+        if self._answer_parts is not None:
+            with self.timings.stage('answer_key'):
+                self.answer_key = extract_answer_key("".join(self._answer_parts))
+            logging.debug("Extracted %d answers", len(self.answer_key))
+        else:
+            logging.debug("No answer key section found, processing entire text as questions")
+        
+        # If no answer key found, create a dummy answer key for testing purposes
+        if not self.answer_key and self._first_options:
+            logging.debug("Creating dummy answer key for testing")
+            for i, first_option in enumerate(self._first_options):
+                if first_option:
+                    self.answer_key[i + 1] = first_option
+        
+        return questions
     
-    for match in question_matches:
-        question_num = int(match[0])
-        question_text = match[1].strip()
+    def _drain(self, final: bool) -> List[Dict]:
+        buf = self._buffer
+        limit = len(buf) if final else max(len(buf) - STREAM_LOOKBEHIND, 0)
+        if limit <= self._scan_from and not final:
+            return []
+        
+        settled = limit
+        best = self._key_split[0] if self._key_split else len(ANSWER_KEY_PATTERNS)
+        for priority, pattern in enumerate(ANSWER_KEY_PATTERNS[:best]):
+            match = pattern.search(buf, self._key_scan_from)
+            if match and (final or match.start() < settled):
+                self._key_split = (priority, match.start())
+                break
+        
+        # Only the top pattern (or the end of the document) settles where the key starts
+        answer_match = self._key_split is not None and (final or self._key_split[0] == 0)
+        if self._key_split is not None:
+            limit = self._key_split[1]
+        
+        questions = []
+        pos = None
+        if self._in_question:
+            pos = 0
+        else:
+            header = QUESTION_HEADER.search(buf, self._scan_from)
+            if header and header.start() < limit:
+                pos = header.start()
+        
+        if pos is not None:
+            body_start = max(QUESTION_HEADER.match(buf, pos).end(), self._scan_from)
+            for boundary in QUESTION_BOUNDARY.finditer(buf, body_start):
+                if boundary.start() >= limit:
+                    break
+                questions.extend(self._emit(buf[pos:boundary.start()]))
+                pos = boundary.start()
+        
+        if answer_match:
+            if pos is not None:
+                questions.extend(self._emit(buf[pos:limit]))
+            self._answer_parts = [buf[limit:]]
+            self._buffer = ""
+            self._in_question = False
+            return questions
+        
+        # Drop everything already consumed; scanning resumes at the settled limit
+        keep_from = pos if pos is not None else limit
+        self._buffer = buf[keep_from:]
+        self._scan_from = limit - keep_from
+        self._key_scan_from = max(settled - keep_from, 0)
+        if self._key_split is not None:
+            self._key_split = (self._key_split[0], self._key_split[1] - keep_from)
+        self._in_question = pos is not None
+        return questions
+    
+    def _emit(self, segment: str) -> List[Dict]:
+        """Parse one raw question segment (header included)"""
+        # Clean with the header attached so artifacts right after it are handled
+        # the same way as anywhere else in the document
+        with self.timings.stage('cleanup'):
+            segment = clean_pdf_text(segment)
+        header = QUESTION_HEADER.match(segment)
+        if not header:
+            return []
+        question_num = int(header.group(1))
+        question_text = segment[header.end():].strip()
         
         # Skip if the question text is too short (likely not a real question)
         if len(question_text) < 10:
-            logging.debug(f"Skipping Q{question_num} - text too short: {len(question_text)}")
-            continue
+            logging.debug("Skipping Q%d - text too short: %d", question_num, len(question_text))
+            return []
         
-        logging.debug(f"Processing Q{question_num}: {question_text[:100]}...")
+        # %-style arguments: nothing is formatted unless DEBUG logging is enabled
+        logging.debug("Processing Q%d: %.100s...", question_num, question_text)
         
         # Extract question and options
-        question_data = parse_single_question(question_text)
-        if question_data:
-            question_data['number'] = question_num
-            questions.append(question_data)
-            logging.debug(f"Successfully parsed Q{question_num}")
-        else:
-            logging.debug(f"Failed to parse Q{question_num}")
-    
-    return questions
+        with self.timings.stage('parse_question'):
+            question_data = parse_single_question(question_text)
+        if not question_data:
+            logging.debug("Failed to parse Q%d", question_num)
+            return []
+        
+        question_data['number'] = question_num
+        self.question_count += 1
+        self._first_options.append(next(iter(question_data['options']), None))
+        logging.debug("Successfully parsed Q%d", question_num)
+        return [question_data]
 
 def clean_pdf_text(text: str) -> str:
     """Clean up PDF text extraction artifacts"""
-    # Remove common PDF artifacts
-    text = re.sub(r'\s+', ' ', text)  # Normalize whitespace
-    text = re.sub(r'\n+', '\n', text)  # Normalize line breaks
-    
-    # Remove isolated single characters that are PDF artifacts
-    text = re.sub(r'\s[a-z]\s', ' ', text)  # Remove isolated lowercase letters
-    text = re.sub(r'\s[A-Z]\s(?![A-D]\))', ' ', text)  # Remove isolated uppercase letters (except option letters)
-    
-    # Remove common PDF noise patterns
-    text = re.sub(r'www\.[a-zA-Z.]+', '', text)  # Remove website URLs
-    text = re.sub(r'[0-9]+\s*www\.[a-zA-Z.]+', '', text)  # Remove page numbers with URLs
-    
-    # Clean up option patterns - ensure proper spacing
-    text = re.sub(r'\(\s*([a-dA-D])\s*\)', r'(\1)', text)  # Fix spaced parentheses
+    for pattern, replacement in PDF_CLEANUP_RULES:
+        text = pattern.sub(replacement, text)
     
     return text.strip()
 
@@ -239,8 +694,7 @@ def parse_single_question(text: str) -> Optional[Dict]:
     
     # Pattern 1: Inline options like (a) Option1 (b) Option2 (c) Option3 (d) Option4
     # Look for at least 2 option patterns in the text
-    option_pattern = r'\(([a-dA-D])\)'
-    option_positions = [(m.start(), m.group(1)) for m in re.finditer(option_pattern, text)]
+    option_positions = [(m.start(), m.group(1)) for m in INLINE_OPTION.finditer(text)]
     
     if len(option_positions) >= 2:
         # Extract question text (everything before first option)
@@ -249,8 +703,7 @@ def parse_single_question(text: str) -> Optional[Dict]:
         
         # Extract inline options with better pattern
         # Handle cases where options might be just (a) (b) (c) (d) without content
-        full_pattern = r'\(([a-dA-D])\)\s*([^(]*?)(?=\s*\([a-dA-D]\)|$)'
-        option_matches = re.findall(full_pattern, text)
+        option_matches = INLINE_OPTION_WITH_TEXT.findall(text)
         
         for option_letter, option_text in option_matches:
             option_text = option_text.strip()
@@ -274,7 +727,7 @@ def parse_single_question(text: str) -> Optional[Dict]:
         # Find where options start (A), B), C), D))
         option_start_idx = len(lines)
         for i, line in enumerate(lines):
-            if re.match(r'^[A-D]\)', line, re.IGNORECASE):
+            if LINE_OPTION_START.match(line):
                 option_start_idx = i
                 break
         
@@ -283,7 +736,7 @@ def parse_single_question(text: str) -> Optional[Dict]:
         
         # Extract options
         for line in lines[option_start_idx:]:
-            option_match = re.match(r'^([A-D])\)\s*(.*)', line, re.IGNORECASE)
+            option_match = LINE_OPTION.match(line)
             if option_match:
                 option_letter = option_match.group(1).upper()
                 option_text = option_match.group(2).strip()
@@ -294,20 +747,21 @@ def parse_single_question(text: str) -> Optional[Dict]:
     # Clean up question text - remove extra spaces and unwanted characters
     if question_text:
         # Remove various noise patterns commonly found in PDFs
-        question_text = re.sub(r'\s+', ' ', question_text)
-        question_text = re.sub(r'^[^\w]*', '', question_text)  # Remove leading non-word chars
+        question_text = WHITESPACE_RUN.sub(' ', question_text)
+        question_text = LEADING_NON_WORD.sub('', question_text)  # Remove leading non-word chars
         question_text = question_text.strip()
     
     # Validate we have a question and at least 2 options
     if not question_text or len(question_text) < 5:
-        logging.debug(f"Validation failed - question_text too short: '{question_text}' ({len(question_text) if question_text else 0} chars)")
+        logging.debug("Validation failed - question_text too short: '%s' (%d chars)",
+                      question_text, len(question_text))
         return None
     
     if len(options) < 2:
-        logging.debug(f"Validation failed - insufficient options: {len(options)} options found")
+        logging.debug("Validation failed - insufficient options: %d options found", len(options))
         return None
     
-    logging.debug(f"Successfully parsed question: {question_text[:50]}... with {len(options)} options")
+    logging.debug("Successfully parsed question: %.50s... with %d options", question_text, len(options))
     return {
         'question': question_text,
         'options': options
@@ -317,14 +771,8 @@ def extract_answer_key(text: str) -> Dict[int, str]:
     """Extract answer key from text"""
     answer_key = {}
     
-    # Pattern to match answer key entries like "1. A", "2. B", etc.
-    answer_patterns = [
-        r'(\d+)\.?\s*([A-D])',  # 1. A or 1 A
-        r'Q?(\d+)[\.\:\s]*([A-D])',  # Q1: A or Q1 A
-    ]
-    
-    for pattern in answer_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
+    for pattern in ANSWER_ENTRY_PATTERNS:
+        matches = pattern.findall(text)
         for match in matches:
             question_num = int(match[0])
             answer = match[1].upper()
@@ -0,0 +1,109 @@
+"""
+Streaming item analysis
+
+Each submitted test is folded into running sums for its exam as it is
+submitted, so the statistics are never recomputed from stored submissions:
+
+    per exam:              attempts n, sum of scores S, sum of squared scores SS
+    per question, option:  times chosen, sum of the scores of those who chose it
+
+Scores are number-correct totals (marking scheme aside), so every sum is an
+integer. They are updated with plain additions, which commute: workers
+record concurrently without locking each other out, and the variance and
+covariances below come out exactly, without the rounding drift of a
+floating-point running mean. From these sums, analyze() derives in
+O(questions) time, however many attempts there are:
+
+    difficulty       p = share of candidates answering correctly
+    discrimination   point-biserial correlation of the item with the total
+                     score, and with the rest of the test (item excluded)
+    distractors      share of candidates choosing each option, and their
+                     mean score
+    reliability      KR-20 = k / (k - 1) * (1 - sum(p * q) / var(total))
+"""
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from utils.scoring import NO_KEY, OPTION_CODES, OTHER_ANSWER, UNANSWERED
+
+CHOICE_NAMES = {UNANSWERED: 'unanswered', OTHER_ANSWER: 'other',
+                **{code: letter for letter, code in OPTION_CODES.items()}}
+CHOICES = tuple(sorted(CHOICE_NAMES))
+
+
+def _ratio(numerator, denominator) -> Optional[float]:
+    return numerator / denominator if denominator else None
+
+
+def _correlation(covariance, variance_a, variance_b) -> Optional[float]:
+    if variance_a <= 0 or variance_b <= 0:
+        return None
+    return covariance / math.sqrt(variance_a * variance_b)
+
+
+def analyze(attempts: int, score_sum: int, score_sq_sum: int,
+            counts: Iterable[Tuple[int, int, int, int]], key_codes: List[int]) -> Dict:
+    """
+    Item statistics of one exam from its running sums
+
+    Args:
+        attempts, score_sum, score_sq_sum: exam totals
+        counts: (question index, choice code, times chosen, score sum) rows
+        key_codes: encoded answer key (utils.scoring.encode_key)
+
+    Returns:
+        {'attempts', 'questions', 'mean_score', 'score_sd', 'kr20', 'items'}
+        with one item per question: {'question_num', 'key', 'p_value',
+        'point_biserial', 'corrected_point_biserial', 'options'}; options
+        maps each choice made to {'rate', 'mean_score'}. Statistics that
+        are undefined (no attempts, no variance) are None.
+    """
+    n = attempts
+    k = len(key_codes)
+    chosen = [{} for _ in range(k)]
+    for question, choice, times, scores in counts:
+        if 0 <= question < k and times:
+            chosen[question][choice] = (times, scores)
+
+    # Population moments, scaled by n * n so they stay integers until the end
+    variance_n2 = n * score_sq_sum - score_sum * score_sum
+    variance = variance_n2 / (n * n) if n else 0.0
+
+    items = []
+    sum_pq = 0.0
+    for question in range(k):
+        key = key_codes[question]
+        correct, correct_scores = chosen[question].get(key, (0, 0)) if key != NO_KEY else (0, 0)
+        p = _ratio(correct, n)
+        pq = p * (1 - p) if p is not None else 0.0
+        sum_pq += pq
+
+        point_biserial = corrected = None
+        if n:
+            # cov(item, total); the rest score is the total minus the item itself
+            covariance = (n * correct_scores - correct * score_sum) / (n * n)
+            point_biserial = _correlation(covariance, pq, variance)
+            corrected = _correlation(covariance - pq, pq, variance - 2 * covariance + pq)
+
+        items.append({
+            'question_num': question + 1,
+            'key': CHOICE_NAMES.get(key),
+            'p_value': p,
+            'point_biserial': point_biserial,
+            'corrected_point_biserial': corrected,
+            'options': {CHOICE_NAMES[choice]: {'rate': times / n, 'mean_score': scores / times}
+                        for choice, (times, scores) in sorted(chosen[question].items())}
+        })
+
+    kr20 = None
+    if k > 1 and variance > 0:
+        kr20 = k / (k - 1) * (1 - sum_pq / variance)
+
+    return {
+        'attempts': n,
+        'questions': k,
+        'mean_score': _ratio(score_sum, n),
+        'score_sd': math.sqrt(variance) if n else None,
+        'kr20': kr20,
+        'items': items
+    }
@@ -0,0 +1,288 @@
+"""
+Garbage collector for the app's temporary files and expired database rows
+
+Everything the app writes lives under one root folder:
+
+    uploads/                 upload spool files, deleted once parsed
+    banks/<xx>/exam_*.bank   exam banks (EXAM_STORE=files), mtime = last used
+    jobs/<xx>/job_*.json     parse job statuses (EXAM_STORE=files)
+
+Each sweep removes upload spools and half-written *.tmp files older than
+upload_ttl (they were orphaned by a crash or a killed worker), job statuses
+older than job_ttl, and banks unused for bank_ttl. If the remaining files
+still exceed max_bytes, the least recently used banks are evicted until the
+total fits, never touching a bank used within min_age. Banks behind a
+published join code are never evicted: an exam assembled from the question
+bank has no upload to re-parse it from. They are looked up in the database,
+so sweeps without a database URL leave every bank alone. Per-session
+questions_*/answers_*.json files and old flat-layout files that earlier
+versions left directly in the temp directory are cleaned from legacy_root;
+only names this app generated there, owned by the current user, qualify.
+With a database URL, expired sessions and old parse jobs are purged too, and
+banks stored in the database (EXAM_STORE=sql) get the same bank_ttl,
+max_bytes and min_age treatment, keeping those of published exams and
+unexpired sessions (see utils.db_store.purge_exam_banks).
+
+Command line (e.g. from cron):
+    python -m utils.janitor ROOT [--legacy-root DIR] [--database-url URL] [--dry-run]
+"""
+import argparse
+import logging
+import os
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from utils.exam_store import BANKS_DIR, JOBS_DIR
+
+UPLOADS_DIR = 'uploads'
+
+CATEGORIES = ('uploads', 'partial', 'jobs', 'banks', 'quota', 'legacy')
+
+LEGACY_SESSION_FILE = re.compile(r'^(questions|answers)_[0-9a-f-]{36}\.json$')
+LEGACY_STORE_FILE = re.compile(r'^(exam_[0-9a-f]{64}\.(json|bank)|job_[0-9a-f]{32}\.json)$')
+# tempfile.mkstemp(prefix='upload_', suffix=ext): eight random [a-z0-9_] characters
+LEGACY_UPLOAD_FILE = re.compile(r'^upload_[a-z0-9_]{8}\.(pdf|docx)$')
+BANK_FILE = re.compile(r'^exam_([0-9a-f]{64})\.bank$')
+
+
+class Janitor:
+    """
+    Periodic sweeper enforcing TTLs and a byte quota on the app's files
+
+    Cumulative counts of removed files and reclaimed bytes per category are
+    kept in totals for the metrics endpoint. Several workers may sweep the
+    same root; a file that another worker removed first is simply skipped.
+    """
+
+    def __init__(self, root: str, legacy_root: Optional[str] = None,
+                 upload_ttl: float = 3600, job_ttl: float = 86400,
+                 session_ttl: float = 86400, bank_ttl: float = 2 * 86400,
+                 max_bytes: int = 1024 * 1024 * 1024, min_age: float = 3600,
+                 interval: float = 600, database_url: Optional[str] = None):
+        self.root = root
+        self.legacy_root = legacy_root
+        self.upload_ttl = upload_ttl
+        self.job_ttl = job_ttl
+        self.session_ttl = session_ttl
+        self.bank_ttl = bank_ttl
+        self.max_bytes = max_bytes
+        self.min_age = min_age
+        self.interval = interval
+        self.database_url = database_url
+
+        self.runs = 0
+        self.totals = {'files': {c: 0 for c in CATEGORIES},
+                       'bytes': {c: 0 for c in CATEGORIES},
+                       'sessions': 0, 'parse_jobs': 0, 'exam_banks': 0}
+        self.last_report = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def ensure_started(self) -> None:
+        """Start the background sweeper in this process if it is not running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            # Started lazily so each forked gunicorn worker gets its own thread
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name='janitor', daemon=True)
+                self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"Janitor sweep failed: {str(e)}")
+
+    def sweep(self, dry_run: bool = False) -> Dict:
+        """
+        Run one pass over the root, the legacy root and the database
+
+        Returns:
+            Report with removed files and reclaimed bytes per category, the
+            files and bytes kept, purged database rows and the duration
+        """
+        started = time.monotonic()
+        now = time.time()
+        report = {'files': {c: 0 for c in CATEGORIES}, 'bytes': {c: 0 for c in CATEGORIES},
+                  'kept_files': 0, 'kept_bytes': 0, 'sessions': 0, 'parse_jobs': 0,
+                  'exam_banks': 0}
+
+        def remove(category, path, size):
+            if not dry_run:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    return
+            report['files'][category] += 1
+            report['bytes'][category] += size
+
+        pinned = self._published_exam_ids()
+        kept_banks = []
+        for category, path, stat in self._scan_root():
+            age = now - stat.st_mtime
+            if path.endswith('.tmp'):
+                expired = age > self.upload_ttl
+                category = 'partial'
+            elif category == 'uploads':
+                expired = age > self.upload_ttl
+            elif category == 'jobs':
+                expired = age > self.job_ttl
+            elif pinned is None or _bank_exam_id(path) in pinned:
+                report['kept_files'] += 1
+                report['kept_bytes'] += stat.st_size
+                continue
+            else:
+                expired = age > self.bank_ttl
+
+            if expired:
+                remove(category, path, stat.st_size)
+                continue
+            report['kept_files'] += 1
+            report['kept_bytes'] += stat.st_size
+            if category == 'banks':
+                kept_banks.append((stat.st_mtime, stat.st_size, path))
+
+        # Over quota: evict least recently used banks that are not in active use
+        kept_banks.sort()
+        for mtime, size, path in kept_banks:
+            if report['kept_bytes'] <= self.max_bytes or now - mtime < self.min_age:
+                break
+            remove('quota', path, size)
+            report['kept_files'] -= 1
+            report['kept_bytes'] -= size
+
+        for path, stat, ttl in self._scan_legacy():
+            if now - stat.st_mtime > ttl:
+                remove('legacy', path, stat.st_size)
+
+        if self.database_url and not dry_run:
+            from utils.db_store import purge_exam_banks, purge_expired_sessions, purge_parse_jobs
+            report['sessions'] = purge_expired_sessions(self.database_url)
+            report['parse_jobs'] = purge_parse_jobs(self.database_url,
+                                                    timedelta(seconds=self.job_ttl))
+            report['exam_banks'], _ = purge_exam_banks(self.database_url,
+                                                       timedelta(seconds=self.bank_ttl),
+                                                       self.max_bytes,
+                                                       timedelta(seconds=self.min_age))
+
+        report['duration'] = time.monotonic() - started
+        if not dry_run:
+            self._record(report)
+
+        reclaimed = sum(report['bytes'].values())
+        if reclaimed or report['sessions'] or report['parse_jobs'] or report['exam_banks']:
+            logging.info(f"Janitor removed {sum(report['files'].values())} files "
+                         f"({reclaimed} bytes), {report['sessions']} sessions, "
+                         f"{report['parse_jobs']} parse jobs and {report['exam_banks']} "
+                         f"stored banks in {report['duration']:.2f}s")
+        return report
+
+    def _record(self, report):
+        with self._lock:
+            self.runs += 1
+            for key in ('files', 'bytes'):
+                for category, value in report[key].items():
+                    self.totals[key][category] += value
+            self.totals['sessions'] += report['sessions']
+            self.totals['parse_jobs'] += report['parse_jobs']
+            self.totals['exam_banks'] += report['exam_banks']
+            self.last_report = report
+
+    def _published_exam_ids(self):
+        """Exam ids of published exams, or None (keep every bank) if unknown"""
+        if not self.database_url:
+            return None
+        from utils.db_store import published_exam_ids
+        return published_exam_ids(self.database_url)
+
+    def _scan_root(self):
+        """Yield (category, path, stat) for every file under the managed root"""
+        for category, directory, sharded in (('uploads', UPLOADS_DIR, False),
+                                             ('jobs', JOBS_DIR, True),
+                                             ('banks', BANKS_DIR, True)):
+            top = os.path.join(self.root, directory)
+            directories = _subdirectories(top) if sharded else [top]
+            for path in directories:
+                yield from ((category, entry.path, entry.stat()) for entry in _files(path))
+
+    def _scan_legacy(self):
+        """Yield (path, stat, ttl) for files older versions left in legacy_root"""
+        if not self.legacy_root:
+            return
+        uid = os.getuid() if hasattr(os, 'getuid') else None
+        for entry in _files(self.legacy_root):
+            # The temp directory is shared: never touch another user's files
+            if uid is not None and entry.stat().st_uid != uid:
+                continue
+            if LEGACY_SESSION_FILE.match(entry.name):
+                yield entry.path, entry.stat(), self.session_ttl
+            elif LEGACY_STORE_FILE.match(entry.name):
+                yield entry.path, entry.stat(), self.bank_ttl
+            elif LEGACY_UPLOAD_FILE.match(entry.name):
+                yield entry.path, entry.stat(), self.upload_ttl
+
+
+def _bank_exam_id(path: str) -> Optional[str]:
+    match = BANK_FILE.match(os.path.basename(path))
+    return match.group(1) if match else None
+
+
+def _subdirectories(path: str) -> List[str]:
+    try:
+        with os.scandir(path) as entries:
+            return [entry.path for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+
+
+def _files(path: str):
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file(follow_symlinks=False):
+                        entry.stat()
+                        yield entry
+                except FileNotFoundError:
+                    # Removed by another worker between listing and stat
+                    continue
+    except FileNotFoundError:
+        return
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Remove expired exam simulator files')
+    parser.add_argument('root', help='UPLOAD_FOLDER of the app')
+    parser.add_argument('--legacy-root', help='temp directory older versions wrote into')
+    parser.add_argument('--database-url', help='also purge expired sessions, old parse jobs and '
+                        'unreferenced stored banks; banks are only expired or evicted with it')
+    parser.add_argument('--max-bytes', type=int, default=1024 * 1024 * 1024)
+    parser.add_argument('--bank-ttl-hours', type=float, default=48)
+    parser.add_argument('--dry-run', action='store_true', help='report without deleting')
+    args = parser.parse_args(argv)
+
+    janitor = Janitor(args.root, legacy_root=args.legacy_root, database_url=args.database_url,
+                      max_bytes=args.max_bytes, bank_ttl=args.bank_ttl_hours * 3600)
+    report = janitor.sweep(dry_run=args.dry_run)
+
+    print(f"{'category':>10} {'files':>8} {'bytes':>12}")
+    for category in CATEGORIES:
+        print(f"{category:>10} {report['files'][category]:>8} {report['bytes'][category]:>12}")
+    print(f"{'kept':>10} {report['kept_files']:>8} {report['kept_bytes']:>12}")
+    if args.database_url and not args.dry_run:
+        print(f"purged {report['sessions']} sessions, {report['parse_jobs']} parse jobs, "
+              f"{report['exam_banks']} stored banks")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format
+
+Counters and histograms are registered once at import time and updated
+from request hooks and background jobs; values that already live
+elsewhere (cache counters, queue depths, janitor totals) are read at
+scrape time by collector functions instead of being mirrored. Every
+gunicorn worker keeps its own registry, so scrape each worker (or a
+single-worker deployment) rather than relying on one process to see all
+traffic.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Request latency buckets in seconds, from cached reads up to slow uploads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# A collector returns (name, type, help, [(labels, value), ...]) families
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class Counter:
+    """Monotonic counter, optionally split by label values"""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(self.labels, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        with self._lock:
+            return [('', key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values, optionally split by label values"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(self.labels, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time spent inside the with block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> List[Tuple[str, Tuple, float]]:
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+
+        samples = []
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), values):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                samples.append(('_bucket', key + (('le', le),), cumulative))
+            samples.append(('_sum', key, values[-1]))
+            samples.append(('_count', key, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Set of metrics and scrape-time collectors rendered together"""
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def collector(self, fn: Callable[[], Iterable[Family]]) -> Callable[[], Iterable[Family]]:
+        """Register fn (usable as a decorator) to report gauge-like values on every scrape"""
+        with self._lock:
+            self._collectors.append(fn)
+        return fn
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Every metric in Prometheus text format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+            collectors = list(self._collectors)
+
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for suffix, key, value in metric.samples():
+                lines.append(f'{metric.name}{suffix}{_format_labels(key)} {_format_value(value)}')
+
+        for collect in collectors:
+            for name, kind, help, samples in collect():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_format_labels(tuple(labels.items()))} {_format_value(value)}')
+
+        return '\n'.join(lines) + '\n'
+
+
+class StageTimer:
+    """
+    Accumulates exclusive wall time per named stage
+
+    Stages may nest; time spent in an inner stage is charged to the inner
+    stage only, so the totals add up to the time spent under any stage.
+    Meant for one thread (one parse job) at a time.
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self._child_time = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        self._child_time.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.add(name, elapsed - self._child_time.pop())
+            if self._child_time:
+                self._child_time[-1] += elapsed
+
+    def add(self, name: str, seconds: float) -> None:
+        self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    def timed_iter(self, name: str, iterable: Iterable) -> Iterable:
+        """Yield from iterable, charging the time spent producing each item to name"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+
+def _label_key(names: Tuple[str, ...], labels: Dict[str, str]) -> Tuple:
+    return tuple((name, str(labels.get(name, ''))) for name in names)
+
+
+def _format_labels(pairs: Tuple) -> str:
+    if not pairs:
+        return ''
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+# Process-wide registry used by the app and its utils
+registry = MetricsRegistry()
@@ -0,0 +1,151 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional, Sequence
+
+from utils.file_parser import parse_questions_from_file
+from utils.metrics import StageTimer, registry
+
+# Minimum seconds between progress writes from a running job
+PROGRESS_INTERVAL = 0.25
+
+
+PARSE_STAGE_SECONDS = registry.histogram(
+    'exam_parse_stage_seconds', 'Time spent in each stage of parsing a paper', ['stage'],
+    buckets=(0.001, 0.005, 0.025, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+PARSE_JOBS = registry.counter('exam_parse_jobs_total', 'Finished parse jobs by outcome', ['state'])
+
+
+class QueueFullError(Exception):
+    """Raised when the parse queue has no room for another job"""
+    pass
+
+
+def run_parse_job(store, job_id: str, exam_id: str, filepath: str, bank=None,
+                  source: str = '', tags: Sequence[str] = ()) -> Dict:
+    """
+    Parse an uploaded file in a pool process and publish the exam bank
+    
+    With a question bank (utils.question_bank.QuestionBank) the parsed
+    questions are also pooled there under source and tags; a failure to do
+    so is logged but does not fail the job.
+
+    Progress, completion and errors are reported through the store's job
+    status rather than the return value, because the request that polls
+    for them may be served by a different gunicorn worker. The return
+    value carries the final state and per-stage timings back to the
+    submitting worker for its metrics.
+    """
+    status = {'state': 'running', 'exam_id': exam_id, 'done': 0, 'total': 0}
+    store.save_job_status(job_id, status)
+    last_write = [0.0]
+
+    def progress(done, total):
+        now = time.monotonic()
+        if done < total and now - last_write[0] < PROGRESS_INTERVAL:
+            return
+        last_write[0] = now
+        status.update(done=done, total=total)
+        store.save_job_status(job_id, status)
+
+    timings = StageTimer()
+    started = time.perf_counter()
+    try:
+        questions, answer_key = parse_questions_from_file(filepath, progress, timings)
+        if not questions:
+            status.update(state='error', error='No questions found in the uploaded file. '
+                                                'Please ensure questions are in Q1, Q2... format.')
+        else:
+            with timings.stage('store'):
+                store.save(exam_id, questions, answer_key)
+            status.update(state='done', total_questions=len(questions))
+            if bank is not None:
+                with timings.stage('bank'):
+                    try:
+                        bank.ingest(questions, answer_key, source, tags)
+                    except Exception as e:
+                        logging.error(f"Failed to add {source} to the question bank: {str(e)}")
+    except Exception as e:
+        logging.error(f"Error parsing file: {str(e)}")
+        status.update(state='error', error=f'Error parsing file: {str(e)}')
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+    store.save_job_status(job_id, status)
+    # Stages are exclusive; 'total' is the whole job including status writes
+    timings.add('total', time.perf_counter() - started)
+    return {'state': status['state'], 'timings': timings.totals}
+
+
+class ParseJobQueue:
+    """
+    Bounded, process-pool-backed queue of parse jobs for this worker
+
+    At most max_workers papers are parsed at once and at most max_pending
+    jobs (running plus waiting) are accepted; beyond that submit raises
+    QueueFullError so the caller can shed load. Concurrent uploads of the
+    same paper share a single job. Parsed papers are added to bank, if
+    given.
+    """
+
+    def __init__(self, store, max_workers: int = 2, max_pending: int = 8, bank=None):
+        self.store = store
+        self.bank = bank
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pending = {}  # exam_id -> job_id
+        self._lock = threading.Lock()
+
+    def submit(self, exam_id: str, filepath: str, source: str = '', tags: Sequence[str] = ()) -> str:
+        """Queue filepath for parsing into exam_id and return the job id"""
+        with self._lock:
+            job_id = self._pending.get(exam_id)
+            if job_id is not None:
+                os.remove(filepath)
+                return job_id
+
+            if len(self._pending) >= self.max_pending:
+                raise QueueFullError('Parse queue is full')
+
+            # Created lazily so each forked gunicorn worker gets its own pool
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+            job_id = uuid.uuid4().hex
+            self.store.save_job_status(job_id, {'state': 'queued', 'exam_id': exam_id,
+                                                'done': 0, 'total': 0})
+            future = self._executor.submit(run_parse_job, self.store, job_id, exam_id, filepath,
+                                           self.bank, source, list(tags))
+            self._pending[exam_id] = job_id
+
+        future.add_done_callback(lambda f: self._finished(exam_id, job_id, f))
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        return self.store.load_job_status(job_id)
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def _finished(self, exam_id, job_id, future):
+        with self._lock:
+            self._pending.pop(exam_id, None)
+
+        exc = future.exception()
+        if exc is None:
+            result = future.result()
+            PARSE_JOBS.inc(state=result['state'])
+            for stage, seconds in result['timings'].items():
+                PARSE_STAGE_SECONDS.observe(seconds, stage=stage)
+        else:
+            PARSE_JOBS.inc(state='crashed')
+            # The pool itself failed (e.g. a worker was killed)
+            logging.error(f"Parse job {job_id} crashed: {exc}")
+            self.store.save_job_status(job_id, {'state': 'error', 'exam_id': exam_id,
+                                                'error': 'Error parsing file: worker crashed'})
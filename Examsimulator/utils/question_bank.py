@@ -0,0 +1,349 @@
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Questions that differ only in case, spacing or punctuation are the same question
+NORMALIZE_DROP = re.compile(r'[^\w\s]')
+WHITESPACE_RUN = re.compile(r'\s+')
+TOKEN = re.compile(r'\w{2,}')
+
+MAX_TAG_LENGTH = 64
+
+STRATIFY_CHOICES = ('source', 'tag')
+
+# Ids skipped by a refresh may belong to transactions that commit later (serial ids
+# are handed out before commit). They are re-read for this long, then taken as rolled back.
+GAP_TIMEOUT = 60.0
+
+
+def normalize_text(text: str) -> str:
+    return WHITESPACE_RUN.sub(' ', NORMALIZE_DROP.sub(' ', text.lower())).strip()
+
+
+def question_hash(question: Dict) -> str:
+    """Digest of a question's normalized text and options, used to deduplicate the bank"""
+    options = question.get('options', {})
+    parts = [normalize_text(question.get('question', ''))]
+    parts.extend(f"{letter}:{normalize_text(options[letter])}" for letter in sorted(options))
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def normalize_tags(tags: Iterable[str]) -> List[str]:
+    """Lowercase, trimmed, de-duplicated tags in their original order"""
+    seen = []
+    for tag in tags:
+        tag = WHITESPACE_RUN.sub(' ', tag.strip().lower())[:MAX_TAG_LENGTH]
+        if tag and tag not in seen:
+            seen.append(tag)
+    return seen
+
+
+def parse_tags(value: str) -> List[str]:
+    """Tags from a comma-separated form field"""
+    return normalize_tags(value.split(','))
+
+
+def tokenize(text: str) -> List[str]:
+    # Punctuation already separates words, so this matches normalize_text's words
+    return TOKEN.findall(text.lower())
+
+
+class QuestionBank:
+    """
+    Persistent question bank with an in-memory inverted index
+
+    Every parsed paper is ingested through ingest(): questions are
+    deduplicated by the hash of their normalized text and options, and
+    stored with the paper they came from (their source) plus any tags.
+    Each worker keeps its own index of the stored questions: postings lists
+    of question positions per word of question and option text, per tag and
+    per source, held in compact arrays. The index is loaded lazily and
+    caught up incrementally (new rows only) at most every refresh_interval
+    seconds, so searching and assembling an exam touch only the index and
+    take milliseconds even with hundreds of thousands of questions. Rows
+    are read past an id watermark; ids skipped on the way are re-read for
+    GAP_TIMEOUT seconds in case their transaction commits late, and tags
+    read before their question wait until it arrives.
+
+    storage is a utils.db_store.SqlQuestionStore. The bank itself pickles
+    down to that store, so it can be handed to parse pool processes.
+    """
+
+    def __init__(self, storage, refresh_interval: float = 5.0):
+        self.storage = storage
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def __getstate__(self):
+        return {'storage': self.storage, 'refresh_interval': self.refresh_interval}
+
+    def __setstate__(self, state):
+        self.__init__(state['storage'], state['refresh_interval'])
+
+    def _reset(self):
+        self._last_question_id = 0
+        self._last_tag_id = 0
+        self._question_gaps = {}  # skipped question id -> when it was first skipped
+        self._tag_gaps = {}
+        self._pending_tags = {}  # question hash -> tags read before the question
+        self._refreshed_at = None
+        self._hashes = []  # position -> question hash
+        self._records = []  # position -> {'question', 'options', 'answer'}
+        self._positions = {}  # question hash -> position
+        self._source_names = []
+        self._source_ids = {}
+        self._source_of = array('I')  # position -> index into _source_names
+        self._primary_tag = {}  # position -> first tag it was given
+        self._primary_strata = {}  # first tag -> positions
+        self._untagged = set()
+        self._words = {}  # word -> positions
+        self._tags = {}  # tag -> positions
+        self._sources = {}  # source -> positions
+
+    def ingest(self, questions: Sequence[Dict], answer_key: Dict, source: str,
+               tags: Iterable[str] = ()) -> int:
+        """
+        Add the questions of a parsed paper to the bank and return how many were new
+
+        answer_key is keyed by question position (1-based, int or str) as
+        returned by the parser. Questions already in the bank keep their
+        first source and answer but gain the given tags.
+        """
+        records = {}
+        for i, question in enumerate(questions):
+            digest = question_hash(question)
+            if digest not in records:
+                records[digest] = {
+                    'hash': digest,
+                    'question': question.get('question', ''),
+                    'options': dict(question.get('options', {})),
+                    'answer': str(answer_key.get(i + 1, answer_key.get(str(i + 1), '')))
+                }
+        if not records:
+            return 0
+
+        added = self.storage.add(list(records.values()), source, normalize_tags(tags))
+        logging.info(f"Question bank: {added} new of {len(records)} questions from {source}")
+        with self._lock:
+            # Make our own additions visible at once
+            self._refreshed_at = None
+        return added
+
+    def refresh(self, force: bool = False) -> None:
+        """Catch the index up with questions and tags stored since the last refresh"""
+        with self._lock:
+            now = time.monotonic()
+            if (not force and self._refreshed_at is not None
+                    and now - self._refreshed_at < self.refresh_interval):
+                return
+            self._refreshed_at = now
+
+            # Tags first: a question committed with its tags is then never missed
+            tags, self._last_tag_id = _catch_up(
+                self.storage.tags_after, self.storage.tags_in, self._last_tag_id, self._tag_gaps, now)
+            questions, self._last_question_id = _catch_up(
+                self.storage.questions_after, self.storage.questions_in, self._last_question_id,
+                self._question_gaps, now)
+
+            for _, digest, source, payload in questions:
+                if digest not in self._positions:
+                    self._add_question(digest, source, payload)
+                    for tag in self._pending_tags.pop(digest, ()):
+                        self._add_tag(self._positions[digest], tag)
+            for _, digest, tag in tags:
+                position = self._positions.get(digest)
+                if position is None:
+                    self._pending_tags.setdefault(digest, []).append(tag)
+                else:
+                    self._add_tag(position, tag)
+
+    def _add_tag(self, position, tag):
+        self._tags.setdefault(tag, array('I')).append(position)
+        if position in self._untagged:
+            self._untagged.discard(position)
+            self._primary_tag[position] = tag
+            self._primary_strata.setdefault(tag, array('I')).append(position)
+
+    def _add_question(self, digest, source, payload):
+        position = len(self._records)
+        self._hashes.append(digest)
+        self._records.append(payload)
+        self._positions[digest] = position
+
+        source_id = self._source_ids.get(source)
+        if source_id is None:
+            source_id = self._source_ids[source] = len(self._source_names)
+            self._source_names.append(source)
+        self._source_of.append(source_id)
+        self._sources.setdefault(source, array('I')).append(position)
+        self._untagged.add(position)
+
+        words = self._words
+        text = ' '.join([payload['question'], *payload['options'].values()])
+        for word in set(tokenize(text)):
+            positions = words.get(word)
+            if positions is None:
+                positions = words[word] = array('I')
+            positions.append(position)
+
+    def count(self) -> int:
+        """Questions stored by all workers, without loading the index"""
+        return self.storage.count()
+
+    def stats(self) -> Dict:
+        self.refresh()
+        with self._lock:
+            return {
+                'questions': len(self._records),
+                'words': len(self._words),
+                'tags': {tag: len(positions) for tag, positions in sorted(self._tags.items())},
+                'sources': len(self._sources)
+            }
+
+    def search(self, query: str = '', tags: Iterable[str] = (), source: Optional[str] = None,
+               limit: int = 50) -> Tuple[int, List[Dict]]:
+        """
+        Questions containing every word of query, carrying every tag and from source
+
+        Returns (number of matches, up to limit matching questions as
+        {'hash', 'question', 'options', 'answer', 'source'}).
+        """
+        self.refresh()
+        with self._lock:
+            matches = self._match(query, tags, source)
+            if matches is None:
+                count = len(self._records)
+                positions = range(min(limit, count))
+            else:
+                count = len(matches)
+                positions = sorted(matches)[:limit]
+            return count, [self._question(position) for position in positions]
+
+    def assemble(self, count: int, query: str = '', tags: Iterable[str] = (),
+                 source: Optional[str] = None, stratify: Optional[str] = None,
+                 seed: Optional[int] = None) -> Tuple[List[Dict], Dict[str, str]]:
+        """
+        Draw a new exam of count questions at random from the matching questions
+
+        With stratify ('source' or 'tag') the questions are split into
+        strata by source paper or by first tag and each stratum contributes
+        in proportion to its size (largest remainder), so the exam mirrors
+        the pool's mix. Returns (questions, answer_key) in the form the
+        parser produces, numbered from 1. Raises ValueError if fewer than
+        count questions match.
+        """
+        if stratify is not None and stratify not in STRATIFY_CHOICES:
+            raise ValueError(f"Unknown stratification: {stratify}")
+
+        self.refresh()
+        rng = random.Random(seed)
+        with self._lock:
+            matches = self._match(query, tags, source)
+            available = len(self._records) if matches is None else len(matches)
+            if count < 1 or count > available:
+                raise ValueError(f"Cannot draw {count} questions from {available} matching")
+
+            if stratify is None:
+                pool = range(len(self._records)) if matches is None else sorted(matches)
+                chosen = rng.sample(pool, count)
+            else:
+                strata = self._strata(stratify, matches)
+                chosen = []
+                for stratum, quota in _allocate(count, {key: len(members) for key, members in strata.items()}).items():
+                    chosen.extend(rng.sample(strata[stratum], quota))
+                rng.shuffle(chosen)
+
+            questions = []
+            answer_key = {}
+            for number, position in enumerate(chosen, 1):
+                record = self._records[position]
+                questions.append({'question': record['question'], 'options': dict(record['options']),
+                                  'number': number})
+                answer_key[str(number)] = record['answer']
+            return questions, answer_key
+
+    def _match(self, query, tags, source):
+        """Set of matching positions, or None when nothing narrows the bank"""
+        postings = [self._words.get(word, ()) for word in set(tokenize(query))]
+        postings.extend(self._tags.get(tag, ()) for tag in normalize_tags(tags))
+        if source:
+            postings.append(self._sources.get(source, ()))
+        if not postings:
+            return None
+
+        # Intersect starting from the rarest term so the working set stays small
+        postings.sort(key=len)
+        matches = set(postings[0])
+        for positions in postings[1:]:
+            if not matches:
+                break
+            matches.intersection_update(positions)
+        return matches
+
+    def _strata(self, stratify, matches):
+        """{stratum: positions} over the matching positions"""
+        if stratify == 'source':
+            if matches is None:
+                return {name: positions for name, positions in self._sources.items()}
+            strata = {}
+            for position in matches:
+                strata.setdefault(self._source_names[self._source_of[position]], []).append(position)
+            return strata
+
+        if matches is None:
+            strata = dict(self._primary_strata)
+            if self._untagged:
+                strata[''] = list(self._untagged)
+            return strata
+        strata = {}
+        for position in matches:
+            strata.setdefault(self._primary_tag.get(position, ''), []).append(position)
+        return strata
+
+    def _question(self, position):
+        record = self._records[position]
+        return dict(record, hash=self._hashes[position],
+                    source=self._source_names[self._source_of[position]])
+
+
+def _catch_up(rows_after, rows_in, last_id, gaps, now):
+    """
+    Rows stored past last_id, plus late commits filling earlier id gaps
+
+    Returns (rows, new last_id). gaps ({id: first skipped}) is updated in
+    place: filled and timed-out ids leave it, ids skipped now join it.
+    """
+    rows = rows_in(sorted(gaps)) if gaps else []
+    for row in rows:
+        del gaps[row[0]]
+    for row_id, skipped_at in list(gaps.items()):
+        if now - skipped_at > GAP_TIMEOUT:
+            del gaps[row_id]
+
+    fresh = rows_after(last_id)
+    for row in fresh:
+        gaps.update((row_id, now) for row_id in range(last_id + 1, row[0]))
+        last_id = row[0]
+    return rows + fresh, last_id
+
+
+def _allocate(count: int, sizes: Dict[str, int]) -> Dict[str, int]:
+    """Split count over strata in proportion to their sizes (largest remainder method)"""
+    total = sum(sizes.values())
+    quotas = {}
+    remainders = []
+    for stratum, size in sizes.items():
+        exact = count * size / total
+        quotas[stratum] = int(exact)
+        remainders.append((exact - int(exact), size, stratum))
+    # Hand out the seats lost to rounding, largest remainder (then largest stratum) first
+    remainders.sort(reverse=True)
+    for _, size, stratum in remainders[:count - sum(quotas.values())]:
+        quotas[stratum] += 1
+    return {stratum: quota for stratum, quota in quotas.items() if quota}
@@ -0,0 +1,262 @@
+"""
+Batch scoring engine
+
+Answers and answer keys are encoded as compact integer codes (0 for
+unanswered, 1-4 for options A-D) so that a whole cohort of N candidates by
+M questions can be graded in one vectorised pass with NumPy. Without NumPy
+the same results are produced by a plain Python loop.
+
+Command line:
+    python -m utils.scoring KEY_FILE SUBMISSIONS_DIR [--positive 1] [--negative 0] [--csv OUT]
+
+KEY_FILE is a stored exam bank: a binary banks/<xx>/exam_<sha>.bank file
+(EXAM_STORE=files, see utils.exam_bank) or an exam_<sha>.json bank from
+older versions; or a plain {"1": "A", "2": "C", ...} answer key. Every *.json file in SUBMISSIONS_DIR
+is one submission: either a test_state dict ({"answers": {"0": "A", ...}})
+or the answers mapping itself.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from importlib.util import find_spec
+from typing import Dict, List, Optional
+
+from utils.exam_bank import MAGIC, MappedExamBank
+
+# numpy is imported on the first graded test rather than at app startup
+NUMPY_AVAILABLE = find_spec('numpy') is not None
+if not NUMPY_AVAILABLE:
+    logging.warning("numpy not available. Scoring will use the pure Python path.")
+
+UNANSWERED = 0
+OPTION_CODES = {'A': 1, 'B': 2, 'C': 3, 'D': 4}
+# Any other submitted answer: answered, but never equal to a key code
+OTHER_ANSWER = 5
+# Key entry that is missing or not an option letter: nothing can match it
+NO_KEY = -1
+
+STATUS_NAMES = ('unanswered', 'correct', 'incorrect')
+
+
+def encode_answers(answers: Dict[str, str], total_questions: int) -> List[int]:
+    """Encode a {"0": "A", ...} answers mapping (0-based keys) as option codes"""
+    codes = [UNANSWERED] * total_questions
+    for key, answer in answers.items():
+        try:
+            index = int(key)
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < total_questions and answer:
+            codes[index] = OPTION_CODES.get(str(answer).upper(), OTHER_ANSWER)
+    return codes
+
+
+def encode_key(answer_key: Dict, total_questions: int) -> List[int]:
+    """Encode a {"1": "A", ...} answer key (1-based keys) as option codes"""
+    return [OPTION_CODES.get(str(answer_key.get(str(i + 1), '')).upper(), NO_KEY)
+            for i in range(total_questions)]
+
+
+def score_matrix(responses, key, positive_marks: float, negative_marks: float) -> Dict:
+    """
+    Grade N candidates x M questions in one pass
+
+    Args:
+        responses: N x M array (or nested list) of answer codes
+        key: length-M array (or list) of key codes
+
+    Returns:
+        Dict of per-candidate arrays: correct, incorrect, unanswered, score,
+        percentage, plus the N x M status matrix (0 unanswered, 1 correct,
+        2 incorrect)
+    """
+    if not NUMPY_AVAILABLE:
+        return _score_matrix_python(responses, key, positive_marks, negative_marks)
+
+    import numpy as np
+    responses = np.asarray(responses, dtype=np.int8)
+    key = np.asarray(key, dtype=np.int8)
+    num_questions = responses.shape[1] if responses.ndim == 2 else len(key)
+
+    answered = responses != UNANSWERED
+    correct = answered & (responses == key)
+    incorrect = answered & ~correct
+
+    correct_counts = correct.sum(axis=1)
+    incorrect_counts = incorrect.sum(axis=1)
+    unanswered_counts = num_questions - correct_counts - incorrect_counts
+    scores = correct_counts * positive_marks - incorrect_counts * negative_marks
+
+    return {
+        'correct': correct_counts,
+        'incorrect': incorrect_counts,
+        'unanswered': unanswered_counts,
+        'score': scores,
+        'percentage': _percentages(scores, num_questions, positive_marks),
+        'status': correct.astype(np.int8) + 2 * incorrect.astype(np.int8),
+    }
+
+
+def _percentages(scores, num_questions, positive_marks):
+    import numpy as np
+    max_possible_score = num_questions * positive_marks
+    if max_possible_score <= 0:
+        return np.zeros_like(scores, dtype=float)
+    return np.maximum(0, scores / max_possible_score * 100)
+
+
+def _score_matrix_python(responses, key, positive_marks, negative_marks):
+    num_questions = len(key)
+    max_possible_score = num_questions * positive_marks
+    result = {name: [] for name in ('correct', 'incorrect', 'unanswered', 'score',
+                                    'percentage', 'status')}
+    for row in responses:
+        statuses = [0 if code == UNANSWERED else 1 if code == expected else 2
+                    for code, expected in zip(row, key)]
+        correct = statuses.count(1)
+        incorrect = statuses.count(2)
+        score = correct * positive_marks - incorrect * negative_marks
+        result['correct'].append(correct)
+        result['incorrect'].append(incorrect)
+        result['unanswered'].append(num_questions - correct - incorrect)
+        result['score'].append(score)
+        result['percentage'].append(max(0, score / max_possible_score * 100)
+                                    if max_possible_score > 0 else 0)
+        result['status'].append(statuses)
+    return result
+
+
+def answer_status(answer: str, correct_answer: str) -> int:
+    """Status code (0 unanswered, 1 correct, 2 incorrect) of one answer, as score_matrix grades it"""
+    if not answer:
+        return UNANSWERED
+    expected = OPTION_CODES.get(str(correct_answer).upper(), NO_KEY)
+    return 1 if OPTION_CODES.get(str(answer).upper(), OTHER_ANSWER) == expected else 2
+
+
+def update_tally(tally: Dict[str, int], old_answer: str, new_answer: str, correct_answer: str) -> None:
+    """Move one question's contribution to a running {"correct", "incorrect"} tally"""
+    for answer, step in ((old_answer, -1), (new_answer, 1)):
+        status = answer_status(answer, correct_answer)
+        if status != UNANSWERED:
+            tally[STATUS_NAMES[status]] += step
+
+
+def session_statuses(config: Dict, state: Dict, answer_key: Dict) -> List[int]:
+    """Status code of every question of one candidate's test"""
+    total = config['total_questions']
+    graded = score_matrix([encode_answers(state['answers'], total)], encode_key(answer_key, total),
+                          config['positive_marks'], config['negative_marks'])
+    return [int(status) for status in graded['status'][0]]
+
+
+def summarize_results(config: Dict, state: Dict, correct: int, incorrect: int) -> Dict:
+    """Score summary shown at the top of the results page"""
+    total = config['total_questions']
+    score = correct * config['positive_marks'] - incorrect * config['negative_marks']
+    max_possible_score = total * config['positive_marks']
+    return {
+        'total_questions': total,
+        'attempted': len(state['answers']),
+        'correct': correct,
+        'incorrect': incorrect,
+        'unanswered': total - correct - incorrect,
+        'total_score': float(score),
+        'percentage': float(max(0, score / max_possible_score * 100)) if max_possible_score > 0 else 0.0
+    }
+
+
+def grade_session(config: Dict, state: Dict, answer_key: Dict) -> Dict:
+    """Grade one candidate's whole test from scratch and return the score summary"""
+    statuses = session_statuses(config, state, answer_key)
+    return summarize_results(config, state, statuses.count(1), statuses.count(2))
+
+
+def grade_submissions(submissions: Dict[str, Dict[str, str]], answer_key: Dict,
+                      total_questions: Optional[int] = None,
+                      positive_marks: float = 1, negative_marks: float = 0) -> List[Dict]:
+    """
+    Grade many candidates against one key
+
+    Args:
+        submissions: Mapping of candidate name to their answers mapping
+        answer_key: {"1": "A", ...} answer key
+        total_questions: Defaults to the highest question number in the key
+
+    Returns:
+        One summary dict per candidate, in the order given
+    """
+    if total_questions is None:
+        total_questions = max((int(k) for k in answer_key), default=0)
+
+    names = list(submissions)
+    responses = [encode_answers(submissions[name], total_questions) for name in names]
+    graded = score_matrix(responses, encode_key(answer_key, total_questions),
+                          positive_marks, negative_marks)
+
+    return [{
+        'candidate': name,
+        'correct': int(graded['correct'][i]),
+        'incorrect': int(graded['incorrect'][i]),
+        'unanswered': int(graded['unanswered'][i]),
+        'score': float(graded['score'][i]),
+        'percentage': float(graded['percentage'][i])
+    } for i, name in enumerate(names)]
+
+
+def load_answer_key(path: str) -> Dict:
+    """Load an answer key from a stored exam bank (binary or JSON) or a plain key file"""
+    with open(path, 'rb') as f:
+        is_binary_bank = f.read(len(MAGIC)) == MAGIC
+    if is_binary_bank:
+        with MappedExamBank.open(path) as bank:
+            return bank.answer_key
+
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return data.get('answer_key', data)
+
+
+def load_submissions(directory: str) -> Dict[str, Dict[str, str]]:
+    """Load every *.json submission in directory, keyed by file name"""
+    submissions = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(directory, filename), 'r') as f:
+            data = json.load(f)
+        answers = data.get('answers', data) if isinstance(data, dict) else {}
+        submissions[os.path.splitext(filename)[0]] = answers
+    return submissions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bulk-grade a directory of submissions')
+    parser.add_argument('key', help='exam bank or answer key JSON file')
+    parser.add_argument('submissions', help='directory of submission JSON files')
+    parser.add_argument('--positive', type=float, default=1.0, help='marks per correct answer')
+    parser.add_argument('--negative', type=float, default=0.0, help='marks deducted per wrong answer')
+    parser.add_argument('--total', type=int, help='number of questions (defaults to key size)')
+    parser.add_argument('--csv', help='write results to this CSV file instead of stdout')
+    args = parser.parse_args(argv)
+
+    answer_key = load_answer_key(args.key)
+    results = grade_submissions(load_submissions(args.submissions), answer_key,
+                                args.total, args.positive, args.negative)
+
+    fields = ['candidate', 'correct', 'incorrect', 'unanswered', 'score', 'percentage']
+    out = open(args.csv, 'w', newline='') if args.csv else sys.stdout
+    try:
+        writer = csv.DictWriter(out, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(results)
+    finally:
+        if args.csv:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
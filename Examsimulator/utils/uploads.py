@@ -0,0 +1,90 @@
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional
+
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.utils import secure_filename
+
+# Leading bytes every accepted upload must start with. DOCX files are zip archives.
+MAGIC_BYTES = {
+    '.pdf': b'%PDF-',
+    '.docx': b'PK\x03\x04',
+}
+
+
+class UploadSpool:
+    """
+    Write-only spool file for one uploaded file part
+
+    Werkzeug's multipart parser writes the part to this object chunk by
+    chunk as it is read off the socket. Each chunk goes straight to a
+    uniquely named file in the upload folder and into a SHA-256 digest, so
+    the body is never held in memory and never copied a second time. The
+    leading bytes are checked against MAGIC_BYTES as soon as they arrive and
+    the part is size-checked on every write, so junk or oversized uploads
+    abort the request before the rest of the body is stored.
+    """
+
+    def __init__(self, folder: str, filename: Optional[str], max_size: Optional[int] = None):
+        self.ext = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        self.magic = MAGIC_BYTES.get(self.ext)
+        self.max_size = max_size
+        self.size = 0
+        self._head = b''
+        self._digest = hashlib.sha256()
+        fd, self.path = tempfile.mkstemp(prefix='upload_', suffix=self.ext, dir=folder)
+        self._file = os.fdopen(fd, 'w+b')
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.discard()
+            raise RequestEntityTooLarge()
+
+        if data and self.magic is None:
+            # Not a file type we accept at all; do not store any of it
+            self.discard()
+            raise UnsupportedMediaType()
+
+        if len(self._head) < len(self.magic or b''):
+            self._head += data[:len(self.magic) - len(self._head)]
+            if not self.magic.startswith(self._head):
+                logging.debug("Rejected upload: %s file starts with %r", self.ext, self._head)
+                self.discard()
+                raise UnsupportedMediaType()
+
+        self._digest.update(data)
+        self._file.write(data)
+        return len(data)
+
+    def is_valid(self) -> bool:
+        """True once the whole part has been written and it starts with the right magic bytes"""
+        return self.magic is not None and self._head == self.magic
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def close(self) -> None:
+        """Close the handle; the spool file itself is kept for the parse job"""
+        self._file.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def discard(self) -> None:
+        """Close and delete the spool file"""
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)